@@ -0,0 +1,13 @@
+from typing import Iterable, Optional, Set
+from fastapi import HTTPException
+
+
+def parse_selection(value: Optional[str], allowed: Iterable[str], param: str) -> Optional[Set[str]]:
+    """Parse a comma separated ``fields=``/``include=`` query value, rejecting unknown names."""
+    if not value:
+        return None
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown {param}: {', '.join(sorted(unknown))}")
+    return requested
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from datetime import date
+from app.crud import crud
+from app.db import database, models
+from app.schemas import schemas
+from app.core import security as auth
+
+router = APIRouter()
+
+# Both spellings answer directly: without the slash the request would otherwise match /expenses/{expense_id}
+@router.get("", response_model=schemas.ExpenseAnalytics)
+@router.get("/", response_model=schemas.ExpenseAnalytics, include_in_schema=False)
+def read_expense_analytics(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    q: Optional[str] = None,
+    amount_min: Optional[float] = None,
+    amount_max: Optional[float] = None,
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    owner_limit: int = Query(50, ge=1, le=1000),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    # Admins (grade 0) see company-wide rollups, everyone else only their own
+    if current_user.grade != 0:
+        owner_id = current_user.id
+    return crud.get_expense_analytics(
+        db, date_from=date_from, date_to=date_to, category=category, status=status,
+        owner_id=owner_id, granularity=granularity, owner_limit=owner_limit,
+        q=q, amount_min=amount_min, amount_max=amount_max
+    )
@@ -1,13 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import json
+import os
+import tempfile
+from collections import Counter
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from typing import List
-from app.crud import crud
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+from datetime import date
+from app.crud import crud, versions
 from app.db import database, models
 from app.schemas import schemas
-from app.core import security as auth
+from app.core import export, receipts, responses, security as auth
+from app.api.deps import parse_selection
 
 router = APIRouter()
 
+EXPENSE_FIELDS = tuple(schemas.Expense.model_fields)
+IMPORT_BATCH_SIZE = 1000
+REPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_BATCH_SIZE = 5000
+EXPORT_PARQUET_TYPES = {
+    "id": "int64", "date": "timestamp", "owner_id": "int64", "owner_email": "string", "owner_name": "string",
+    "owner_grade": "int64", "category": "string", "description": "string", "amount": "float64",
+    "status": "string", "receipt_url": "string",
+}
+
 @router.post("/", response_model=schemas.Expense)
 def create_expense(
     expense: schemas.ExpenseCreate, 
@@ -16,15 +37,227 @@ def create_expense(
 ):
     return crud.create_user_expense(db=db, expense=expense, user_id=current_user.id)
 
+def _validate_row(record):
+    try:
+        return schemas.ExpenseCreate.model_validate(record)
+    except ValidationError as e:
+        return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors())
+
+def _import_rows(file, fmt):
+    """Yield (row_number, ExpenseCreate | error message) while reading the upload line by line."""
+    # Decoded line by line (line endings kept, as csv expects), so a bad byte fails at its own row
+    text = (line.decode("utf-8-sig" if number == 0 else "utf-8") for number, line in enumerate(file))
+    row_number = 0
+    try:
+        if fmt == "csv":
+            for row_number, record in enumerate(csv.DictReader(text), start=1):
+                # Empty cells mean "not given" (e.g. receipt_url); extra columns are ignored
+                yield row_number, _validate_row({k: v for k, v in record.items() if k is not None and v != ""})
+            return
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield row_number, "Invalid JSON"
+                continue
+            yield row_number, _validate_row(record)
+    except UnicodeDecodeError:
+        # Rows before the bad one may already be committed in earlier batches, so report it and stop there
+        if not row_number:
+            raise HTTPException(status_code=400, detail="File must be UTF-8")
+        yield row_number + 1, "Not UTF-8; this and the following rows were not imported"
+
+@router.post("/bulk")
+def import_expenses(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Import a CSV or JSONL file of expenses; responds with one JSON line per row plus a summary line."""
+    if format is None:
+        format = "jsonl" if (file.filename or "").lower().endswith((".jsonl", ".ndjson")) else "csv"
+    counts = Counter()
+    # The per-row report is spooled to disk past 1 MB so memory stays flat for any file size
+    report = tempfile.SpooledTemporaryFile(max_size=1 << 20)
+    rows = _import_rows(file.file, format)
+    for result in crud.import_expenses(db, current_user.id, rows, batch_size=IMPORT_BATCH_SIZE):
+        counts[result["status"]] += 1
+        report.write(json.dumps(result).encode() + b"\n")
+    summary = {"rows": sum(counts.values()), "approved": counts["Approved"], "pending": counts["Pending"], "errors": counts["Error"]}
+    report.write(json.dumps({"summary": summary}).encode() + b"\n")
+    report.seek(0)
+    return StreamingResponse(
+        iter(lambda: report.read(REPORT_CHUNK_SIZE), b""),
+        media_type="application/x-ndjson", background=BackgroundTask(report.close)
+    )
+
+@router.get("/summary", response_model=schemas.ExpenseSummary)
+def read_expense_summary(
+    today: Optional[date] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    # The client passes its local date so "today" matches what the user sees
+    return crud.get_expense_summary(db, current_user.id, current_user.grade, today or date.today())
+
+def _decide_pending(status: str, selection: schemas.PendingSelection, db: Session, current_user):
+    if current_user.grade != 0:
+        raise HTTPException(status_code=403, detail="Only admins can approve or reject expenses")
+    try:
+        return crud.decide_pending_expenses(db, status, selection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/approve", response_model=schemas.PendingDecisionResult)
+def approve_expenses(
+    selection: schemas.PendingSelection,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Approve the Pending expenses selected by ids and/or filters, regardless of the daily budget."""
+    return _decide_pending("Approved", selection, db, current_user)
+
+@router.post("/reject", response_model=schemas.PendingDecisionResult)
+def reject_expenses(
+    selection: schemas.PendingSelection,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return _decide_pending("Rejected", selection, db, current_user)
+
+def _export_batches(**filters):
+    # Own session: the stream outlives the request's dependency-managed one
+    db = database.SessionLocal()
+    try:
+        yield from crud.iter_expense_export(db, batch_size=EXPORT_BATCH_SIZE, **filters)
+    finally:
+        db.close()
+
+@router.get("/export")
+def export_expenses(
+    format: str = Query("csv", pattern="^(csv|jsonl|parquet)$"),
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    owner_id: Optional[int] = None,
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Stream expenses joined with owner and grade as CSV, JSONL or Parquet, oldest first."""
+    if current_user.grade != 0:
+        owner_id = current_user.id
+    if format == "parquet" and not export.parquet_available():
+        raise HTTPException(status_code=400, detail="Parquet export requires the pyarrow package")
+    columns = [name for name, _ in crud.EXPORT_COLUMNS]
+    batches = _export_batches(date_from=date_from, date_to=date_to, category=category, status=status, owner_id=owner_id)
+    if format == "csv":
+        body = export.csv_chunks(columns, batches)
+    elif format == "jsonl":
+        body = export.jsonl_chunks(columns, batches)
+    else:
+        body = export.parquet_chunks(columns, batches, [(name, EXPORT_PARQUET_TYPES[name]) for name in columns])
+    return StreamingResponse(
+        body, media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="expenses.{format}"'}
+    )
+
 @router.get("/", response_model=List[schemas.Expense])
 def read_expenses(
-    skip: int = 0, limit: int = 100, 
+    request: Request,
+    skip: int = 0, limit: int = 100,
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    owner_id: Optional[int] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    # Admins (grade 0) may list everyone's expenses or filter by owner, others only see their own
+    if current_user.grade != 0:
+        owner_id = current_user.id
+    selected = parse_selection(fields, EXPENSE_FIELDS, "fields")
+    # Rows embed their owner's summary, so profile edits change the list too
+    scope = versions.ALL if owner_id is None else owner_id
+    tag = responses.request_etag(request, current_user, versions.read(db, [(versions.EXPENSES, scope), (versions.USERS, scope)]))
+    if responses.not_modified(request, tag):
+        return responses.not_modified_response(tag)
+    # date and id are always loaded since the cursor is built from them
+    columns = (selected - {"owner"}) | {"id", "date"} if selected else None
+    try:
+        expenses = crud.get_expenses(
+            db, skip=skip, limit=limit, user_id=owner_id, cursor=cursor,
+            category=category, status=status, date_from=date_from, date_to=date_to,
+            with_owner=not selected or "owner" in selected, columns=columns
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Opaque cursor for the next page; absent on the last page
+    headers = {"X-Next-Cursor": crud.expense_cursor(expenses[-1])} if len(expenses) == limit else {}
+    if selected:
+        rows = []
+        for e in expenses:
+            row = {name: getattr(e, name) for name in selected if name != "owner"}
+            if "owner" in selected:
+                row["owner"] = responses.dump(e.owner, schemas.UserSummary) if e.owner else None
+            rows.append(row)
+    else:
+        rows = [responses.dump(e, schemas.Expense) for e in expenses]
+    return responses.json_response(request, rows, tag, headers)
+
+@router.post("/{expense_id}/receipt", response_model=schemas.Expense)
+async def upload_receipt(
+    expense_id: int,
+    request: Request,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    if current_user.grade == 0:
-        return crud.get_expenses(db, skip=skip, limit=limit)
-    return crud.get_expenses(db, skip=skip, limit=limit, user_id=current_user.id)
+    """Attach a receipt (multipart field ``file``: JPEG, PNG, WebP, GIF or PDF), streamed to disk as it arrives."""
+    if not await run_in_threadpool(crud.get_user_expense, db, expense_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Expense not found")
+    # Hand the connection back while the body streams in, so a slow upload holds no transaction open
+    await run_in_threadpool(db.close)
+    stored = await receipts.receive(request)
+    # Looked up again in a fresh transaction: the expense may have been deleted meanwhile
+    expense = await run_in_threadpool(crud.get_user_expense, db, expense_id, current_user.id)
+    if not expense:
+        raise HTTPException(status_code=404, detail="Expense not found")
+    expense = await run_in_threadpool(crud.set_expense_receipt, db, expense, stored.sha256, stored.content_type)
+    receipts.schedule_thumbnail(stored.sha256, stored.content_type)
+    return expense
+
+def _receipt_expense(db: Session, expense_id: int, current_user):
+    # Owners see their own receipts, admins (grade 0) everyone's
+    expense = crud.get_user_expense(db, expense_id, None if current_user.grade == 0 else current_user.id)
+    if not expense or not expense.receipt_hash:
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return expense
+
+@router.get("/{expense_id}/receipt")
+def download_receipt(expense_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    """The stored receipt; supports Range requests."""
+    expense = _receipt_expense(db, expense_id, current_user)
+    return FileResponse(
+        receipts.blob_path(expense.receipt_hash), media_type=expense.receipt_content_type,
+        content_disposition_type="inline", filename=f"receipt-{expense.id}",
+        headers={"X-Content-Type-Options": "nosniff", "Cache-Control": "private, max-age=3600"},
+    )
+
+@router.get("/{expense_id}/receipt/thumbnail")
+def download_receipt_thumbnail(expense_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+    """JPEG thumbnail of an image receipt; 202 while it is being rendered, 404 for PDFs or without Pillow."""
+    expense = _receipt_expense(db, expense_id, current_user)
+    path = receipts.thumbnail_path(expense.receipt_hash)
+    if os.path.exists(path):
+        return FileResponse(path, media_type="image/jpeg", headers={"Cache-Control": "private, max-age=86400"})
+    if receipts.schedule_thumbnail(expense.receipt_hash, expense.receipt_content_type):
+        return Response(status_code=status.HTTP_202_ACCEPTED, headers={"Retry-After": "1"})
+    raise HTTPException(status_code=404, detail="No thumbnail for this receipt")
 
 @router.delete("/{expense_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_expense(expense_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core import metrics
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+from app.crud import crud
+from app.db import database, models
+from app.schemas import schemas
+from app.core import security as auth
+
+router = APIRouter()
+
+def require_admin(current_user: models.User = Depends(auth.get_current_active_user)):
+    if current_user.grade != 0:
+        raise HTTPException(status_code=403, detail="Only admins can manage budget policies")
+    return current_user
+
+@router.get("/", response_model=List[schemas.BudgetPolicy])
+def read_budget_policies(db: Session = Depends(database.get_db), current_user: models.User = Depends(require_admin)):
+    return crud.get_budget_policies(db)
+
+@router.post("/", response_model=schemas.BudgetPolicy)
+def create_budget_policy(policy: schemas.BudgetPolicyCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(require_admin)):
+    """Add a cap, or replace the cap of the existing policy for the same grade, category and period."""
+    return crud.create_budget_policy(db, policy)
+
+@router.put("/{policy_id}", response_model=schemas.BudgetPolicy)
+def update_budget_policy(policy_id: int, policy: schemas.BudgetPolicyCreate, db: Session = Depends(database.get_db), current_user: models.User = Depends(require_admin)):
+    try:
+        db_policy = crud.update_budget_policy(db, policy_id, policy)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not db_policy:
+        raise HTTPException(status_code=404, detail="Policy not found")
+    return db_policy
+
+@router.delete("/{policy_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_budget_policy(policy_id: int, db: Session = Depends(database.get_db), current_user: models.User = Depends(require_admin)):
+    if not crud.delete_budget_policy(db, policy_id):
+        raise HTTPException(status_code=404, detail="Policy not found")
+    return None
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from typing import Literal, Optional
+from app.crud import crud, search
+from app.db import database, models
+from app.schemas import schemas
+from app.core import security as auth
+
+router = APIRouter()
+
+# Deeper pages would rank past the candidate window anyway
+MAX_SKIP = 1000
+
+@router.get("/", response_model=schemas.SearchResults)
+def search_all(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Literal["all", "expenses", "chats"] = "all",
+    owner_id: Optional[int] = None,
+    skip: int = Query(0, ge=0, le=MAX_SKIP),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    """Ranked full-text search; employees see their own expenses and chats, admins everyone's (or owner_id's)."""
+    if current_user.grade != 0:
+        owner_id = current_user.id
+    words = search.terms(q)
+    results = schemas.SearchResults(query=q, terms=words)
+    if not words:
+        return results
+    if type in ("all", "expenses"):
+        results.expenses = [
+            schemas.ExpenseHit(score=score, expense=schemas.Expense.model_validate(expense))
+            for expense, score in crud.search_expenses(db, words, owner_id, skip, limit)
+        ]
+    if type in ("all", "chats"):
+        results.chats = [
+            schemas.ChatHit(score=score, chat=schemas.Chat.model_validate(chat))
+            for chat, score in crud.search_chats(db, words, owner_id, skip, limit)
+        ]
+    return results
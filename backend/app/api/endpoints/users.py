@@ -1,33 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from app.crud import crud
+from typing import Optional
+from app.crud import crud, versions
 from app.db import database, models
 from app.schemas import schemas
-from app.core import security as auth
+from app.core import responses, security as auth
+from app.api.deps import parse_selection
 
 router = APIRouter()
 
-@router.post("/", response_model=schemas.User)
+USER_FIELDS = ("id", "full_name", "email", "grade")
+USER_RELATIONS = ("expenses", "chats")
+
+@router.post("/", response_model=schemas.UserSummary)
 def create_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
     db_user = crud.get_user_by_email(db, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     return crud.create_user(db=db, user=user)
 
-@router.get("/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(auth.get_current_active_user)):
-    return current_user
+@router.get("/me", response_model=schemas.UserMe, response_model_exclude_unset=True)
+def read_users_me(
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    # Slim profile by default; ?include=expenses,chats embeds relations, ?fields= narrows the columns
+    selected = parse_selection(fields, USER_FIELDS, "fields") or USER_FIELDS
+    relations = parse_selection(include, USER_RELATIONS, "include") or ()
+    user = crud.get_user_with_relations(db, current_user.id, relations) if relations else current_user
+    data = {name: getattr(user, name) for name in selected}
+    for name in relations:
+        data[name] = getattr(user, name)
+    return schemas.UserMe.model_validate(data)
 
-@router.put("/me", response_model=schemas.User)
+@router.put("/me", response_model=schemas.UserSummary)
 def update_user_me(user_update: schemas.UserUpdate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     user = crud.update_user(db, current_user.id, user_update)
+    return user
+
 @router.get("/", response_model=list[schemas.UserSummary])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
+def read_users(request: Request, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
     # Optional: ensure only admins (grade == 0) can see all users
     # if current_user.grade != 0:
     #     raise HTTPException(status_code=403, detail="Not authorized")
-    users = crud.get_users(db, skip=skip, limit=limit)
-    return users
+    tag = responses.request_etag(request, current_user, versions.read(db, [(versions.USERS, versions.ALL)]))
+    if responses.not_modified(request, tag):
+        return responses.not_modified_response(tag)
+    try:
+        users = crud.get_users(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Next-Cursor": crud.user_cursor(users[-1])} if len(users) == limit else {}
+    return responses.json_response(request, [responses.dump(u, schemas.UserSummary) for u in users], tag, headers)
 
 @router.put("/{user_id}/grade", response_model=schemas.UserSummary)
 def update_user_grade(user_id: int, grade_update: schemas.UserGradeUpdate, db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_active_user)):
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+
+class ChatBroker:
+    """In-process fan-out of newly committed chat rows to streaming clients.
+
+    Subscribers are asyncio queues owned by the event loop serving the stream;
+    ``publish`` is thread-safe so sync crud code running in the threadpool can
+    call it directly. A slow client whose queue fills up simply misses pushes
+    and catches up from the database with ``since_id`` on reconnect.
+    """
+
+    def __init__(self, max_queued: int = 100):
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.max_queued)
+        with self._lock:
+            self._subscribers[user_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id: int, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.difference_update({s for s in subscribers if s[1] is queue})
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id: int, payload: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, payload)
+            except RuntimeError:  # loop already closed
+                self.unsubscribe(user_id, queue)
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, payload: dict):
+        try:
+            queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            pass
+
+chat_broker = ChatBroker()
+
+
+class Signal:
+    """Synchronous in-process notification, sent by crud after a commit so caches can invalidate."""
+
+    def __init__(self):
+        self._receivers = []
+
+    def connect(self, receiver):
+        self._receivers.append(receiver)
+        return receiver
+
+    def send(self, user_id: int):
+        for receiver in self._receivers:
+            receiver(user_id)
+
+# A user's expenses were created, edited or deleted
+expenses_changed = Signal()
+# A user's profile or grade changed
+user_changed = Signal()
@@ -0,0 +1,99 @@
+"""Encoders that turn batches of export rows into response body chunks.
+
+Each encoder consumes an iterator of row batches and yields bytes per batch, so
+a StreamingResponse never holds more than one batch in memory. Parquet needs
+the optional ``pyarrow`` package and writes one row group per batch.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Unserializable value {value!r}")
+
+def csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def jsonl_chunks(columns, batches):
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in rows
+        ).encode()
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class _ChunkSink:
+    """Write-only file object whose written bytes are drained after every row group."""
+
+    def __init__(self):
+        self.closed = False
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def parquet_chunks(columns, batches, schema):
+    """``schema`` is a list of (column, pyarrow type name) pairs, e.g. ("amount", "float64")."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_schema = pa.schema([
+        (name, pa.timestamp("us") if type_name == "timestamp" else getattr(pa, type_name)())
+        for name, type_name in schema
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), arrow_schema)
+    try:
+        for rows in batches:
+            table = pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(zip(*rows), arrow_schema)]
+                if rows else [pa.array([], type=field.type) for field in arrow_schema],
+                schema=arrow_schema,
+            )
+            writer.write_table(table)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,420 @@
+import os
+import re
+import json
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from pydantic import BaseModel, Field
+from app.crud import crud, policies
+from app.db import database
+from app.schemas import schemas
+from app.core import metrics, profiling
+from app.core.cache import TTLCache
+from app.core.events import expenses_changed, user_changed
+
+IST = timezone(timedelta(hours=5, minutes=30))
+CATEGORIES = ['food', 'travel', 'supplies', 'other']
+MODEL = 'gemini-2.5-flash'
+
+FINBOT_CONCURRENCY = int(os.environ.get("FINBOT_CONCURRENCY", "4"))
+FINBOT_TIMEOUT_SECONDS = float(os.environ.get("FINBOT_TIMEOUT_SECONDS", "30"))
+FINBOT_RETRIES = int(os.environ.get("FINBOT_RETRIES", "2"))
+FINBOT_MAX_PENDING = int(os.environ.get("FINBOT_MAX_PENDING", "100"))
+FINBOT_CONTEXT_CACHE_SIZE = int(os.environ.get("FINBOT_CONTEXT_CACHE_SIZE", "10000"))
+# Bounds staleness when another worker process changed the user's data
+FINBOT_CONTEXT_TTL_SECONDS = float(os.environ.get("FINBOT_CONTEXT_TTL_SECONDS", "300"))
+RECENT_EXPENSES = 5
+# Number of raw rows the prompt used to embed before it was summarized
+LEGACY_RECENT_EXPENSES = 50
+
+MISSING_KEY_REPLY = "⚠️ Gemini API Key is missing. Please set GEMINI_API_KEY in the environment."
+ERROR_REPLY = "❌ Sorry, I encountered an error while processing your request."
+TIMEOUT_REPLY = "⌛ Sorry, FinBot took too long to answer. Please try again."
+BUSY_REPLY = "⏳ FinBot is handling too many requests right now. Please try again in a moment."
+
+class ChatAction(BaseModel):
+    is_expense: bool = Field(description="True if the user's message is a request to log/create a new expense, False otherwise.")
+    category: str = Field(None, description="If is_expense is true, the category of the expense. Must be exactly one of: food, travel, supplies, other.")
+    amount: float = Field(None, description="If is_expense is true, the amount of the expense as a number.")
+    description: str = Field(None, description="If is_expense is true, a short description of the expense.")
+    reply_message: str = Field(description="The conversational text reply to the user. E.g. answering a question or confirming expense creation.")
+
+def get_today_ist():
+    return datetime.now(IST).strftime('%Y-%m-%d')
+
+
+class FakeGeminiClient:
+    """Offline stand-in for ``genai.Client`` for tests and benchmarks.
+
+    Implements ``client.aio.models.generate_content`` and
+    ``client.models.generate_content``. Messages containing a number and a
+    category word are logged as expenses, everything else gets a canned answer.
+    Set ``FINBOT_FAKE_CLIENT=1`` to use it instead of Gemini.
+    """
+
+    class _Response:
+        def __init__(self, text):
+            self.text = text
+
+    class _Models:
+        def __init__(self, client):
+            self._client = client
+
+        def generate_content(self, model, contents, config=None):
+            self._client.calls += 1
+            return FakeGeminiClient._Response(self._client.answer(contents))
+
+    class _AsyncModels(_Models):
+        async def generate_content(self, model, contents, config=None):
+            self._client.calls += 1
+            if self._client.latency:
+                await asyncio.sleep(self._client.latency)
+            return FakeGeminiClient._Response(self._client.answer(contents))
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.models = self._Models(self)
+        self.aio = SimpleNamespace(models=self._AsyncModels(self))
+
+    def answer(self, contents: str) -> str:
+        amount = re.search(r"(\d+(?:\.\d+)?)", contents)
+        category = next((c for c in CATEGORIES if c in contents.lower()), None)
+        if amount and category:
+            action = ChatAction(is_expense=True, category=category, amount=float(amount.group(1)),
+                                description=f"{category.capitalize()} expense", reply_message="✅ Logged your expense.")
+        else:
+            action = ChatAction(is_expense=False, reply_message="I'm FinBot. Ask me about your spending!")
+        return action.model_dump_json(exclude_none=True)
+
+_client_factory = None
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+def set_client_factory(factory):
+    """Override how the Gemini client is built (e.g. ``lambda: FakeGeminiClient()``); None restores the default."""
+    global _client_factory
+    _client_factory = factory
+
+def get_gemini_client():
+    """Process-wide client, built once and reused so its HTTP connection pool is shared across messages."""
+    global _client, _client_key
+    if _client_factory is not None:
+        return _client_factory()
+    fake = os.environ.get("FINBOT_FAKE_CLIENT") == "1"
+    api_key = "fake" if fake else os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    with _client_lock:
+        if _client is None or _client_key != api_key:
+            if fake:
+                _client = FakeGeminiClient()
+            else:
+                # The SDK takes about half a second to import; only processes that talk to Gemini pay for it
+                from google import genai
+                _client = genai.Client(api_key=api_key)
+            _client_key = api_key
+        return _client
+
+
+context_cache_hits = metrics.Counter("finbot_context_cache_hits_total", "FinBot prompt contexts served from cache")
+context_cache_misses = metrics.Counter("finbot_context_cache_misses_total", "FinBot prompt contexts built from the database")
+prompt_tokens = metrics.Histogram("finbot_prompt_tokens", "Estimated tokens in the FinBot system prompt",
+                                  buckets=(250, 500, 1000, 2000, 4000, 8000, 16000))
+prompt_tokens_saved = metrics.Counter("finbot_prompt_tokens_saved_total",
+                                      "Estimated prompt tokens saved by summarizing history instead of embedding raw rows")
+
+messages_by_path = metrics.Counter("finbot_messages_total", "FinBot messages answered, by path (local rules, llm or error)", ["path"])
+reply_seconds = metrics.Histogram("finbot_reply_seconds", "Time from receiving a FinBot message to storing its reply", ["path"])
+
+def record_reply(path: str, started: float):
+    messages_by_path.inc(path=path)
+    reply_seconds.observe(time.perf_counter() - started, path=path)
+
+_context_cache = TTLCache(maxsize=FINBOT_CONTEXT_CACHE_SIZE, ttl=FINBOT_CONTEXT_TTL_SECONDS)
+_context_versions = {}
+_context_lock = threading.Lock()
+
+@expenses_changed.connect
+@user_changed.connect
+def invalidate_context(user_id: int):
+    # Bumping the version changes the cache key; the stale entry simply ages out
+    with _context_lock:
+        _context_versions[user_id] = _context_versions.get(user_id, 0) + 1
+
+def estimate_tokens(text: str) -> int:
+    # Roughly 4 characters per token for English/Latin text
+    return len(text) // 4 + 1
+
+def format_limits(limits) -> str:
+    caps = [f"₹{getattr(limits, p):g} {p}" for p in policies.PERIODS if getattr(limits, p) is not None]
+    return ", ".join(caps) or "no limit"
+
+def _format_expense(e) -> str:
+    date_str = e.date.strftime('%Y-%m-%d %H:%M') if e.date else 'Unknown'
+    return f"[{date_str}] {e.category} - ₹{e.amount} ({e.status}): {e.description}"
+
+def build_system_instruction(db, current_user):
+    """Render the prompt for a user. Returns (prompt, estimated tokens saved versus raw history)."""
+    today_str = get_today_ist()
+    today = datetime.now(IST).date()
+    # Same rollups as the dashboard summary: today's approved spend per category plus week/month totals
+    summary = crud.get_expense_summary(db, current_user.id, current_user.grade, today)
+    spent_by_category = summary.today.approved_by_category
+    spent_today = round(sum(spent_by_category.values()), 2)
+
+    def today_line(cat):
+        name = cat.capitalize()
+        limits = summary.limits[name]
+        spent = spent_by_category.get(name, 0)
+        remaining = f"remaining today ₹{round(limits.daily - spent, 2)}" if limits.daily is not None else "no daily limit"
+        return f"- {name}: spent ₹{spent}, {remaining} (limits: {format_limits(limits)})"
+    today_lines = "\n".join(today_line(cat) for cat in CATEGORIES)
+
+    # Aggregates replace the raw last-50 rows; only a handful of rows stay for "show my last N" questions
+    def period_line(period):
+        parts = [f"{b.count} {b.key} (₹{b.total})" for b in period.by_status]
+        categories = [f"{b.key} ₹{b.total} ({b.count})" for b in period.by_category]
+        return f"₹{period.total} over {period.count} expense(s); " + (", ".join(parts + categories) or "none")
+    history_count = summary.month.count
+    summary_context = f"- This week: {period_line(summary.week)}\n- This month: {period_line(summary.month)}"
+
+    recent = [_format_expense(e) for e in crud.get_recent_expenses(db, current_user.id, limit=RECENT_EXPENSES)]
+    recent_context = "\n".join(recent) if recent else "No expenses found."
+
+    prompt = f"""
+You are FinBot, an AI expense tracking assistant. 
+The user relies on you to log expenses and answer questions about their spending.
+
+User Info:
+- Default Daily Limit (per category): {f"₹{summary.daily_limit}" if summary.daily_limit is not None else "none"}
+- Spent Today (approved, all categories): ₹{spent_today}
+- Today's Date: {today_str}
+
+Today by Category:
+{today_lines}
+
+Spending Summary (by status, then by category with counts):
+{summary_context}
+
+Most Recent Expenses (last {RECENT_EXPENSES}):
+{recent_context}
+
+Your Task:
+Analyze the user's message.
+1. If the user wants to log/create a new expense (e.g., "I ate lunch for 500", "Spent 200 on travel", "Expense: Food 500"):
+   - Set is_expense = True
+   - Extract category (must map to one of: food, travel, supplies, other). Try your best to categorize.
+   - Extract amount (number).
+   - Extract description. Formulate a short description if one isn't explicitly provided.
+   - Provide a friendly confirmation reply message.
+
+2. If the user is asking a question (e.g., "What is my limit?", "How much did I spend today?", "Show my last 3 expenses"):
+   - Set is_expense = False
+   - Answer their question concisely and nicely in the reply_message based strictly on the User Info and expense context above.
+   - You can use markdown to format the reply_message.
+   - IMPORTANT: For Indian currency, use the ₹ symbol. No $ symbol.
+
+Return a JSON strictly matching the schema.
+"""
+    # Estimate what embedding up to 50 raw rows would have cost, from the rows we did render
+    avg_row = sum(len(r) for r in recent) / len(recent) if recent else 0
+    legacy_rows = min(LEGACY_RECENT_EXPENSES, max(history_count, len(recent)))
+    saved = max(0, int((legacy_rows - len(recent)) * avg_row - len(summary_context) - len(today_lines)) // 4)
+    return prompt, saved
+
+def get_system_instruction(user_id: int) -> str:
+    """Cached prompt for a user, keyed on (user, data version, policy version, date); only a miss opens a DB session."""
+    with _context_lock:
+        version = _context_versions.get(user_id, 0)
+    # The policy version rolls the key too when an admin edits budget caps
+    key = (user_id, version, policies.cached_version(), get_today_ist())
+    prompt = _context_cache.get(key)
+    if prompt is not None:
+        context_cache_hits.inc()
+        return prompt
+
+    context_cache_misses.inc()
+    db = database.SessionLocal()
+    try:
+        prompt, saved = build_system_instruction(db, crud.get_user(db, user_id))
+    finally:
+        db.close()
+    prompt_tokens.observe(estimate_tokens(prompt))
+    prompt_tokens_saved.inc(saved)
+    _context_cache.set(key, prompt)
+    return prompt
+
+def parse_action(text: str):
+    """Turn the model's JSON into the bot reply and, for expense requests, the expense to create."""
+    return action_to_reply(ChatAction(**json.loads(text)))
+
+def action_to_reply(action: ChatAction):
+    expense_to_create = None
+    if action.is_expense and action.amount is not None and action.category:
+        cat = action.category.lower()
+        if cat not in CATEGORIES:
+            cat = 'other'
+        
+        # Capitalize properly for the database/frontend (e.g., 'Food')
+        final_cat = cat.capitalize()
+            
+        expense_to_create = schemas.ExpenseCreate(
+            amount=action.amount,
+            category=final_cat,
+            description=action.description or "Added via FinBot",
+            date=datetime.now(IST)
+        )
+        
+    return schemas.ChatCreate(message=action.reply_message, is_support=True), expense_to_create
+
+def store_reply(db, user_id: int, bot_reply: schemas.ChatCreate, expense_to_create: schemas.ExpenseCreate = None):
+    if expense_to_create:
+        try:
+            crud.create_user_expense(db=db, expense=expense_to_create, user_id=user_id)
+        except Exception as e:
+            db.rollback()
+            bot_reply = schemas.ChatCreate(message=f"❌ Failed to create expense. Database error: {str(e)}", is_support=True)
+    return crud.create_user_chat(db, bot_reply, user_id)
+
+
+@dataclass
+class FinBotJob:
+    user_id: int
+    message: str
+    submitted_at: float = field(default_factory=time.perf_counter)
+
+class FinBotQueue:
+    """Runs FinBot replies off the request path.
+
+    ``submit`` only enqueues; a fixed pool of asyncio workers (the concurrency
+    bound) loads the prompt context and stores the result in short threadpool
+    calls with their own sessions, and awaits the Gemini call with a timeout
+    and exponential-backoff retries, so neither a worker thread nor a DB
+    connection is held while the model is thinking.
+    """
+
+    def __init__(self, concurrency: int = FINBOT_CONCURRENCY, timeout: float = FINBOT_TIMEOUT_SECONDS,
+                 retries: int = FINBOT_RETRIES, max_pending: int = FINBOT_MAX_PENDING):
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.max_pending = max_pending
+        self._loop = None
+        self._queue = None
+        self._workers = []
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def submit(self, user_id: int, message: str) -> bool:
+        """Queue a reply for ``message``; thread-safe. Returns False when the backlog is full."""
+        job = FinBotJob(user_id=user_id, message=message)
+        if self._loop is None:
+            # Not running inside the app (scripts, tests without lifespan): answer inline
+            asyncio.run(self.process(job))
+            return True
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return False
+            self._pending += 1
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        return True
+
+    async def wait_idle(self):
+        """Wait until every submitted job has been answered."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self.process(job)
+            except Exception as e:
+                print(f"FinBot job failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                self._queue.task_done()
+
+    async def process(self, job: FinBotJob):
+        try:
+            await self._answer(job)
+        except Exception as e:
+            # Whatever failed (SDK import, prompt context, storing the reply), the user still gets one
+            print(f"FinBot job failed: {e}")
+            await asyncio.to_thread(_store, job.user_id, schemas.ChatCreate(message=ERROR_REPLY, is_support=True))
+            record_reply("error", job.submitted_at)
+
+    async def _answer(self, job: FinBotJob):
+        # Off the event loop: the first call imports the Gemini SDK
+        client = await asyncio.to_thread(get_gemini_client)
+        if not client:
+            await asyncio.to_thread(_store, job.user_id, schemas.ChatCreate(message=MISSING_KEY_REPLY, is_support=True))
+            return
+        system_instruction = await asyncio.to_thread(get_system_instruction, job.user_id)
+        try:
+            text = await self._generate(client, system_instruction, job.message)
+            bot_reply, expense_to_create = parse_action(text)
+        except asyncio.TimeoutError:
+            bot_reply, expense_to_create = schemas.ChatCreate(message=TIMEOUT_REPLY, is_support=True), None
+        except Exception as e:
+            print(f"Gemini error: {e}")
+            bot_reply, expense_to_create = schemas.ChatCreate(message=ERROR_REPLY, is_support=True), None
+        await asyncio.to_thread(_store, job.user_id, bot_reply, expense_to_create)
+        record_reply("llm", job.submitted_at)
+
+    async def _generate(self, client, system_instruction: str, user_message: str) -> str:
+        attempt = 0
+        while True:
+            try:
+                with profiling.external_call("gemini"):
+                    result = await asyncio.wait_for(
+                        client.aio.models.generate_content(
+                            model=MODEL,
+                            contents=f"User's Message: {user_message}",
+                            # A plain dict: google.genai.types stays unimported with the fake client
+                            config={
+                                "system_instruction": system_instruction,
+                                "response_mime_type": "application/json",
+                                "response_schema": ChatAction,
+                                "temperature": 0.0,
+                            },
+                        ),
+                        timeout=self.timeout,
+                    )
+                return result.text
+            except Exception:
+                if attempt >= self.retries:
+                    raise
+                await asyncio.sleep(0.5 * 2 ** attempt)
+                attempt += 1
+
+def _store(user_id: int, bot_reply: schemas.ChatCreate, expense_to_create: schemas.ExpenseCreate = None):
+    db = database.SessionLocal()
+    try:
+        store_reply(db, user_id, bot_reply, expense_to_create)
+    finally:
+        db.close()
+
+queue = FinBotQueue()
@@ -0,0 +1,147 @@
+"""Rule-based fast path for FinBot.
+
+Recognizes the common, trivially structured messages (logging "spent 200 on
+travel", asking for the limit, today's spend, remaining balance or the last N
+expenses) and answers them from the budget policies and the expense rollups without a
+Gemini round trip. Anything ambiguous returns None and goes to the LLM.
+"""
+import re
+from datetime import datetime
+from app.crud import crud
+from app.core.finbot import CATEGORIES, IST, ChatAction, format_limits
+
+CATEGORY_KEYWORDS = {
+    "food": ("food", "lunch", "dinner", "breakfast", "meal", "meals", "snack", "snacks", "coffee", "tea",
+             "restaurant", "groceries", "grocery"),
+    "travel": ("travel", "taxi", "cab", "uber", "ola", "bus", "train", "flight", "fuel", "petrol", "diesel",
+               "auto", "metro", "parking", "toll"),
+    "supplies": ("supplies", "supply", "stationery", "printer", "paper", "office", "pens", "ink"),
+    "other": ("other", "misc", "miscellaneous"),
+}
+_KEYWORD_TO_CATEGORY = {word: cat for cat, words in CATEGORY_KEYWORDS.items() for word in words}
+
+_AMOUNT = re.compile(r"(?:₹|rs\.?|inr)?\s*(\d+(?:,\d{3})*(?:\.\d+)?)", re.IGNORECASE)
+_NUMBER = r"(\d+(?:,\d{3})*(?:\.\d+)?)"
+# Where a number is a price rather than a quantity ("bought 2 pens"): next to a currency marker,
+# after "spent" / "paid" / "for", or ending a message straight after the category word ("taxi 250")
+_PRICE = re.compile(
+    rf"(?:₹|\brs\.?|\binr)\s*{_NUMBER}|{_NUMBER}\s*(?:rs\b|inr\b|rupees?\b)"
+    rf"|\b(?:spent|spend|paid|pay|for|cost|costs|expense:?)\s+(?:₹|rs\.?|inr)?\s*{_NUMBER}"
+    rf"|\b(?:{'|'.join(map(re.escape, _KEYWORD_TO_CATEGORY))})\s+{_NUMBER}$",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"[a-z']+")
+_LOG_VERBS = {"spent", "spend", "paid", "pay", "bought", "buy", "ate", "log", "add", "expense", "expensed"}
+_QUESTION_WORDS = {"how", "what", "what's", "whats", "show", "list", "tell", "which", "when", "why", "is", "do", "did", "can"}
+_RECENT = re.compile(r"\b(?:last|recent|latest)\s*(\d+)?\s*expenses?\b")
+# Logging would book an expense the user did not make, or on the wrong day: such messages go to the LLM
+_NEGATIONS = {"not", "no", "never", "didn't", "didnt", "don't", "dont", "haven't", "havent", "wasn't", "wasnt",
+              "won't", "wont", "cancel", "undo", "remove", "delete"}
+_DATE_WORDS = {"yesterday", "tomorrow", "ago", "last", "previous", "earlier", "night", "morning",
+               "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+               "january", "february", "march", "april", "may", "june", "july", "august", "september",
+               "october", "november", "december", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep",
+               "sept", "oct", "nov", "dec"}
+_DATE = re.compile(r"\b\d{1,2}[/.-]\d{1,2}(?:[/.-]\d{2,4})?\b|\b\d{1,2}(?:st|nd|rd|th)\b")
+
+MAX_RECENT = 20
+
+
+def _categories_in(words):
+    return {_KEYWORD_TO_CATEGORY[w] for w in words if w in _KEYWORD_TO_CATEGORY}
+
+def _is_question(text: str, words) -> bool:
+    return "?" in text or (bool(words) and words[0] in _QUESTION_WORDS)
+
+def parse_expense(message: str):
+    """Return (amount, category, description) for an unambiguous expense-logging message, else None.
+
+    A bare number is not taken as the amount: it needs a currency marker or a price position (see ``_PRICE``).
+    Negated messages and ones naming another day are not logged here; the LLM reads them.
+    """
+    text = message.strip().lower().replace("\u2019", "'")
+    words = _WORD.findall(text)
+    if _is_question(text, words):
+        return None
+    if (_NEGATIONS | _DATE_WORDS) & set(words) or any(w.endswith("n't") for w in words) or _DATE.search(text):
+        return None
+    amounts = [next(group for group in match.groups() if group) for match in _PRICE.finditer(text)]
+    categories = _categories_in(words)
+    if len(amounts) != 1 or len(categories) != 1:
+        return None
+    category = categories.pop()
+    # Either an explicit logging verb/prefix or a terse "<category> <amount>" message
+    if not (_LOG_VERBS & set(words) or text.startswith("expense:") or len(words) <= 3):
+        return None
+    amount = float(amounts[0].replace(",", ""))
+    if amount <= 0:
+        return None
+    keyword = next((w for w in words if _KEYWORD_TO_CATEGORY.get(w) == category), category)
+    description = keyword.capitalize() if keyword != category else f"{category.capitalize()} expense"
+    return amount, category, description
+
+def _question_intent(message: str):
+    text = message.strip().lower()
+    words = _WORD.findall(text)
+    if not _is_question(text, words) or _AMOUNT.search(re.sub(_RECENT, "", text)):
+        return None
+    intents = set()
+    recent = _RECENT.search(text)
+    if recent:
+        intents.add("recent")
+    if {"remaining", "left", "balance"} & set(words):
+        intents.add("remaining")
+    elif {"limit", "budget"} & set(words):
+        intents.add("limit")
+    if {"spent", "spend"} & set(words) and "today" in words and "remaining" not in intents:
+        intents.add("spent_today")
+    # Mixed questions ("limit and last 3 expenses") are left to the LLM
+    return intents.pop() if len(intents) == 1 else None
+
+def _today_totals(db, user):
+    # Approved spend per category today, from the same rollups as the dashboard summary
+    return crud.get_expense_summary(db, user.id, user.grade, datetime.now(IST).date()).today.approved_by_category
+
+def answer(db, user, message: str):
+    """A ChatAction for messages the rules are sure about, or None to fall through to Gemini."""
+    expense = parse_expense(message)
+    if expense:
+        amount, category, description = expense
+        return ChatAction(
+            is_expense=True, category=category, amount=amount, description=description,
+            reply_message=f"✅ Logged ₹{amount:g} under {category.capitalize()} ({description}).",
+        )
+
+    intent = _question_intent(message)
+    if intent is None:
+        return None
+    limits = {c: crud.get_limits(db, user.grade, c.capitalize()) for c in CATEGORIES}
+
+    if intent == "limit":
+        lines = "\n".join(f"- {c.capitalize()}: {format_limits(limits[c])}" for c in CATEGORIES)
+        reply = f"Your limits by category:\n{lines}"
+    elif intent == "spent_today":
+        totals = _today_totals(db, user)
+        lines = "\n".join(f"- {c.capitalize()}: ₹{totals.get(c.capitalize(), 0):g}" for c in CATEGORIES)
+        reply = f"You have spent **₹{sum(totals.values()):g}** (approved) today.\n{lines}"
+    elif intent == "remaining":
+        totals = _today_totals(db, user)
+        lines = "\n".join(
+            f"- {c.capitalize()}: ₹{limits[c].daily - totals.get(c.capitalize(), 0):g} of ₹{limits[c].daily:g}"
+            if limits[c].daily is not None else f"- {c.capitalize()}: no daily limit"
+            for c in CATEGORIES
+        )
+        reply = f"Remaining today by category:\n{lines}"
+    else:
+        count = _RECENT.search(message.lower()).group(1)
+        count = min(int(count), MAX_RECENT) if count else 5
+        expenses = crud.get_recent_expenses(db, user.id, limit=count)
+        if not expenses:
+            reply = "You don't have any expenses yet."
+        else:
+            lines = "\n".join(
+                f"- {e.date.strftime('%Y-%m-%d')}: {e.category} ₹{e.amount:g} ({e.status}) — {e.description}"
+                for e in expenses
+            )
+            reply = f"Your last {len(expenses)} expense(s):\n{lines}"
+    return ChatAction(is_expense=False, reply_message=reply)
@@ -0,0 +1,117 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms register themselves on creation and are
+rendered by ``render()`` for the ``/metrics`` endpoint. Values are per process.
+"""
+import threading
+from bisect import bisect_left
+
+_registry = []
+_lock = threading.Lock()
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _format_labels(labelnames, key, extra=()):
+    pairs = [(n, v) for n, v in zip(labelnames, key)] + list(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        with _lock:
+            _registry.append(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+    def collect(self):
+        lines = self._header()
+        with _lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+        return lines
+
+    def value(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labelnames=(), function=None):
+        super().__init__(name, description, labelnames)
+        self._function = function
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[_label_key(self.labelnames, labels)] = value
+
+    def collect(self):
+        if self._function is not None:
+            # Sampled at scrape time, e.g. pool occupancy
+            return self._header() + [f"{self.name} {_format_value(self._function())}"]
+        return super().collect()
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def value(self, **labels):
+        state = self._values.get(_label_key(self.labelnames, labels))
+        return {"count": state[2], "sum": state[1]} if state else {"count": 0, "sum": 0.0}
+
+    def collect(self):
+        lines = self._header()
+        with _lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render() -> str:
+    with _lock:
+        metrics = list(_registry)
+    return "\n".join(line for metric in metrics for line in metric.collect()) + "\n"
@@ -0,0 +1,129 @@
+"""Request-level timing: route latency, DB queries and external calls.
+
+``ProfilingMiddleware`` opens a ``RequestStats`` for every HTTP request in a
+context variable; the SQLAlchemy hooks installed by ``instrument_engine`` and
+the ``external_call`` timer add to it from whichever thread does the work (the
+threadpool and the password-hash pool run with a copy of the request context).
+Everything is also aggregated into the metrics served on ``/metrics``.
+
+With ``REQUEST_PROFILING=1``, a request sent with ``X-Profile: 1`` gets a
+``Server-Timing`` response header with its breakdown (total, db, external calls).
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+REQUEST_PROFILING = os.environ.get("REQUEST_PROFILING", "0") == "1"
+PROFILE_HEADER = b"x-profile"
+
+request_seconds = metrics.Histogram("http_request_seconds", "HTTP request latency by route", ["method", "route"])
+requests_total = metrics.Counter("http_requests_total", "HTTP requests by route and status", ["method", "route", "status"])
+queries_per_request = metrics.Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+query_seconds = metrics.Histogram("db_query_seconds", "SQL statement execution time")
+slow_queries = metrics.Counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS")
+external_seconds = metrics.Histogram("external_call_seconds", "Time spent in calls outside the database", ["service"])
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "external")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.external = {}
+
+_current = ContextVar("request_stats", default=None)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    # On the statement's own execution context, not the connection: one that raises never reaches _after_execute
+    context.query_started = time.perf_counter()
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.query_started
+    query_seconds.observe(elapsed)
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        slow_queries.inc()
+        # SQL text only: parameters may hold credentials or personal data
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split()))
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+
+def record_external(service: str, seconds: float):
+    external_seconds.observe(seconds, service=service)
+    stats = _current.get()
+    if stats is not None:
+        stats.external[service] = stats.external.get(service, 0.0) + seconds
+
+@contextmanager
+def external_call(service: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_external(service, time.perf_counter() - started)
+
+
+def _server_timing(total: float, stats: RequestStats) -> bytes:
+    parts = [f"total;dur={total * 1000:.1f}", f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries"']
+    parts += [f"{service};dur={seconds * 1000:.1f}" for service, seconds in sorted(stats.external.items())]
+    return ", ".join(parts).encode()
+
+def _route_label(scope) -> str:
+    """Path template of the matched route, e.g. /expenses/{expense_id}; never the raw path."""
+    if "endpoint" not in scope:
+        return "unmatched"
+    values = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join("{%s}" % values[part] if part in values else part for part in scope["path"].split("/"))
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware, so streaming responses pass through untouched."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        profile = REQUEST_PROFILING and dict(scope["headers"]).get(PROFILE_HEADER) == b"1"
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if profile:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(time.perf_counter() - started, stats)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            label = _route_label(scope)
+            method = scope["method"]
+            request_seconds.observe(time.perf_counter() - started, method=method, route=label)
+            requests_total.inc(method=method, route=label, status=str(status_code))
+            queries_per_request.observe(stats.queries, route=label)
@@ -0,0 +1,252 @@
+"""Content-addressed receipt storage and thumbnails.
+
+Uploads are parsed straight from the request stream: the ``file`` part of the
+multipart body is hashed and written to a temporary file as it arrives, then
+renamed to ``RECEIPTS_DIR/<aa>/<sha256>``. The same receipt uploaded twice is
+stored once, and no upload is ever held in memory whole.
+
+Thumbnails (``pip install Pillow``) are rendered once per stored image in a
+small thread pool and cached under ``RECEIPTS_DIR/thumbnails``. Blobs that no
+expense references any more are removed by:
+
+    python -m app.core.receipts gc
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, parse_options_header
+from sqlalchemy import select, union
+from starlette.concurrency import run_in_threadpool
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+RECEIPTS_DIR = os.environ.get("RECEIPTS_DIR", "./receipts")
+RECEIPT_MAX_BYTES = int(os.environ.get("RECEIPT_MAX_BYTES", str(10 * 1024 * 1024)))
+THUMBNAIL_SIZE = int(os.environ.get("THUMBNAIL_SIZE", "256"))
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", "2"))
+IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+CONTENT_TYPES = IMAGE_TYPES | {"application/pdf"}
+# Unreferenced blobs younger than this may belong to an upload whose expense is not committed yet
+GC_MIN_AGE_SECONDS = 3600
+
+upload_bytes = metrics.Counter("receipt_upload_bytes_total", "Receipt bytes received")
+uploads_total = metrics.Counter("receipt_uploads_total", "Receipt uploads by outcome (stored or duplicate)", ["result"])
+thumbnail_seconds = metrics.Histogram("receipt_thumbnail_seconds", "Time to render one receipt thumbnail")
+thumbnails_total = metrics.Counter("receipt_thumbnails_total", "Thumbnails rendered, by result", ["result"])
+
+
+class StoredReceipt(NamedTuple):
+    sha256: str
+    content_type: str
+    size: int
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(RECEIPTS_DIR, sha256[:2], sha256)
+
+def thumbnail_path(sha256: str) -> str:
+    return os.path.join(RECEIPTS_DIR, "thumbnails", sha256[:2], sha256 + ".jpg")
+
+
+class _FilePart:
+    """Multipart callbacks that hash and spool the ``file`` part to disk as it streams in."""
+
+    def __init__(self, field: bytes = b"file"):
+        self.field = field
+        self.content_type = None
+        self.size = 0
+        self.found = False
+        self._target = False
+        self._headers = {}
+        self._name = self._value = b""
+        self._hash = hashlib.sha256()
+        os.makedirs(os.path.join(RECEIPTS_DIR, "tmp"), exist_ok=True)
+        self._tmp = tempfile.NamedTemporaryFile(dir=os.path.join(RECEIPTS_DIR, "tmp"), delete=False)
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self._part_begin, "on_header_field": self._header_field,
+            "on_header_value": self._header_value, "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished, "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self):
+        self._headers = {}
+
+    def _header_field(self, data, start, end):
+        self._name += data[start:end]
+
+    def _header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _header_end(self):
+        self._headers[self._name.lower()] = self._value
+        self._name = self._value = b""
+
+    def _headers_finished(self):
+        _, disposition = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._target = not self.found and disposition.get(b"name") == self.field
+        if self._target:
+            content_type, _ = parse_options_header(self._headers.get(b"content-type", b""))
+            self.content_type = content_type.decode("latin-1").lower()
+            if self.content_type not in CONTENT_TYPES:
+                raise HTTPException(status_code=415, detail=f"Receipts must be one of: {', '.join(sorted(CONTENT_TYPES))}")
+
+    def _part_data(self, data, start, end):
+        if self._target:
+            self.size += end - start
+            if self.size > RECEIPT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Receipts are limited to {RECEIPT_MAX_BYTES} bytes")
+            chunk = data[start:end]
+            self._hash.update(chunk)
+            self._tmp.write(chunk)
+
+    def _part_end(self):
+        if self._target:
+            self.found, self._target = True, False
+
+    def store(self) -> StoredReceipt:
+        self._tmp.close()
+        if not self.found or not self.size:
+            raise HTTPException(status_code=400, detail="Expected a non-empty multipart 'file' part")
+        sha256 = self._hash.hexdigest()
+        path = blob_path(sha256)
+        if os.path.exists(path):
+            # Already stored: keep the existing copy, refreshed so gc treats it as new
+            os.utime(path)
+            uploads_total.inc(result="duplicate")
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp.name, path)
+            uploads_total.inc(result="stored")
+        upload_bytes.inc(self.size)
+        return StoredReceipt(sha256, self.content_type, self.size)
+
+    def discard(self):
+        self._tmp.close()
+        try:
+            os.unlink(self._tmp.name)
+        except FileNotFoundError:
+            pass
+
+async def receive(request: Request) -> StoredReceipt:
+    """Stream the ``file`` part of a multipart/form-data request into the store."""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body with a 'file' part")
+    part = _FilePart()
+    try:
+        parser = MultipartParser(params[b"boundary"], part.callbacks())
+        async for chunk in request.stream():
+            if chunk:
+                # Hashing and disk writes happen off the event loop
+                await run_in_threadpool(parser.write, chunk)
+        parser.finalize()
+        return await run_in_threadpool(part.store)
+    finally:
+        part.discard()
+
+
+def thumbnails_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+_pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnail")
+_pending = {}
+_failed = set()
+_pending_lock = threading.Lock()
+
+def _render(sha256: str):
+    from PIL import Image
+
+    started = time.perf_counter()
+    target = thumbnail_path(sha256)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f"{target}.{threading.get_ident()}.tmp"
+    try:
+        with Image.open(blob_path(sha256)) as image:
+            image.draft("RGB", (THUMBNAIL_SIZE, THUMBNAIL_SIZE))  # JPEG: decode at a reduced scale
+            image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            image.convert("RGB").save(tmp, "JPEG", quality=80)
+        os.replace(tmp, target)
+        thumbnails_total.inc(result="ok")
+    except Exception:
+        logger.exception("Thumbnail for receipt %s failed", sha256)
+        thumbnails_total.inc(result="error")
+        with _pending_lock:
+            _failed.add(sha256)
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    finally:
+        thumbnail_seconds.observe(time.perf_counter() - started)
+        with _pending_lock:
+            _pending.pop(sha256, None)
+
+def schedule_thumbnail(sha256: str, content_type: str) -> bool:
+    """Queue a thumbnail render unless it exists or cannot be made; True while one is on the way."""
+    if content_type not in IMAGE_TYPES or not thumbnails_available() or os.path.exists(thumbnail_path(sha256)):
+        return False
+    with _pending_lock:
+        if sha256 in _failed:
+            return False
+        if sha256 not in _pending:
+            _pending[sha256] = _pool.submit(_render, sha256)
+    return True
+
+
+def gc(db, min_age: float = GC_MIN_AGE_SECONDS):
+    """Delete blobs and thumbnails no expense references; returns the number of blobs removed."""
+    from app.db import models
+
+    # Archived expenses keep their receipts
+    referenced = set(db.scalars(union(*(
+        select(table.c.receipt_hash).where(table.c.receipt_hash.is_not(None))
+        for table in (models.Expense.__table__, models.ExpenseArchive.__table__)
+    ))))
+    removed = 0
+    cutoff = time.time() - min_age
+    for prefix in os.listdir(RECEIPTS_DIR) if os.path.isdir(RECEIPTS_DIR) else ():
+        directory = os.path.join(RECEIPTS_DIR, prefix)
+        if len(prefix) != 2 or not os.path.isdir(directory):
+            continue
+        for sha256 in os.listdir(directory):
+            path = os.path.join(directory, sha256)
+            if sha256 in referenced or os.path.getmtime(path) > cutoff:
+                continue
+            os.unlink(path)
+            if os.path.exists(thumbnail_path(sha256)):
+                os.unlink(thumbnail_path(sha256))
+            removed += 1
+    return removed
+
+
+def main(argv=None):
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Maintain the receipt store.")
+    parser.add_argument("command", choices=["gc"])
+    parser.add_argument("--min-age", type=float, default=GC_MIN_AGE_SECONDS, help="only remove blobs older than this (seconds)")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        print(f"removed {gc(db, args.min_age)} unreferenced receipt(s)")
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
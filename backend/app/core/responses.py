@@ -0,0 +1,129 @@
+"""Conditional GETs and compact, compressed JSON for the list endpoints.
+
+A list's ETag hashes the request (path, query, caller) with the collection
+versions from ``app.crud.versions``, read before any row. When the client's
+``If-None-Match`` still matches, the endpoint answers ``304`` without running
+its query or serializing anything.
+
+Changed lists are built straight from ORM attributes along the response
+schema's fields (skipping per-row validation of data that came out of the
+database), encoded with orjson (``pip install orjson``, json module
+otherwise) and compressed with brotli (``pip install brotli``) or gzip when
+the client accepts it and the body is at least ``COMPRESS_MIN_BYTES``.
+"""
+import functools
+import gzip
+import hashlib
+import json
+import os
+import typing
+from datetime import date, datetime
+from fastapi import Request, Response
+from pydantic import BaseModel
+from app.core import metrics
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+# Low brotli qualities compress about as fast as gzip and still smaller
+BROTLI_QUALITY = 4
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization, Accept-Encoding"}
+
+conditional_total = metrics.Counter("http_conditional_responses_total", "List responses by result (not_modified or full)", ["result"])
+body_bytes = metrics.Counter("http_response_body_bytes_total", "List response bytes before and after compression", ["stage"])
+
+
+# Checked once per process: a failed import is retried on every call otherwise
+@functools.lru_cache(maxsize=None)
+def orjson_available() -> bool:
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+@functools.lru_cache(maxsize=None)
+def brotli_available() -> bool:
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def etag(*parts) -> str:
+    """Weak ETag over ``parts``; anything with a stable repr will do."""
+    return 'W/"' + hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest() + '"'
+
+def request_etag(request: Request, user, stamps) -> str:
+    # The caller matters too: an admin and an employee get different lists for the same URL
+    return etag(request.url.path, sorted(request.query_params.multi_items()), user.id, user.grade, stamps)
+
+def not_modified(request: Request, tag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Weak comparison (RFC 9110 13.1.2): W/ prefixes are ignored
+    candidates = {value.strip().removeprefix("W/") for value in header.split(",")}
+    return "*" in candidates or tag.removeprefix("W/") in candidates
+
+def not_modified_response(tag: str) -> Response:
+    conditional_total.inc(result="not_modified")
+    return Response(status_code=304, headers={"ETag": tag, **CACHE_HEADERS})
+
+
+_plans = {}
+
+def _plan(model: typing.Type[BaseModel]):
+    # (field, nested model or None) per schema field, computed once per model
+    plan = _plans.get(model)
+    if plan is None:
+        plan = []
+        for name, field in model.model_fields.items():
+            nested = [arg for arg in (field.annotation, *typing.get_args(field.annotation))
+                      if isinstance(arg, type) and issubclass(arg, BaseModel)]
+            plan.append((name, nested[0] if nested else None))
+        _plans[model] = plan
+    return plan
+
+def dump(obj, model: typing.Type[BaseModel]) -> dict:
+    """``model``'s fields read off ``obj``, like ``model.model_validate(obj).model_dump()`` without validating."""
+    row = {}
+    for name, nested in _plan(model):
+        value = getattr(obj, name)
+        row[name] = dump(value, nested) if nested is not None and value is not None else value
+    return row
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    if orjson_available():
+        import orjson
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+def _encoding(request: Request):
+    accepted = {part.split(";")[0].strip() for part in request.headers.get("accept-encoding", "").split(",")}
+    if "br" in accepted and brotli_available():
+        return "br"
+    return "gzip" if "gzip" in accepted else None
+
+def json_response(request: Request, content, tag: str = None, headers: dict = None) -> Response:
+    """JSON ``content`` (already plain data), compressed when worth it, with the ETag it was built for."""
+    body = dumps(content)
+    headers = {**CACHE_HEADERS, **(headers or {})}
+    if tag:
+        headers["ETag"] = tag
+    body_bytes.inc(len(body), stage="raw")
+    encoding = _encoding(request) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding == "br":
+        import brotli
+        body = brotli.compress(body, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        body = gzip.compress(body, GZIP_LEVEL)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    body_bytes.inc(len(body), stage="sent")
+    conditional_total.inc(result="full")
+    return Response(body, media_type="application/json", headers=headers)
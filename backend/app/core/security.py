@@ -1,3 +1,11 @@
+import os
+import time
+import asyncio
+import contextvars
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -7,21 +15,74 @@ from sqlalchemy.orm import Session
 from app.crud import crud
 from app.db import models, database
 from app.schemas import schemas
+from app.core import metrics, profiling
+from app.core.cache import TTLCache
+from app.core.events import user_changed
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is deliberately slow and CPU bound: run it on a small dedicated pool so
+# it can neither block the event loop nor occupy every threadpool worker
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+LOGIN_MAX_CONCURRENT_PER_IP = int(os.environ.get("LOGIN_MAX_CONCURRENT_PER_IP", "4"))
+LOGIN_MAX_CONCURRENT_PER_ACCOUNT = int(os.environ.get("LOGIN_MAX_CONCURRENT_PER_ACCOUNT", "2"))
+
+_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+password_hash_seconds = metrics.Histogram("password_hash_seconds", "Time spent hashing or verifying passwords (bcrypt)", ["op"])
+
+def _timed(op, fn, *args):
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        elapsed = time.perf_counter() - started
+        password_hash_seconds.observe(elapsed, op=op)
+        profiling.record_external("bcrypt", elapsed)
+
+def _submit(op, fn, *args):
+    # Run with the caller's context so the time lands in the request's profile
+    return _hash_pool.submit(contextvars.copy_context().run, _timed, op, fn, *args)
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return _submit("verify", pwd_context.verify, plain_password, hashed_password).result()
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return _submit("hash", pwd_context.hash, password).result()
+
+async def verify_password_async(plain_password, hashed_password):
+    return await asyncio.wrap_future(_submit("verify", pwd_context.verify, plain_password, hashed_password))
+
+class ConcurrencyLimiter:
+    """Caps in-flight operations per key (client IP, account). Used from the event loop only."""
+
+    def __init__(self, limit: int, detail: str):
+        self.limit = limit
+        self.detail = detail
+        self._inflight = defaultdict(int)
+
+    @contextmanager
+    def acquire(self, key):
+        if self._inflight[key] >= self.limit:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=self.detail, headers={"Retry-After": "1"})
+        self._inflight[key] += 1
+        try:
+            yield
+        finally:
+            self._inflight[key] -= 1
+            if not self._inflight[key]:
+                del self._inflight[key]
+
+login_ip_limiter = ConcurrencyLimiter(LOGIN_MAX_CONCURRENT_PER_IP, "Too many concurrent login attempts from this address")
+login_account_limiter = ConcurrencyLimiter(LOGIN_MAX_CONCURRENT_PER_ACCOUNT, "Too many concurrent login attempts for this account")
 
 SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 120
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# For endpoints that also accept ?token= (EventSource cannot send an Authorization header)
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -33,24 +94,86 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", "10000"))
+# Upper bound on how long another worker process may serve a stale grade/email
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_CACHE_TTL_SECONDS", "60"))
+
+_token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+_user_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+auth_cache_hits = metrics.Counter("auth_cache_hits_total", "Authenticated requests resolved without a database lookup")
+auth_cache_misses = metrics.Counter("auth_cache_misses_total", "Authenticated requests that loaded the user from the database")
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Immutable copy of the columns endpoints read from the current user, safe to share across requests."""
+    id: int
+    email: str
+    full_name: Optional[str]
+    grade: int
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "UserSnapshot":
+        return cls(id=user.id, email=user.email, full_name=user.full_name, grade=user.grade)
+
+@user_changed.connect
+def invalidate_user(user_id: int):
+    _user_cache.pop(user_id)
+
+def decode_token(token: str) -> schemas.TokenData:
+    """Verify and decode a JWT, memoizing the result per token until it expires."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
+    cached = _token_cache.get(token)
+    if cached is not None:
+        token_data, expires = cached
+        if expires > time.time():
+            return token_data
+        _token_cache.pop(token)
+        raise credentials_exception
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+        subject: str = payload.get("sub")
+        if subject is None:
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        # Current tokens carry the user id in "sub"; older ones carried the email
+        if subject.isdigit():
+            token_data = schemas.TokenData(user_id=int(subject), email=payload.get("email"))
+        else:
+            token_data = schemas.TokenData(email=subject)
     except JWTError:
         raise credentials_exception
-    user = crud.get_user_by_email(db, email=token_data.email)
+    _token_cache.set(token, (token_data, payload.get("exp", float("inf"))))
+    return token_data
+
+def get_user_for_token(db: Session, token: str) -> UserSnapshot:
+    token_data = decode_token(token)
+    if token_data.user_id is not None:
+        snapshot = _user_cache.get(token_data.user_id)
+        if snapshot is not None:
+            auth_cache_hits.inc()
+            return snapshot
+        user = crud.get_user(db, token_data.user_id)
+    else:
+        user = crud.get_user_by_email(db, email=token_data.email)
+    auth_cache_misses.inc()
     if user is None:
-        raise credentials_exception
-    return user
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    snapshot = UserSnapshot.from_model(user)
+    _user_cache.set(user.id, snapshot)
+    return snapshot
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    # Sync so cache misses run their DB lookup in the threadpool, not on the event loop
+    return get_user_for_token(db, token)
 
-async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+async def get_current_active_user(current_user: UserSnapshot = Depends(get_current_user)):
     return current_user
@@ -0,0 +1,238 @@
+"""Hot/cold tiering of expenses and chats by month.
+
+The hot tables (``expenses``, ``chats``) serve everything interactive. Once a
+month is more than ``ARCHIVE_KEEP_MONTHS`` full months old, its decided
+(Approved / Rejected) expenses and its chats move in batches to
+``expenses_archive`` / ``chats_archive``: one range partition per month on
+PostgreSQL, a WITHOUT ROWID table clustered on time on SQLite, each with a
+single (owner, time) index. Pending expenses stay hot until decided. Hot
+indexes, the search index and vacuum then scale with recent data only.
+
+The ledger and rollups keep totals across both tiers, so budget checks and
+summaries never read the archive. Exports, analytics and the ledger / rollup
+rebuilds read both tiers (``expense_tiers``, ``expenses``); listings, search,
+edits and receipt downloads see the hot tier. ``archived_months`` records what
+moved.
+
+    python -m app.crud.archive status
+    python -m app.crud.archive run                      # --keep-months 3 --batch-size 5000
+    python -m app.crud.archive restore expenses 2025-01 # move a month back, e.g. to correct it
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime
+from typing import NamedTuple, Tuple
+from sqlalchemy import Table, delete, func, insert, select, text, union_all
+from sqlalchemy.orm import Session, aliased
+from app.db import models
+from app.crud import versions
+from app.core.events import expenses_changed
+
+ARCHIVE_KEEP_MONTHS = int(os.environ.get("ARCHIVE_KEEP_MONTHS", "3"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "5000"))
+# Pending expenses can still be approved or rejected, so their month is not closed for them
+FINAL_STATUSES = ("Approved", "Rejected")
+
+
+class Tier(NamedTuple):
+    hot: Table
+    cold: Table
+    time: str  # column months are cut on
+    order: Tuple[str, ...]  # batch order the hot table has an index for
+
+TIERS = {
+    versions.EXPENSES: Tier(models.Expense.__table__, models.ExpenseArchive.__table__, "date", ("date", "id")),
+    versions.CHATS: Tier(models.Chat.__table__, models.ChatArchive.__table__, "timestamp", ("id",)),
+}
+
+# models.Expense mapped onto the archive table, and onto both tiers at once
+_cold_expense = aliased(models.Expense, models.ExpenseArchive.__table__, adapt_on_names=True)
+_all_expenses = aliased(models.Expense, union_all(
+    select(*models.Expense.__table__.c),
+    select(*(models.ExpenseArchive.__table__.c[column.name] for column in models.Expense.__table__.c)),
+).subquery("expenses_all"), adapt_on_names=True)
+
+
+def expense_tiers():
+    """``models.Expense`` and its archive alias: build the same query on each and UNION ALL them (keeps index order)."""
+    return models.Expense, _cold_expense
+
+def expenses():
+    """``models.Expense`` over both tiers, for aggregates; filters are pushed into each tier's indexes."""
+    return _all_expenses
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def cutoff(today: date, keep_months: int = ARCHIVE_KEEP_MONTHS) -> date:
+    """First day of the oldest month kept hot; the months before it are closed."""
+    return add_months(month_start(today), -keep_months)
+
+def _postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def _begin_write(db: Session):
+    # SQLite: take the write lock before selecting the rows to move, like ledger.lock
+    if not _postgres(db):
+        conn = db.connection()
+        if not conn.connection.driver_connection.in_transaction:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+def _partition(tier: Tier, month: date) -> str:
+    return f"{tier.cold.name}_{month:%Y_%m}"
+
+def _create_partition(db: Session, tier: Tier, month: date):
+    db.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_partition(tier, month)} PARTITION OF {tier.cold.name} "
+        f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+    ))
+
+def _eligible(tier: Tier, before: datetime):
+    hot = tier.hot
+    filters = [hot.c[tier.time] < before]
+    if "status" in hot.c:
+        filters.append(hot.c.status.in_(FINAL_STATUSES))
+    return filters
+
+def _changed(db: Session, collection: str, owners):
+    versions.bump(db, collection, owners)
+    db.commit()
+    if collection == versions.EXPENSES:
+        for owner_id in owners:
+            expenses_changed.send(owner_id)
+
+def _move_batch(db: Session, collection: str, before: datetime, batch_size: int) -> int:
+    tier = TIERS[collection]
+    hot, cold = tier.hot, tier.cold
+    _begin_write(db)
+    rows = db.execute(
+        select(hot.c.id, hot.c[tier.time], hot.c.owner_id).where(*_eligible(tier, before))
+        .order_by(*(hot.c[name] for name in tier.order)).limit(batch_size).with_for_update()
+    ).all()
+    if not rows:
+        db.rollback()
+        return 0
+    months = {}
+    for row in rows:
+        month = month_start(row[1])
+        months[month] = months.get(month, 0) + 1
+    if _postgres(db):
+        for month in months:
+            _create_partition(db, tier, month)
+    ids = [row.id for row in rows]
+    names = [column.name for column in cold.columns]
+    db.execute(insert(cold).from_select(names, select(*(hot.c[name] for name in names)).where(hot.c.id.in_(ids))))
+    db.execute(delete(hot).where(hot.c.id.in_(ids)))
+    now = datetime.utcnow()
+    for month, count in months.items():
+        record = db.get(models.ArchivedMonth, (collection, month))
+        if record is None:
+            record = models.ArchivedMonth(collection=collection, month=month, rows=0)
+            db.add(record)
+        record.rows += count
+        record.archived_at = now
+    _changed(db, collection, {row.owner_id for row in rows})
+    return len(rows)
+
+def run(db: Session, keep_months: int = ARCHIVE_KEEP_MONTHS, batch_size: int = ARCHIVE_BATCH_SIZE,
+        today: date = None, progress=None) -> dict:
+    """Move the closed months of every collection to the cold tier, one transaction per batch.
+
+    ``progress(collection, moved, total)`` is called after every batch.
+    Returns the rows moved per collection; running it again moves nothing new.
+    """
+    before = datetime.combine(cutoff(today or date.today(), keep_months), datetime.min.time())
+    moved = {}
+    for collection, tier in TIERS.items():
+        total = db.scalar(select(func.count()).select_from(tier.hot).where(*_eligible(tier, before)))
+        db.rollback()
+        done = 0
+        while done < total:
+            count = _move_batch(db, collection, before, batch_size)
+            if not count:
+                break
+            done += count
+            if progress:
+                progress(collection, done, total)
+        moved[collection] = done
+    return moved
+
+def restore(db: Session, collection: str, month: date) -> int:
+    """Move one archived month back to the hot tier; returns the rows moved."""
+    tier = TIERS[collection]
+    hot, cold = tier.hot, tier.cold
+    month = month_start(month)
+    in_month = (cold.c[tier.time] >= datetime.combine(month, datetime.min.time()),
+                cold.c[tier.time] < datetime.combine(add_months(month, 1), datetime.min.time()))
+    _begin_write(db)
+    owners = set(db.scalars(select(cold.c.owner_id).where(*in_month).distinct()))
+    names = [column.name for column in cold.columns]
+    moved = db.execute(insert(hot).from_select(names, select(*(cold.c[name] for name in names)).where(*in_month))).rowcount
+    db.execute(delete(cold).where(*in_month))
+    db.execute(delete(models.ArchivedMonth).where(models.ArchivedMonth.collection == collection,
+                                                  models.ArchivedMonth.month == month))
+    if _postgres(db):
+        db.execute(text(f"DROP TABLE IF EXISTS {_partition(tier, month)}"))
+    _changed(db, collection, owners)
+    return moved
+
+def status(db: Session):
+    """[(collection, hot rows, archived rows, [(month, rows)])] per collection."""
+    result = []
+    for collection, tier in TIERS.items():
+        months = db.execute(
+            select(models.ArchivedMonth.month, models.ArchivedMonth.rows)
+            .where(models.ArchivedMonth.collection == collection).order_by(models.ArchivedMonth.month)
+        ).all()
+        hot = db.scalar(select(func.count()).select_from(tier.hot))
+        result.append((collection, hot, sum(rows for _, rows in months), [tuple(row) for row in months]))
+    return result
+
+
+def main(argv=None):
+    from app.db.database import SessionLocal, engine
+    from app.db import migrate
+
+    migrate.upgrade(engine)
+
+    parser = argparse.ArgumentParser(description="Move closed months of expenses and chats to the archive tier.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status")
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--keep-months", type=int, default=ARCHIVE_KEEP_MONTHS,
+                            help="full months kept hot before the current one")
+    run_parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    restore_parser = commands.add_parser("restore")
+    restore_parser.add_argument("collection", choices=sorted(TIERS))
+    restore_parser.add_argument("month", type=lambda value: datetime.strptime(value, "%Y-%m").date(), help="YYYY-MM")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "status":
+            for collection, hot, archived, months in status(db):
+                span = f", {months[0][0]:%Y-%m} .. {months[-1][0]:%Y-%m}" if months else ""
+                print(f"{collection:9} hot {hot:>10}  archived {archived:>10} in {len(months)} month(s){span}")
+        elif args.command == "run":
+            started = time.perf_counter()
+
+            def progress(collection, moved, total):
+                print(f"{collection:9} {moved:>10}/{total} ({moved / total:.0%})  {time.perf_counter() - started:6.1f}s", flush=True)
+
+            moved = run(db, args.keep_months, args.batch_size, progress=progress)
+            print(f"archived {', '.join(f'{count} {collection}' for collection, count in moved.items())} "
+                  f"before {cutoff(date.today(), args.keep_months):%Y-%m}")
+        else:
+            print(f"restored {restore(db, args.collection, args.month)} {args.collection} row(s) of {args.month:%Y-%m}")
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,45 @@
-from sqlalchemy.orm import Session
+import base64
+import json
+from sqlalchemy import String, cast, func, insert, or_, select, tuple_, union_all, update
+from sqlalchemy.orm import Session, joinedload, load_only, noload, selectinload
 from app.db import models
 from app.schemas import schemas
-from datetime import datetime
+from app.crud import archive, ledger, policies, rollups, search, versions
+from app.core.events import chat_broker, expenses_changed, user_changed
+from datetime import datetime, date, time, timedelta
 
+# Categories offered by the UI; summaries report limits for these plus any the user has spent in
+DEFAULT_CATEGORIES = ("Food", "Travel", "Supplies", "Other")
+
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    # Valid JSON of another shape (an object, a number) is as invalid as garbage
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+def expense_cursor(expense: models.Expense) -> str:
+    return encode_cursor(expense.date, expense.id)
+
+def user_cursor(user: models.User) -> str:
+    return encode_cursor(user.id)
 
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+def get_user_with_relations(db: Session, user_id: int, include=()):
+    # Load only the relationships the caller asked for, each with one extra SELECT
+    options = [selectinload(getattr(models.User, name)) for name in include]
+    return db.query(models.User).options(*options).filter(models.User.id == user_id).populate_existing().first()
+
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
@@ -20,6 +53,8 @@ def create_user(db: Session, user: schemas.UserCreate):
         grade=user.grade
     )
     db.add(db_user)
+    db.flush()
+    versions.bump(db, versions.USERS, [db_user.id])
     db.commit()
     db.refresh(db_user)
     db.refresh(db_user)
@@ -38,17 +73,27 @@ def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
         from app.core import security as auth
         db_user.hashed_password = auth.get_password_hash(user_update.password)
     
+    versions.bump(db, versions.USERS, [user_id])
     db.commit()
     db.refresh(db_user)
+    user_changed.send(user_id)
     return db_user
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, cursor: str = None):
+    query = db.query(models.User).order_by(models.User.id)
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int) or isinstance(values[0], bool):
+            raise ValueError("Invalid cursor")
+        # Keyset pagination: seek past the last id instead of skipping rows
+        return query.filter(models.User.id > values[0]).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
 
 def update_user_grade(db: Session, user_id: int, grade_update: schemas.UserGradeUpdate):
     db_user = get_user(db, user_id)
     if not db_user:
         return None
+    grade_changed = grade_update.grade != db_user.grade
     db_user.grade = grade_update.grade
     if grade_update.email:
         # Check if email is already taken by a different user
@@ -56,88 +101,355 @@ def update_user_grade(db: Session, user_id: int, grade_update: schemas.UserGrade
         if existing_user and existing_user.id != user_id:
             raise ValueError("Email already in use")
         db_user.email = grade_update.email
+    # A new grade may have higher caps; never revokes an approval
+    reevaluated = _approve_pending_within_budget(db, user_id, grade_update.grade) if grade_changed else 0
+    versions.bump(db, versions.USERS, [user_id])
+    if reevaluated:
+        versions.bump(db, versions.EXPENSES, [user_id])
     db.commit()
     db.refresh(db_user)
+    user_changed.send(user_id)
+    if reevaluated:
+        expenses_changed.send(user_id)
     return db_user
 
-def get_expenses(db: Session, skip: int = 0, limit: int = 100, user_id: int = None):
-    query = db.query(models.Expense)
-    if user_id:
-        query = query.filter(models.Expense.owner_id == user_id)
-    return query.order_by(models.Expense.date.desc(), models.Expense.id.desc()).offset(skip).limit(limit).all()
+def _approve_pending_within_budget(db: Session, user_id: int, grade: int) -> int:
+    """Approve, in date order, the user's Pending expenses that now fit the grade's budget. Caller commits."""
+    pending_filter = (models.Expense.owner_id == user_id, models.Expense.status == "Pending")
+    categories = db.scalars(select(models.Expense.category).where(*pending_filter).distinct()).all()
+    ledger.lock(db, [(user_id, category) for category in categories])
+    pending = db.query(models.Expense).filter(*pending_filter).order_by(models.Expense.date, models.Expense.id).all()
+    approved = 0
+    for expense in pending:
+        day = ledger.expense_day(expense.date)
+        if _within_budget(db, user_id, get_limits(db, grade, expense.category), expense.category, day, expense.amount):
+            rollups.apply_expense(db, expense, sign=-1)
+            expense.status = "Approved"
+            ledger.apply_expense(db, expense)
+            rollups.apply_expense(db, expense)
+            approved += 1
+    return approved
 
-def get_budget(grade: int) -> float:
-    budgets = {
-        1: 100, 2: 200, 3: 300, 4: 400, 5: 500,
-        6: 600, 7: 700, 8: 800, 9: 900, 10: 1000
-    }
-    return budgets.get(grade, 300.0)
+def get_expenses(db: Session, skip: int = 0, limit: int = 100, user_id: int = None, cursor: str = None,
+                 category: str = None, status: str = None, date_from: date = None, date_to: date = None,
+                 with_owner: bool = True, columns=None):
+    # The owner is a many-to-one, so joining it avoids one lazy SELECT per distinct owner
+    options = [joinedload(models.Expense.owner) if with_owner else noload(models.Expense.owner)]
+    if columns:
+        options.append(load_only(*(getattr(models.Expense, c) for c in columns)))
+    query = db.query(models.Expense).options(*options).filter(
+        *_expense_filters(date_from, date_to, category, status, owner_id=user_id)
+    ).order_by(models.Expense.date.desc(), models.Expense.id.desc())
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            last_date, last_id = datetime.fromisoformat(values[0]), int(values[1])
+        except (IndexError, TypeError, ValueError):
+            raise ValueError("Invalid cursor")
+        # Keyset pagination on (date, id): a row-value comparison the (date, id) indexes can seek to
+        query = query.filter(tuple_(models.Expense.date, models.Expense.id) < (last_date, last_id))
+        return query.limit(limit).all()
+    return query.offset(skip).limit(limit).all()
+
+EXPORT_COLUMNS = (
+    ("id", models.Expense.id), ("date", models.Expense.date), ("owner_id", models.Expense.owner_id),
+    ("owner_email", models.User.email), ("owner_name", models.User.full_name), ("owner_grade", models.User.grade),
+    ("category", models.Expense.category), ("description", models.Expense.description),
+    ("amount", models.Expense.amount), ("status", models.Expense.status), ("receipt_url", models.Expense.receipt_url),
+)
+
+def iter_expense_export(db: Session, date_from: date = None, date_to: date = None, category: str = None,
+                        status: str = None, owner_id: int = None, batch_size: int = 1000):
+    """Yield lists of plain row tuples (see EXPORT_COLUMNS) in (date, id) order, from both tiers.
+
+    yield_per streams from a server-side cursor on PostgreSQL, so only one batch
+    is held in memory at a time.
+    """
+    tiers = [
+        select(*((getattr(expense, column.key) if column.class_ is models.Expense else column).label(name)
+                 for name, column in EXPORT_COLUMNS))
+        .outerjoin(models.User, models.User.id == expense.owner_id)
+        .where(*_expense_filters(date_from, date_to, category, status, owner_id=owner_id, expense=expense))
+        for expense in archive.expense_tiers()
+    ]
+    # Ordering the UNION itself lets each tier walk its (date, id) index and the results merge
+    query = union_all(*tiers)
+    query = query.order_by(query.selected_columns.date, query.selected_columns.id).execution_options(yield_per=batch_size)
+    for partition in db.execute(query).partitions():
+        yield [tuple(row) for row in partition]
+
+def get_recent_expenses(db: Session, user_id: int, limit: int = 50):
+    return db.query(models.Expense).filter(
+        models.Expense.owner_id == user_id
+    ).order_by(models.Expense.date.desc(), models.Expense.id.desc()).limit(limit).all()
+
+def get_limits(db: Session, grade: int, category: str = None) -> policies.Limits:
+    """Daily/weekly/monthly caps for a grade and category from the compiled budget policies."""
+    return policies.current(db).limits(grade, category)
+
+def get_budget_policies(db: Session):
+    return db.query(models.BudgetPolicy).order_by(
+        models.BudgetPolicy.grade.is_(None), models.BudgetPolicy.grade,
+        models.BudgetPolicy.category.is_(None), models.BudgetPolicy.category, models.BudgetPolicy.period,
+    ).all()
+
+def _find_budget_policy(db: Session, policy: schemas.BudgetPolicyCreate):
+    # NULL never equals NULL in SQL, so match "any" with IS NULL
+    def match(column, value):
+        return column.is_(None) if value is None else column == value
+    return db.query(models.BudgetPolicy).filter(
+        match(models.BudgetPolicy.grade, policy.grade), match(models.BudgetPolicy.category, policy.category),
+        models.BudgetPolicy.period == policy.period,
+    ).first()
+
+def _commit_policies(db: Session):
+    policies.bump_version(db)
+    db.commit()
+    policies.invalidate()
+
+def create_budget_policy(db: Session, policy: schemas.BudgetPolicyCreate):
+    """Insert a policy, or update the cap of the existing one for the same grade, category and period."""
+    db_policy = _find_budget_policy(db, policy)
+    if db_policy:
+        db_policy.max_amount = policy.max_amount
+    else:
+        db_policy = models.BudgetPolicy(**policy.model_dump())
+        db.add(db_policy)
+    _commit_policies(db)
+    db.refresh(db_policy)
+    return db_policy
+
+def update_budget_policy(db: Session, policy_id: int, policy: schemas.BudgetPolicyCreate):
+    db_policy = db.get(models.BudgetPolicy, policy_id)
+    if not db_policy:
+        return None
+    existing = _find_budget_policy(db, policy)
+    if existing and existing.id != policy_id:
+        raise ValueError("A policy for this grade, category and period already exists")
+    for field, value in policy.model_dump().items():
+        setattr(db_policy, field, value)
+    _commit_policies(db)
+    db.refresh(db_policy)
+    return db_policy
+
+def delete_budget_policy(db: Session, policy_id: int):
+    db_policy = db.get(models.BudgetPolicy, policy_id)
+    if not db_policy:
+        return False
+    db.delete(db_policy)
+    _commit_policies(db)
+    return True
+
+def _within_budget(db: Session, user_id: int, limits: policies.Limits, category: str, day: date, amount: float) -> bool:
+    # Every capped period must have room for the amount next to the Approved spend already in it
+    for period, limit in zip(policies.PERIODS, limits):
+        if limit is None:
+            continue
+        if period == "daily":
+            spent = ledger.get_approved_total(db, user_id, category, day)
+        else:
+            spent = ledger.get_approved_between(db, user_id, category, *policies.period_bounds(period, day))
+        if amount > limit - spent:
+            return False
+    return True
+
+def get_expense_summary(db: Session, user_id: int, grade: int, today: date) -> schemas.ExpenseSummary:
+    """Today / this week / this month totals for one user, read from the rollups."""
+    summary = rollups.get_summary(db, user_id, today, get_limits(db, grade).daily)
+    categories = set(DEFAULT_CATEGORIES) | {b.key for b in summary.month.by_category}
+    summary.limits = {c: schemas.BudgetLimits(**get_limits(db, grade, c)._asdict()) for c in sorted(categories)}
+    return summary
 
 def create_user_expense(db: Session, expense: schemas.ExpenseCreate, user_id: int):
     user = get_user(db, user_id)
-    daily_limit = get_budget(user.grade)
-
-    # Calculate sum of 'Approved' expenses for this category today
-    expense_date_str = expense.date.strftime('%Y-%m-%d')
-    today_approved_expenses = db.query(models.Expense).filter(
-        models.Expense.owner_id == user_id,
-        models.Expense.category == expense.category,
-        models.Expense.status == "Approved"
-    ).all()
-    
-    current_spent = sum(e.amount for e in today_approved_expenses if e.date.strftime('%Y-%m-%d') == expense_date_str)
-    
-    remaining_balance = daily_limit - current_spent
-    
-    if expense.amount <= remaining_balance:
+    limits = get_limits(db, user.grade, expense.category)
+
+    # Approved spend for this category in each capped period, from the ledger;
+    # the lock keeps a parallel submission from reading the same remaining budget
+    ledger.lock(db, [(user_id, expense.category)])
+    expense_day = ledger.expense_day(expense.date)
+    if _within_budget(db, user_id, limits, expense.category, expense_day, expense.amount):
         status = "Approved"
     else:
         status = "Pending"
 
     db_expense = models.Expense(**expense.dict(), owner_id=user_id, status=status)
     db.add(db_expense)
+    ledger.apply_expense(db, db_expense)
+    rollups.apply_expense(db, db_expense)
+    versions.bump(db, versions.EXPENSES, [user_id])
     db.commit()
     db.refresh(db_expense)
+    expenses_changed.send(user_id)
     return db_expense
 
+def _import_batch(db: Session, user_id: int, grade: int, batch):
+    ledger.lock(db, [(user_id, expense.category) for _, expense in batch])
+    days = {ledger.expense_day(expense.date) for _, expense in batch}
+    # One query loads the ledger rows of every day in the batch into the identity map
+    spent = {
+        (row.category, "daily", row.day): row.approved_total
+        for row in db.query(models.DailySpend).filter(
+            models.DailySpend.owner_id == user_id, models.DailySpend.day.in_(days)
+        )
+    }
+    # Likewise the rollup rows, which the loop below adds to per (day, category, status)
+    db.query(models.ExpenseRollup).filter(
+        models.ExpenseRollup.owner_id == user_id, models.ExpenseRollup.day.in_(days)
+    ).all()
+    compiled = policies.current(db)
+    approved = {}
+    rollup = {}
+    rows = []
+    # Same rule as create_user_expense, evaluated in date order
+    for row_number, expense in sorted(batch, key=lambda item: item[1].date):
+        day = ledger.expense_day(expense.date)
+        periods = []
+        for period, limit in zip(policies.PERIODS, compiled.limits(grade, expense.category)):
+            if limit is None:
+                continue
+            start, end = policies.period_bounds(period, day)
+            key = (expense.category, period, start)
+            if key not in spent:
+                # Weekly/monthly totals are read once per batch, then carried forward in memory
+                spent[key] = 0.0 if period == "daily" else ledger.get_approved_between(db, user_id, expense.category, start, end)
+            periods.append((key, limit))
+        status = "Approved" if all(expense.amount <= limit - spent[key] for key, limit in periods) else "Pending"
+        if status == "Approved":
+            for key, _ in periods:
+                spent[key] += expense.amount
+            approved[(expense.category, day)] = approved.get((expense.category, day), 0.0) + expense.amount
+        group = (day, expense.category, status)
+        total, count = rollup.get(group, (0.0, 0))
+        rollup[group] = (total + expense.amount, count + 1)
+        rows.append((row_number, dict(expense.dict(), owner_id=user_id, status=status)))
+    # Core multi-row insert; RETURNING in parameter order maps ids back to rows
+    ids = db.scalars(
+        insert(models.Expense).returning(models.Expense.id, sort_by_parameter_order=True),
+        [values for _, values in rows],
+    ).all()
+    for (category, day), amount in approved.items():
+        ledger.add(db, user_id, category, day, amount)
+    for (day, category, status), (total, count) in rollup.items():
+        rollups.add(db, user_id, day, category, status, total, count)
+    versions.bump(db, versions.EXPENSES, [user_id])
+    db.commit()
+    # Keep the session's identity map from growing with the import
+    db.expunge_all()
+    return sorted(
+        ({"row": n, "id": id_, "status": values["status"]} for (n, values), id_ in zip(rows, ids)),
+        key=lambda r: r["row"],
+    )
+
+def import_expenses(db: Session, user_id: int, rows, batch_size: int = 1000):
+    """Insert ``(row_number, ExpenseCreate | error message)`` pairs in batched transactions.
+
+    Yields one result dict per row, in row order. Rows are approved against the budget
+    policies in date order within each batch, so a date-sorted file is evaluated exactly
+    like the same expenses submitted one by one in date order.
+    """
+    grade = get_user(db, user_id).grade
+    batch, errors = [], []
+
+    def flush():
+        # Errors seen while the batch filled sit between its rows in the report
+        return sorted(_import_batch(db, user_id, grade, batch) + errors, key=lambda r: r["row"])
+
+    try:
+        for row_number, item in rows:
+            if isinstance(item, str):
+                error = {"row": row_number, "status": "Error", "error": item}
+                if batch:
+                    errors.append(error)
+                else:
+                    yield error
+                continue
+            batch.append((row_number, item))
+            if len(batch) == batch_size:
+                yield from flush()
+                batch, errors = [], []
+        if batch:
+            yield from flush()
+    finally:
+        expenses_changed.send(user_id)
+
 def create_user_chat(db: Session, chat: schemas.ChatCreate, user_id: int):
     db_chat = models.Chat(**chat.dict(), owner_id=user_id)
     db.add(db_chat)
+    versions.bump(db, versions.CHATS, [user_id])
     db.commit()
     db.refresh(db_chat)
-    db.refresh(db_chat)
+    # Push the committed row to any open chat streams of this user
+    chat_broker.publish(user_id, schemas.Chat.model_validate(db_chat).model_dump(mode="json"))
     return db_chat
 
+def get_chats(db: Session, user_id: int, since_id: int = None, limit: int = 100):
+    query = db.query(models.Chat).filter(models.Chat.owner_id == user_id)
+    if since_id is not None:
+        # Incremental fetch: the next page of messages after since_id, oldest first
+        return query.filter(models.Chat.id > since_id).order_by(models.Chat.id).limit(limit).all()
+    # Initial load: the most recent page, returned oldest first
+    return list(reversed(query.order_by(models.Chat.id.desc()).limit(limit).all()))
+
+def _load_hits(query, model, hits):
+    if not hits:
+        return []
+    rows = {row.id: row for row in query.filter(model.id.in_([id for id, _ in hits]))}
+    return [(rows[id], score) for id, score in hits if id in rows]
+
+def search_expenses(db: Session, words, owner_id: int = None, skip: int = 0, limit: int = 20):
+    """[(expense, score)] best match first; all owners when owner_id is None (admins)."""
+    hits = search.hits(db, "expenses", words, owner_id, skip, limit)
+    return _load_hits(db.query(models.Expense).options(joinedload(models.Expense.owner)), models.Expense, hits)
+
+def search_chats(db: Session, words, owner_id: int = None, skip: int = 0, limit: int = 20):
+    hits = search.hits(db, "chats", words, owner_id, skip, limit)
+    return _load_hits(db.query(models.Chat), models.Chat, hits)
+
 def delete_user_expense(db: Session, expense_id: int, user_id: int):
     expense = db.query(models.Expense).filter(models.Expense.id == expense_id, models.Expense.owner_id == user_id).first()
     if expense:
+        ledger.lock(db, [(user_id, expense.category)])
+        ledger.apply_expense(db, expense, sign=-1)
+        rollups.apply_expense(db, expense, sign=-1)
         db.delete(expense)
+        versions.bump(db, versions.EXPENSES, [user_id])
         db.commit()
+        expenses_changed.send(user_id)
         return True
     return False
 
+def get_user_expense(db: Session, expense_id: int, user_id: int = None):
+    """One expense by id; restricted to its owner unless user_id is None (admins)."""
+    query = db.query(models.Expense).filter(models.Expense.id == expense_id)
+    if user_id is not None:
+        query = query.filter(models.Expense.owner_id == user_id)
+    return query.first()
+
+def set_expense_receipt(db: Session, expense: models.Expense, sha256: str, content_type: str):
+    expense.receipt_hash = sha256
+    expense.receipt_content_type = content_type
+    expense.receipt_url = f"/expenses/{expense.id}/receipt"
+    versions.bump(db, versions.EXPENSES, [expense.owner_id])
+    db.commit()
+    db.refresh(expense)
+    expenses_changed.send(expense.owner_id)
+    return expense
+
 def update_user_expense(db: Session, expense_id: int, expense_update: schemas.ExpenseCreate, user_id: int):
     expense = db.query(models.Expense).filter(models.Expense.id == expense_id, models.Expense.owner_id == user_id).first()
     if not expense:
         return None
     
     user = get_user(db, user_id)
-    daily_limit = get_budget(user.grade)
-    
-    # Calculate sum of 'Approved' expenses for this category today, EXCLUDING the current expense being edited
-    expense_date_str = expense_update.date.strftime('%Y-%m-%d')
-    today_approved_expenses = db.query(models.Expense).filter(
-        models.Expense.owner_id == user_id,
-        models.Expense.category == expense_update.category,
-        models.Expense.status == "Approved",
-        models.Expense.id != expense_id
-    ).all()
-    
-    current_spent = sum(e.amount for e in today_approved_expenses if e.date.strftime('%Y-%m-%d') == expense_date_str)
-    
-    remaining_balance = daily_limit - current_spent
-    
-    if expense_update.amount <= remaining_balance:
+    limits = get_limits(db, user.grade, expense_update.category)
+    ledger.lock(db, [(user_id, expense.category), (user_id, expense_update.category)])
+
+    # Take the expense out of the ledger first so the lookup below excludes it
+    ledger.apply_expense(db, expense, sign=-1)
+    rollups.apply_expense(db, expense, sign=-1)
+    expense_day = ledger.expense_day(expense_update.date)
+    if _within_budget(db, user_id, limits, expense_update.category, expense_day, expense_update.amount):
         expense.status = "Approved"
     else:
         expense.status = "Pending"
@@ -147,7 +459,193 @@ def update_user_expense(db: Session, expense_id: int, expense_update: schemas.Ex
     expense.category = expense_update.category
     expense.description = expense_update.description
     expense.date = expense_update.date
+    ledger.apply_expense(db, expense)
+    rollups.apply_expense(db, expense)
+    versions.bump(db, versions.EXPENSES, [user_id])
 
     db.commit()
     db.refresh(expense)
+    expenses_changed.send(user_id)
     return expense
+
+def decide_pending_expenses(db: Session, status: str, selection: schemas.PendingSelection) -> schemas.PendingDecisionResult:
+    """Move every Pending expense matching ``selection`` to ``status`` ("Approved" or "Rejected").
+
+    One UPDATE ... RETURNING changes the rows; the returned (owner, day,
+    category, amount) tuples then adjust the ledger and rollups per group, all
+    in the same transaction. Approving is an admin override of the daily budget.
+    """
+    if selection.ids is None and not selection.model_dump(exclude={"ids"}, exclude_none=True):
+        raise ValueError("Select expenses by ids or at least one filter")
+    filters = _expense_filters(selection.date_from, selection.date_to, selection.category, "Pending", selection.owner_id)
+    if selection.ids is not None:
+        filters.append(models.Expense.id.in_(selection.ids))
+    if selection.grade is not None:
+        filters.append(models.Expense.owner_id.in_(select(models.User.id).where(models.User.grade == selection.grade)))
+    # Lock every affected (owner, category) before touching rows, in the same order as other ledger writers
+    keys = db.execute(select(models.Expense.owner_id, models.Expense.category).where(*filters).distinct()).all()
+    if not keys:
+        return schemas.PendingDecisionResult(status=status, updated=0, owners=0, total=0.0)
+    ledger.lock(db, keys)
+    filters.append(tuple_(models.Expense.owner_id, models.Expense.category).in_([tuple(k) for k in keys]))
+    changed = db.execute(
+        update(models.Expense).where(*filters).values(status=status)
+        .returning(models.Expense.owner_id, models.Expense.date, models.Expense.category, models.Expense.amount)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    groups = {}
+    for owner_id, expense_date, category, amount in changed:
+        key = (owner_id, ledger.expense_day(expense_date), category)
+        total, count = groups.get(key, (0.0, 0))
+        groups[key] = (total + amount, count + 1)
+    for (owner_id, day, category), (total, count) in groups.items():
+        rollups.add(db, owner_id, day, category, "Pending", -total, -count)
+        rollups.add(db, owner_id, day, category, status, total, count)
+        if status == "Approved":
+            ledger.add(db, owner_id, category, day, total)
+    owners = {owner_id for owner_id, _, _ in groups}
+    versions.bump(db, versions.EXPENSES, owners)
+    db.commit()
+    for owner_id in owners:
+        expenses_changed.send(owner_id)
+    return schemas.PendingDecisionResult(
+        status=status, updated=len(changed), owners=len(owners), total=round(sum(t for t, _ in groups.values()), 2)
+    )
+
+def _period_expr(db: Session, granularity: str, column=models.Expense.date):
+    # Bucket keys are ISO strings so both dialects group (and sort) identically:
+    # day -> YYYY-MM-DD, week -> YYYY-MM-DD of the Monday, month -> YYYY-MM
+    if db.bind.dialect.name == "postgresql":
+        if granularity == "week":
+            return func.to_char(func.date_trunc("week", column), "YYYY-MM-DD")
+        if granularity == "month":
+            return func.to_char(column, "YYYY-MM")
+        return func.to_char(column, "YYYY-MM-DD")
+    if granularity == "week":
+        return func.date(column, "weekday 0", "-6 days")
+    if granularity == "month":
+        return func.strftime("%Y-%m", column)
+    return func.strftime("%Y-%m-%d", column)
+
+def _expense_filters(date_from: date = None, date_to: date = None, category: str = None,
+                     status: str = None, owner_id: int = None, expense=models.Expense):
+    filters = []
+    if date_from:
+        filters.append(expense.date >= datetime.combine(date_from, time.min))
+    if date_to:
+        # date_to is inclusive of the whole day
+        filters.append(expense.date < datetime.combine(date_to + timedelta(days=1), time.min))
+    if category:
+        filters.append(expense.category == category)
+    if status:
+        filters.append(expense.status == status)
+    if owner_id:
+        filters.append(expense.owner_id == owner_id)
+    return filters
+
+def _buckets(rows):
+    return [
+        schemas.AnalyticsBucket(key=str(key), total=round(total or 0, 2), count=count,
+                                average=round((total or 0) / count, 2) if count else 0)
+        for key, total, count in rows
+    ]
+
+def _analytics_filters(expense, q: str = None, amount_min: float = None, amount_max: float = None):
+    # The admin table's search box and amount range, so the charts describe the same rows as the table
+    filters = []
+    if q:
+        owners = select(models.User.id).where(models.User.full_name.icontains(q, autoescape=True))
+        filters.append(or_(
+            expense.description.icontains(q, autoescape=True), expense.category.icontains(q, autoescape=True),
+            expense.status.icontains(q, autoescape=True), cast(expense.amount, String).contains(q, autoescape=True),
+            expense.owner_id.in_(owners),
+        ))
+    if amount_min is not None:
+        filters.append(expense.amount >= amount_min)
+    if amount_max is not None:
+        filters.append(expense.amount <= amount_max)
+    return filters
+
+def get_expense_analytics(db: Session, date_from: date = None, date_to: date = None, category: str = None,
+                          status: str = None, owner_id: int = None, granularity: str = "day", owner_limit: int = 50,
+                          q: str = None, amount_min: float = None, amount_max: float = None):
+    # Both tiers: history reaches into archived months
+    expense = archive.expenses()
+    filters = _expense_filters(date_from, date_to, category, status, owner_id, expense=expense)
+    filters += _analytics_filters(expense, q, amount_min, amount_max)
+    amount_sum = func.sum(expense.amount)
+    row_count = func.count(expense.id)
+
+    def grouped(key, *extra_filters):
+        return db.query(key, amount_sum, row_count).filter(*filters, *extra_filters).group_by(key)
+
+    total, count = db.query(amount_sum, row_count).filter(*filters).one()
+    total = total or 0
+
+    by_status = grouped(expense.status).order_by(amount_sum.desc()).all()
+    by_category = grouped(expense.category).order_by(amount_sum.desc()).all()
+    pending_by_category = grouped(expense.category, expense.status == "Pending").order_by(row_count.desc()).all()
+
+    period = _period_expr(db, granularity, expense.date)
+    by_period = grouped(period).order_by(period).all()
+
+    by_grade = (
+        db.query(models.User.grade, amount_sum, row_count)
+        .join(models.User, expense.owner_id == models.User.id)
+        .filter(*filters)
+        .group_by(models.User.grade)
+        .order_by(models.User.grade)
+        .all()
+    )
+
+    by_owner = (
+        db.query(models.User.id, models.User.full_name, models.User.email, models.User.grade, amount_sum, row_count)
+        .join(models.User, expense.owner_id == models.User.id)
+        .filter(*filters)
+        .group_by(models.User.id, models.User.full_name, models.User.email, models.User.grade)
+        .order_by(amount_sum.desc())
+        .limit(owner_limit)
+        .all()
+    )
+
+    # Grade averages: per employee avg per category -> avg of those -> avg per grade
+    per_category = (
+        db.query(expense.owner_id.label("owner_id"), func.avg(expense.amount).label("avg_amount"))
+        .filter(*filters)
+        .group_by(expense.owner_id, expense.category)
+        .subquery()
+    )
+    per_employee = (
+        db.query(per_category.c.owner_id.label("owner_id"), func.avg(per_category.c.avg_amount).label("avg_amount"))
+        .group_by(per_category.c.owner_id)
+        .subquery()
+    )
+    grade_employee_average = (
+        db.query(models.User.grade, func.count(per_employee.c.owner_id), func.avg(per_employee.c.avg_amount))
+        .join(models.User, per_employee.c.owner_id == models.User.id)
+        .group_by(models.User.grade)
+        .order_by(models.User.grade)
+        .all()
+    )
+
+    return schemas.ExpenseAnalytics(
+        total=round(total, 2),
+        count=count,
+        average=round(total / count, 2) if count else 0,
+        granularity=granularity,
+        by_status=_buckets(by_status),
+        by_category=_buckets(by_category),
+        pending_by_category=_buckets(pending_by_category),
+        by_grade=_buckets(by_grade),
+        grade_employee_average=[
+            schemas.GradeEmployeeAverage(grade=grade, employees=employees, average=round(avg or 0, 2))
+            for grade, employees, avg in grade_employee_average
+        ],
+        by_owner=[
+            schemas.OwnerAnalytics(owner_id=uid, full_name=full_name, email=email, grade=grade,
+                                   total=round(t or 0, 2), count=c, average=round((t or 0) / c, 2) if c else 0)
+            for uid, full_name, email, grade, t, c in by_owner
+        ],
+        by_period=_buckets(by_period),
+    )
@@ -0,0 +1,146 @@
+"""Daily approved-spend ledger.
+
+``daily_spend`` holds the sum of Approved expenses per (owner, category, day).
+crud keeps it up to date in the same transaction as every expense write, after
+taking ``lock`` so parallel submissions cannot both spend the same remaining
+budget. This module also recomputes it from the expenses of both tiers (see
+``app.crud.archive``) to repair or audit drift:
+
+    python -m app.crud.ledger verify
+    python -m app.crud.ledger rebuild
+"""
+import argparse
+import sys
+from datetime import date, datetime
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.db import models
+from app.crud import archive
+
+# Float sums accumulate rounding error, anything below this is not drift
+TOLERANCE = 0.005
+
+
+def lock(db: Session, keys):
+    """Serialize budget decisions and ledger writes per (owner, category) until the transaction ends.
+
+    Call before reading the totals a decision depends on. PostgreSQL takes a
+    transaction-scoped advisory lock per key (in sorted order, so two writers
+    never wait on each other crosswise); other keys proceed in parallel. SQLite
+    has a single writer anyway, so the transaction is started with BEGIN
+    IMMEDIATE to make the reads part of the write instead of racing it.
+    """
+    keys = sorted({(owner_id, category or "") for owner_id, category in keys})
+    if not keys:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        for owner_id, category in keys:
+            db.execute(select(func.pg_advisory_xact_lock(owner_id, func.hashtext(category))))
+    elif dialect == "sqlite":
+        conn = db.connection()
+        if not conn.connection.driver_connection.in_transaction:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+def expense_day(value: datetime) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+def get_approved_total(db: Session, owner_id: int, category: str, day: date) -> float:
+    row = db.get(models.DailySpend, (owner_id, category, day))
+    return row.approved_total if row else 0.0
+
+def get_approved_between(db: Session, owner_id: int, category: str, start: date, end: date) -> float:
+    """Approved total for one category over the inclusive day range, e.g. a week or month."""
+    db.flush()  # include ledger rows changed earlier in this transaction
+    return db.query(func.coalesce(func.sum(models.DailySpend.approved_total), 0.0)).filter(
+        models.DailySpend.owner_id == owner_id, models.DailySpend.category == category,
+        models.DailySpend.day >= start, models.DailySpend.day <= end,
+    ).scalar()
+
+def get_day_totals(db: Session, owner_id: int, day: date) -> dict:
+    """Approved totals per category for one user and day."""
+    rows = db.query(models.DailySpend).filter(
+        models.DailySpend.owner_id == owner_id, models.DailySpend.day == day
+    ).all()
+    return {row.category: row.approved_total for row in rows}
+
+def add(db: Session, owner_id: int, category: str, day: date, amount: float):
+    row = db.get(models.DailySpend, (owner_id, category, day))
+    if row is None:
+        row = models.DailySpend(owner_id=owner_id, category=category, day=day, approved_total=0.0)
+        db.add(row)
+        db.flush()  # make the new row visible to later lookups in this transaction
+    row.approved_total += amount
+    return row
+
+def apply_expense(db: Session, expense: models.Expense, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) an expense's contribution to the ledger."""
+    if expense.status == "Approved":
+        add(db, expense.owner_id, expense.category, expense_day(expense.date), sign * expense.amount)
+
+def _recompute(db: Session):
+    expense = archive.expenses()
+    day = func.date(expense.date)
+    rows = (
+        db.query(expense.owner_id, expense.category, day, func.sum(expense.amount))
+        .filter(expense.status == "Approved")
+        .group_by(expense.owner_id, expense.category, day)
+        .all()
+    )
+    expected = {}
+    for owner_id, category, d, total in rows:
+        if isinstance(d, str):  # SQLite returns date() as text
+            d = date.fromisoformat(d)
+        expected[(owner_id, category, d)] = total or 0.0
+    return expected
+
+def verify(db: Session):
+    """Return a list of (key, ledger_total, expected_total) for every drifted row."""
+    expected = _recompute(db)
+    actual = {
+        (r.owner_id, r.category, r.day): r.approved_total
+        for r in db.query(models.DailySpend).all()
+    }
+    drift = []
+    for key in sorted(expected.keys() | actual.keys(), key=lambda k: (k[0], k[1], k[2])):
+        have, want = actual.get(key, 0.0), expected.get(key, 0.0)
+        if abs(have - want) > TOLERANCE:
+            drift.append((key, have, want))
+    return drift
+
+def rebuild(db: Session) -> int:
+    expected = _recompute(db)
+    db.query(models.DailySpend).delete(synchronize_session=False)
+    db.add_all(
+        models.DailySpend(owner_id=owner_id, category=category, day=d, approved_total=total)
+        for (owner_id, category, d), total in expected.items()
+    )
+    db.commit()
+    return len(expected)
+
+
+def main(argv=None):
+    from app.db.database import SessionLocal, engine
+    from app.db import migrate
+
+    migrate.upgrade(engine)
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild the daily_spend ledger from expenses.")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        drift = verify(db)
+        for (owner_id, category, d), have, want in drift:
+            print(f"drift owner={owner_id} category={category} day={d}: ledger={have:.2f} expected={want:.2f}")
+        print(f"{len(drift)} drifted row(s)")
+        if args.command == "rebuild":
+            print(f"rebuilt {rebuild(db)} ledger row(s)")
+            return 0
+        return 1 if drift else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
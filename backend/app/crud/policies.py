@@ -0,0 +1,129 @@
+"""Budget policies: spending caps per (grade, category, period).
+
+``budget_policies`` rows are compiled into an in-process lookup, so an expense
+check costs a few dict probes instead of a query. A NULL grade or category
+matches any; for each period the most specific row wins, in the order
+(grade, category), (grade, any), (any, category), (any, any). A period with no
+matching row is uncapped.
+
+Every edit bumps the single ``budget_policy_version`` row in the same
+transaction. The editing process recompiles immediately; other workers compare
+versions at most every ``POLICY_RECHECK_SECONDS`` and recompile on a change.
+"""
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import NamedTuple, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.db import models
+
+PERIODS = ("daily", "weekly", "monthly")
+POLICY_RECHECK_SECONDS = float(os.environ.get("POLICY_RECHECK_SECONDS", "5"))
+# Seeded by the migration: the former hard-coded per-grade daily caps, 300 for any other grade
+DEFAULT_DAILY_LIMITS = {grade: grade * 100.0 for grade in range(1, 11)}
+DEFAULT_LIMIT = 300.0
+# Resolved (grade, category) pairs kept per compiled version; categories are free text
+MAX_RESOLVED = 10000
+
+reloads = metrics.Counter("budget_policy_reloads_total", "Times the budget policy table was recompiled")
+
+
+class Limits(NamedTuple):
+    daily: Optional[float] = None
+    weekly: Optional[float] = None
+    monthly: Optional[float] = None
+
+
+class CompiledPolicies:
+    def __init__(self, version: int, rows):
+        self.version = version
+        self._exact = {(row.grade, row.category, row.period): row.max_amount for row in rows}
+        self._resolved = {}
+        for grade, category, _ in self._exact:
+            self.limits(grade, category)
+
+    def _resolve(self, grade, category, period):
+        exact = self._exact
+        for key in ((grade, category, period), (grade, None, period), (None, category, period), (None, None, period)):
+            limit = exact.get(key)
+            if limit is not None:
+                return limit
+        return None
+
+    def limits(self, grade: Optional[int], category: Optional[str]) -> Limits:
+        key = (grade, category)
+        limits = self._resolved.get(key)
+        if limits is None:
+            limits = Limits(*(self._resolve(grade, category, period) for period in PERIODS))
+            if len(self._resolved) < MAX_RESOLVED:
+                self._resolved[key] = limits
+        return limits
+
+    def __len__(self):
+        return len(self._exact)
+
+
+_compiled = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+def read_version(db: Session) -> int:
+    return db.scalar(select(models.BudgetPolicyVersion.version).where(models.BudgetPolicyVersion.id == 1)) or 0
+
+def load(db: Session) -> CompiledPolicies:
+    """Compile every policy row and make the result current for this process."""
+    global _compiled
+    _compiled = CompiledPolicies(read_version(db), db.query(models.BudgetPolicy).all())
+    reloads.inc()
+    return _compiled
+
+def current(db: Session) -> CompiledPolicies:
+    """The compiled policies, reloaded from ``db`` only when the stored version has moved."""
+    global _checked_at
+    compiled = _compiled
+    if compiled is not None and time.monotonic() - _checked_at < POLICY_RECHECK_SECONDS:
+        return compiled
+    with _lock:
+        if _compiled is None or _compiled.version != read_version(db):
+            load(db)
+        _checked_at = time.monotonic()
+        return _compiled
+
+def cached_version() -> int:
+    """Version of the policies compiled in this process, without touching the database."""
+    compiled = _compiled
+    return compiled.version if compiled is not None else -1
+
+def invalidate():
+    # Force a version check on the next lookup
+    global _checked_at
+    _checked_at = 0.0
+
+def bump_version(db: Session):
+    """Mark the policies changed; call in the transaction that edits them."""
+    row = db.get(models.BudgetPolicyVersion, 1)
+    if row is None:
+        db.add(models.BudgetPolicyVersion(id=1, version=1))
+    else:
+        row.version += 1
+
+def period_bounds(period: str, day: date):
+    """(start, end) inclusive of the daily, Monday-based weekly or calendar monthly period containing ``day``."""
+    if period == "daily":
+        return day, day
+    if period == "weekly":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+def seed_defaults(db: Session):
+    db.add_all(
+        models.BudgetPolicy(grade=grade, category=None, period="daily", max_amount=limit)
+        for grade, limit in DEFAULT_DAILY_LIMITS.items()
+    )
+    db.add(models.BudgetPolicy(grade=None, category=None, period="daily", max_amount=DEFAULT_LIMIT))
+    bump_version(db)
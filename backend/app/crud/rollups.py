@@ -0,0 +1,136 @@
+"""Per-user expense rollups behind ``/expenses/summary``.
+
+``expense_rollups`` holds the count and total of a user's expenses per (day,
+category, status). crud updates it in the same transaction as every expense
+write, so the today / this week / this month summary reads at most a few dozen
+rows instead of the user's whole expense history. To repair or audit drift:
+
+    python -m app.crud.rollups verify
+    python -m app.crud.rollups rebuild
+"""
+import argparse
+import sys
+from datetime import date
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.db import models
+from app.crud import archive, policies
+from app.schemas import schemas
+from app.crud.ledger import TOLERANCE, expense_day
+
+# ExpenseSummary field -> policies period
+SUMMARY_PERIODS = {"today": "daily", "week": "weekly", "month": "monthly"}
+
+def add(db: Session, owner_id: int, day: date, category: str, status: str, amount: float, count: int = 1):
+    row = db.get(models.ExpenseRollup, (owner_id, day, category, status))
+    if row is None:
+        row = models.ExpenseRollup(owner_id=owner_id, day=day, category=category, status=status, total=0.0, count=0)
+        db.add(row)
+        db.flush()  # make the new row visible to later lookups in this transaction
+    row.total += amount
+    row.count += count
+    return row
+
+def apply_expense(db: Session, expense: models.Expense, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) an expense's contribution to the rollups."""
+    add(db, expense.owner_id, expense_day(expense.date), expense.category, expense.status, sign * expense.amount, sign)
+
+def _buckets(groups):
+    return [
+        schemas.AnalyticsBucket(key=key, total=round(total, 2), count=count, average=round(total / count, 2) if count else 0)
+        for key, (total, count) in sorted(groups.items())
+    ]
+
+def _period(start: date, end: date, rows) -> schemas.PeriodSummary:
+    by_category, by_status, approved = {}, {}, {}
+    for row in rows:
+        if not start <= row.day <= end or not row.count:
+            continue
+        for groups, key in ((by_category, row.category), (by_status, row.status)):
+            total, count = groups.get(key, (0.0, 0))
+            groups[key] = (total + row.total, count + row.count)
+        if row.status == "Approved":
+            approved[row.category] = round(approved.get(row.category, 0.0) + row.total, 2)
+    return schemas.PeriodSummary(
+        start=start, end=end,
+        total=round(sum(total for total, _ in by_status.values()), 2),
+        count=sum(count for _, count in by_status.values()),
+        by_category=_buckets(by_category), by_status=_buckets(by_status), approved_by_category=approved,
+    )
+
+def get_summary(db: Session, owner_id: int, today: date, daily_limit: float) -> schemas.ExpenseSummary:
+    bounds = {name: policies.period_bounds(period, today) for name, period in SUMMARY_PERIODS.items()}
+    first = min(start for start, _ in bounds.values())
+    last = max(end for _, end in bounds.values())
+    # One range read over the owner's rollup rows covering the week and month
+    rows = db.query(models.ExpenseRollup).filter(
+        models.ExpenseRollup.owner_id == owner_id,
+        models.ExpenseRollup.day >= first, models.ExpenseRollup.day <= last,
+    ).all()
+    return schemas.ExpenseSummary(daily_limit=daily_limit, **{name: _period(s, e, rows) for name, (s, e) in bounds.items()})
+
+def _recompute(db: Session):
+    # Both tiers: archived expenses still count towards their days
+    expense = archive.expenses()
+    day = func.date(expense.date)
+    rows = (
+        db.query(expense.owner_id, day, expense.category, expense.status,
+                 func.sum(expense.amount), func.count(expense.id))
+        .group_by(expense.owner_id, day, expense.category, expense.status)
+        .all()
+    )
+    expected = {}
+    for owner_id, d, category, status, total, count in rows:
+        if isinstance(d, str):  # SQLite returns date() as text
+            d = date.fromisoformat(d)
+        expected[(owner_id, d, category, status)] = (total or 0.0, count)
+    return expected
+
+def verify(db: Session):
+    """Return a list of (key, (total, count), expected (total, count)) for every drifted row."""
+    expected = _recompute(db)
+    actual = {(r.owner_id, r.day, r.category, r.status): (r.total, r.count) for r in db.query(models.ExpenseRollup).all()}
+    drift = []
+    for key in sorted(expected.keys() | actual.keys(), key=lambda k: (k[0], k[1], k[2] or "", k[3] or "")):
+        have, want = actual.get(key, (0.0, 0)), expected.get(key, (0.0, 0))
+        if abs(have[0] - want[0]) > TOLERANCE or have[1] != want[1]:
+            drift.append((key, have, want))
+    return drift
+
+def rebuild(db: Session) -> int:
+    expected = _recompute(db)
+    db.query(models.ExpenseRollup).delete(synchronize_session=False)
+    db.add_all(
+        models.ExpenseRollup(owner_id=owner_id, day=d, category=category, status=status, total=total, count=count)
+        for (owner_id, d, category, status), (total, count) in expected.items()
+    )
+    db.commit()
+    return len(expected)
+
+
+def main(argv=None):
+    from app.db.database import SessionLocal, engine
+    from app.db import migrate
+
+    migrate.upgrade(engine)
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild the expense_rollups table from expenses.")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        drift = verify(db)
+        for (owner_id, d, category, status), have, want in drift:
+            print(f"drift owner={owner_id} day={d} category={category} status={status}: "
+                  f"rollup={have[0]:.2f}/{have[1]} expected={want[0]:.2f}/{want[1]}")
+        print(f"{len(drift)} drifted row(s)")
+        if args.command == "rebuild":
+            print(f"rebuilt {rebuild(db)} rollup row(s)")
+            return 0
+        return 1 if drift else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
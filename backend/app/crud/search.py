@@ -0,0 +1,209 @@
+"""Full-text search over expense descriptions/categories and chat messages.
+
+SQLite indexes each table in a contentless FTS5 table (``expenses_fts``,
+``chats_fts``) kept in sync by triggers on every insert, update and delete, so
+bulk imports and raw SQL writes are covered as well as crud. The owner is
+indexed as one more token (``o<id>``) and an employee's search intersects its
+posting list instead of filtering the global match set. PostgreSQL keeps a
+stored generated ``search_vector`` tsvector per row with a GIN index.
+
+A query is reduced to its words, all required; the last one is matched as a
+prefix so results follow typing. Only the newest ``MAX_CANDIDATES`` matches
+are ranked, by term frequency per field (weighted, length-normalized: BM25
+without the IDF part, ts_rank_cd on PostgreSQL). Every hit contains every
+word, so IDF would barely reorder them, and FTS5's bm25() counts all rows
+containing each word on every query, which grows with the table. Matching and
+ranking therefore cost the same at millions of rows as at thousands.
+To repopulate the SQLite index (e.g. after restoring a copy without triggers):
+
+    python -m app.crud.search rebuild
+    python -m app.crud.search optimize
+"""
+import argparse
+import re
+import sys
+import unicodedata
+from sqlalchemy import func, literal_column, select, text
+from sqlalchemy.orm import Session
+from app.db import models
+
+MAX_CANDIDATES = 1000
+MAX_TERMS = 8
+# Dropped before matching: they would make every AND query miss (SQLite) or are ignored anyway (PostgreSQL)
+STOPWORDS = frozenset("a an and at by for from in is it my of on or the to with".split())
+TOKENIZER = "porter unicode61 remove_diacritics 2"
+# Prefix lengths indexed on their own, so a short partial word needs no doclist merge
+PREFIXES = "2 3 4"
+TS_CONFIG = "english"
+# Indexed columns per table, most important first; weights feed the score / setweight
+INDEXED = {
+    "expenses": (("description", 1.0, "A"), ("category", 0.5, "B")),
+    "chats": (("message", 1.0, "A"),),
+}
+TABLES = {"expenses": models.Expense.__table__, "chats": models.Chat.__table__}
+K1, B = 1.2, 0.75
+_WORD = re.compile(r"[^\W_]+")
+
+
+def _fold(value: str) -> str:
+    # Lower-case without accents, like the unicode61 tokenizer
+    if value.isascii():
+        return value.lower()
+    return "".join(c for c in unicodedata.normalize("NFKD", value.lower()) if not unicodedata.combining(c))
+
+def terms(q: str):
+    """Folded words of ``q`` without stopwords, duplicates or FTS syntax."""
+    words = []
+    for word in _WORD.findall(_fold(q)):
+        if word not in STOPWORDS and word not in words:
+            words.append(word)
+    return words[:MAX_TERMS]
+
+def _fts(table: str) -> str:
+    return f"{table}_fts"
+
+def _sqlite_install(conn):
+    for table, columns in INDEXED.items():
+        fts, names = _fts(table), [name for name, _, _ in columns]
+        # Contentless: the text lives only in the base table, the index holds postings and the owner token
+        conn.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{', '.join(names)}, owner, content='', tokenize='{TOKENIZER}', detail=column, prefix='{PREFIXES}')"
+        )
+        new = ", ".join(f"new.{name}" for name in names)
+        old = ", ".join(f"old.{name}" for name in names)
+        insert = f"INSERT INTO {fts}(rowid, {', '.join(names)}, owner) VALUES (new.id, {new}, 'o' || new.owner_id);"
+        delete = (f"INSERT INTO {fts}({fts}, rowid, {', '.join(names)}, owner) "
+                  f"VALUES ('delete', old.id, {old}, 'o' || old.owner_id);")
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END")
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END")
+        conn.exec_driver_sql(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {', '.join(names)}, owner_id ON {table} "
+            f"BEGIN {delete} {insert} END"
+        )
+
+def _postgres_install(conn):
+    for table, columns in INDEXED.items():
+        vector = " || ".join(
+            f"setweight(to_tsvector('{TS_CONFIG}', coalesce({name}, '')), '{label}')" for name, _, label in columns
+        )
+        conn.exec_driver_sql(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED"
+        )
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)")
+
+def install(conn):
+    """Create the text indexes and what keeps them in sync; safe to run twice."""
+    if conn.dialect.name == "postgresql":
+        _postgres_install(conn)
+    else:
+        _sqlite_install(conn)
+        with Session(bind=conn) as db:
+            rebuild(db)
+
+def rebuild(db: Session) -> int:
+    """Re-index every expense and chat (SQLite); returns the rows indexed. PostgreSQL derives its vectors itself."""
+    if db.get_bind().dialect.name == "postgresql":
+        return 0
+    indexed = 0
+    for table, columns in INDEXED.items():
+        fts, names = _fts(table), ", ".join(name for name, _, _ in columns)
+        db.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('delete-all')"))
+        indexed += db.execute(text(
+            f"INSERT INTO {fts}(rowid, {names}, owner) SELECT id, {names}, 'o' || owner_id FROM {table}"
+        )).rowcount
+    db.commit()
+    return indexed
+
+def optimize(db: Session):
+    """Merge the SQLite index segments; worth running after large imports."""
+    if db.get_bind().dialect.name != "postgresql":
+        for table in INDEXED:
+            db.execute(text(f"INSERT INTO {_fts(table)}({_fts(table)}) VALUES ('optimize')"))
+        db.commit()
+
+def _sqlite_match(table: str, words, owner_id: int = None) -> str:
+    columns = " ".join(name for name, _, _ in INDEXED[table])
+    # Words are [^\W_]+ only, so quoting them cannot inject FTS5 syntax
+    phrases = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    match = "{" + columns + "} : (" + " ".join(phrases) + ")"
+    if owner_id is not None:
+        match = f"owner : o{int(owner_id)} AND {match}"
+    return match
+
+def _matches(token: str, word: str) -> bool:
+    # The index stems words, this does not: "taxis" in a query still counts "taxi" in the text
+    return token.startswith(word) or (len(token) >= 3 and word.startswith(token))
+
+def _tokens(value) -> list:
+    return _WORD.findall(_fold(value or ""))
+
+def score(words, fields, average_lengths) -> float:
+    """Weighted, length-normalized term-frequency score of one row's ``fields`` ([(tokens, weight)])."""
+    total = 0.0
+    for (tokens, weight), average in zip(fields, average_lengths):
+        if not tokens:
+            continue
+        norm = K1 * (1 - B + B * len(tokens) / (average or 1))
+        for word in words:
+            tf = sum(1 for token in tokens if _matches(token, word))
+            total += weight * tf * (K1 + 1) / (tf + norm)
+    return total
+
+def _sqlite_hits(db: Session, table: str, words, owner_id: int = None):
+    fts, columns = _fts(table), INDEXED[table]
+    # Newest candidates first: FTS5 walks its doclists in rowid order and stops at the limit
+    rows = db.execute(text(
+        f"SELECT id, {', '.join(name for name, _, _ in columns)} FROM {table} WHERE id IN "
+        f"(SELECT rowid FROM {fts} WHERE {fts} MATCH :match ORDER BY rowid DESC LIMIT :candidates)"
+    ), {"match": _sqlite_match(table, words, owner_id), "candidates": MAX_CANDIDATES}).all()
+    if not rows:
+        return []
+    tokenized = [(row[0], [_tokens(value) for value in row[1:]]) for row in rows]
+    averages = [sum(len(fields[n]) for _, fields in tokenized) / len(rows) for n in range(len(columns))]
+    weights = [weight for _, weight, _ in columns]
+    return [(id, score(words, list(zip(fields, weights)), averages)) for id, fields in tokenized]
+
+def _postgres_hits(db: Session, table: str, words, owner_id: int = None, skip: int = 0, limit: int = 20):
+    base = TABLES[table]
+    vector = literal_column(f"{table}.search_vector")
+    query = func.to_tsquery(TS_CONFIG, " & ".join(words[:-1] + [f"{words[-1]}:*"]))
+    candidates = select(base.c.id, vector.label("search_vector")).where(vector.op("@@")(query))
+    if owner_id is not None:
+        candidates = candidates.where(base.c.owner_id == owner_id)
+    candidates = candidates.order_by(base.c.id.desc()).limit(MAX_CANDIDATES).subquery()
+    rank = func.ts_rank_cd(candidates.c.search_vector, query)
+    return db.execute(
+        select(candidates.c.id, rank).order_by(rank.desc(), candidates.c.id.desc()).offset(skip).limit(limit)
+    ).all()
+
+def hits(db: Session, table: str, words, owner_id: int = None, skip: int = 0, limit: int = 20):
+    """[(id, score)] of the ``limit`` best matches after ``skip``, best first; all owners when owner_id is None."""
+    if db.get_bind().dialect.name == "postgresql":
+        return [tuple(row) for row in _postgres_hits(db, table, words, owner_id, skip, limit)]
+    ranked = sorted(_sqlite_hits(db, table, words, owner_id), key=lambda hit: (-hit[1], -hit[0]))
+    return ranked[skip:skip + limit]
+
+def main(argv=None):
+    from app.db.database import SessionLocal, engine
+    from app.db import migrate
+
+    migrate.upgrade(engine)
+
+    parser = argparse.ArgumentParser(description="Maintain the full-text search index.")
+    parser.add_argument("command", choices=["rebuild", "optimize"])
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            print(f"indexed {rebuild(db)} row(s)")
+        else:
+            optimize(db)
+            print("optimized")
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
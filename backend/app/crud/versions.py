@@ -0,0 +1,45 @@
+"""Collection version stamps behind the list ETags.
+
+``collection_versions`` counts changes per (collection, owner). crud bumps the
+owner's counter in the same transaction as every write to that collection,
+plus owner ``ALL`` for collections admins list across owners. Endpoints read
+the counters before any row, so an unchanged collection is answered with
+``304 Not Modified`` from one primary-key lookup, in any worker process.
+"""
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from app.db import models
+
+ALL = 0
+EXPENSES, CHATS, USERS = "expenses", "chats", "users"
+# Collections with an admin-wide listing: every write also bumps the ALL counter
+SHARED = (EXPENSES, USERS)
+
+
+def bump(db: Session, collection: str, owner_ids):
+    """Count one change to ``collection`` for each owner; call before the write's commit."""
+    owners = sorted(set(owner_ids) | ({ALL} if collection in SHARED else set()))
+    if not owners:
+        return
+    table = models.CollectionVersion.__table__
+    # Only the dialect in use is imported (the PostgreSQL one costs ~40 ms at startup)
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    # One upsert in owner order, so concurrent writers lock the rows in the same sequence
+    db.execute(
+        insert(table).values([{"collection": collection, "owner_id": owner_id, "version": 1} for owner_id in owners])
+        .on_conflict_do_update(index_elements=[table.c.collection, table.c.owner_id], set_={"version": table.c.version + 1})
+    )
+
+def read(db: Session, keys):
+    """Versions of the (collection, owner_id) ``keys``, in order; 0 for a collection never written."""
+    table = models.CollectionVersion.__table__
+    # OR of key lookups: SQLite does not use the primary key for a row-value IN list
+    found = dict(((row.collection, row.owner_id), row.version) for row in db.execute(
+        select(table.c.collection, table.c.owner_id, table.c.version).where(or_(*(
+            and_(table.c.collection == collection, table.c.owner_id == owner_id) for collection, owner_id in keys
+        )))
+    ))
+    return tuple(found.get(key, 0) for key in keys)
@@ -1,7 +1,16 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.core import metrics
+
+# backend/.env, loaded before any setting is read; python-dotenv is imported only when the file exists
+ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".env")
+if os.path.exists(ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
 
 # Fetch database URL from environment, defaulting to local SQLite
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./expenses.db")
@@ -10,14 +19,92 @@ DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./expenses.db")
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-# PostgreSQL does not need "check_same_thread"
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+# Pool and engine tuning, all optional
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "0"))
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+_IN_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") in ("sqlite:", "sqlite+pysqlite:"))
+
+pool_checkout_seconds = metrics.Histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled database connection", ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+pool_checkout_timeouts = metrics.Counter(
+    "db_pool_checkout_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT", ["engine"]
+)
+
+
+class _TimedPoolMixin:
+    label = ""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_checkout_timeouts.inc(engine=self.label)
+            raise
+        finally:
+            pool_checkout_seconds.observe(time.perf_counter() - started, engine=self.label)
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    label = "sync"
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    label = "async"
+
+
+def _engine_options(url: str, pool_class) -> dict:
+    options = {}
+    if not _IN_MEMORY:
+        options.update(
+            poolclass=pool_class, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT, pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=DB_POOL_PRE_PING,
+        )
+    if IS_SQLITE:
+        # PostgreSQL does not need "check_same_thread"
+        options["connect_args"] = {"check_same_thread": False}
+    elif DB_STATEMENT_TIMEOUT_MS:
+        if "+asyncpg" in url:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers proceed while a writer commits; NORMAL is durable in WAL mode up to the last checkpoint
+    if not _IN_MEMORY:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, TimedQueuePool))
+if IS_SQLITE:
+    event.listen(engine, "connect", _sqlite_pragmas)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _pool_stat(name):
+    pool = engine.pool
+    return getattr(pool, name)() if hasattr(pool, name) else 0
+
+def _pool_saturation():
+    capacity = DB_POOL_SIZE + max(DB_MAX_OVERFLOW, 0)
+    return round(_pool_stat("checkedout") / capacity, 3) if capacity and not _IN_MEMORY else 0
+
+metrics.Gauge("db_pool_checked_out", "Connections currently checked out of the pool", function=lambda: _pool_stat("checkedout"))
+metrics.Gauge("db_pool_overflow", "Connections open beyond DB_POOL_SIZE", function=lambda: max(_pool_stat("overflow"), 0))
+metrics.Gauge("db_pool_saturation", "Checked-out connections / (DB_POOL_SIZE + DB_MAX_OVERFLOW)", function=_pool_saturation)
+
 Base = declarative_base()
 
 def get_db():
@@ -26,3 +113,30 @@ def get_db():
         yield db # yields the session to the endpoint/route
     finally:
         db.close() # closes a session
+
+
+# Optional async path for async endpoints: requires asyncpg (PostgreSQL) or aiosqlite (SQLite)
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+_async_engine = None
+_async_sessionmaker = None
+
+def async_database_url(url: str = DATABASE_URL) -> str:
+    scheme, _, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme.split('+')[0], scheme)}://{rest}"
+
+def get_async_engine():
+    """Build the AsyncEngine on first use so the async drivers stay optional."""
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+        url = async_database_url()
+        _async_engine = create_async_engine(url, **_engine_options(url, TimedAsyncQueuePool))
+        if IS_SQLITE:
+            event.listen(_async_engine.sync_engine, "connect", _sqlite_pragmas)
+        _async_sessionmaker = async_sessionmaker(_async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+async def get_async_db():
+    get_async_engine()
+    async with _async_sessionmaker() as db:
+        yield db
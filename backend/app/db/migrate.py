@@ -0,0 +1,199 @@
+"""Versioned schema migrations.
+
+Each migration runs once per database and is recorded in ``schema_migrations``.
+Steps are idempotent so they are safe on both fresh databases (where
+``create_all`` already produced the latest schema) and older ones. The app
+does not migrate on import; run this before starting it (or set
+``AUTO_MIGRATE=1`` to apply pending migrations at startup, for development).
+
+    python -m app.db.migrate            # apply pending migrations
+    python -m app.db.migrate --status   # list applied/pending migrations
+"""
+import argparse
+import sys
+from datetime import datetime
+from sqlalchemy import (Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, column, func,
+                        insert, inspect, select, table)
+from sqlalchemy.orm import Session
+from app.db import models
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_tables(conn):
+    models.Base.metadata.create_all(bind=conn)
+
+def _create_indexes(conn, table, *names):
+    # Only the named indexes: the live model may index columns a later migration adds
+    for index in table.indexes:
+        if index.name in names:
+            index.create(bind=conn, checkfirst=True)
+
+def _add_columns(conn, table, *names):
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name not in existing:
+            column = table.c[name]
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(conn.dialect)}")
+
+def _create_archive(conn):
+    for model in (models.ExpenseArchive, models.ChatArchive, models.ArchivedMonth):
+        model.__table__.create(bind=conn, checkfirst=True)
+
+# Historical backfills read the tables as they were when written, not through the live models
+_expenses_v1 = table("expenses", column("id"), column("amount"), column("category"), column("date"),
+                     column("status"), column("owner_id"))
+
+def _backfill_ledger(conn):
+    expenses, day = _expenses_v1, func.date(_expenses_v1.c.date)
+    daily_spend = table("daily_spend", column("owner_id"), column("category"), column("day"), column("approved_total"))
+    conn.execute(daily_spend.delete())
+    conn.execute(insert(daily_spend).from_select(
+        ["owner_id", "category", "day", "approved_total"],
+        select(expenses.c.owner_id, expenses.c.category, day, func.sum(expenses.c.amount))
+        .where(expenses.c.status == "Approved").group_by(expenses.c.owner_id, expenses.c.category, day),
+    ))
+
+def _create_rollups(conn):
+    models.ExpenseRollup.__table__.create(bind=conn, checkfirst=True)
+    expenses, day = _expenses_v1, func.date(_expenses_v1.c.date)
+    rollups = table("expense_rollups", column("owner_id"), column("day"), column("category"), column("status"),
+                    column("total"), column("count"))
+    conn.execute(rollups.delete())
+    conn.execute(insert(rollups).from_select(
+        ["owner_id", "day", "category", "status", "total", "count"],
+        select(expenses.c.owner_id, day, expenses.c.category, expenses.c.status,
+               func.sum(expenses.c.amount), func.count(expenses.c.id))
+        .group_by(expenses.c.owner_id, day, expenses.c.category, expenses.c.status),
+    ))
+
+def _create_budget_policies(conn):
+    from app.crud import policies
+    models.BudgetPolicy.__table__.create(bind=conn, checkfirst=True)
+    models.BudgetPolicyVersion.__table__.create(bind=conn, checkfirst=True)
+    with Session(bind=conn) as db:
+        if not db.query(models.BudgetPolicy).count():
+            policies.seed_defaults(db)
+            db.commit()
+
+def _create_search_index(conn):
+    from app.crud import search
+    search.install(conn)
+
+# expenses and chats as of migration 11, declared AUTOINCREMENT
+_tables_v11 = MetaData()
+Table("users", _tables_v11, Column("id", Integer, primary_key=True))
+_expenses_v11 = Table(
+    "expenses", _tables_v11,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("amount", Float), Column("category", String), Column("description", String), Column("date", DateTime),
+    Column("receipt_url", String), Column("receipt_hash", String(64), index=True), Column("receipt_content_type", String),
+    Column("status", String), Column("owner_id", Integer, ForeignKey("users.id")),
+    Index("ix_expenses_date_id", "date", "id"),
+    Index("ix_expenses_owner_date_id", "owner_id", "date", "id"),
+    Index("ix_expenses_owner_category_status_date", "owner_id", "category", "status", "date"),
+    sqlite_autoincrement=True,
+)
+_chats_v11 = Table(
+    "chats", _tables_v11,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("message", String), Column("is_support", Boolean), Column("timestamp", DateTime),
+    Column("owner_id", Integer, ForeignKey("users.id")),
+    Index("ix_chats_owner_id_id", "owner_id", "id"),
+    sqlite_autoincrement=True,
+)
+
+def _autoincrement_ids(conn):
+    # SQLite otherwise reissues max(id) + 1, which may be an id already archived; PostgreSQL sequences never go back
+    if conn.dialect.name != "sqlite":
+        return
+    from app.crud import search
+    for hot, cold in ((_expenses_v11, "expenses_archive"), (_chats_v11, "chats_archive")):
+        ddl = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (hot.name,)).scalar()
+        if "AUTOINCREMENT" not in ddl.upper():
+            # Rebuild: SQLite cannot add AUTOINCREMENT to an existing table; ids, and so the search index, carry over
+            names = ", ".join(hot.c.keys())
+            for index in inspect(conn).get_indexes(hot.name):
+                conn.exec_driver_sql(f"DROP INDEX {index['name']}")
+            conn.exec_driver_sql(f"ALTER TABLE {hot.name} RENAME TO {hot.name}_old")
+            hot.create(bind=conn)
+            conn.exec_driver_sql(f"INSERT INTO {hot.name} ({names}) SELECT {names} FROM {hot.name}_old")
+            conn.exec_driver_sql(f"DROP TABLE {hot.name}_old")
+        # Continue above every id either tier has seen, including archived rows whose hot successor is gone
+        top = conn.exec_driver_sql(f"SELECT max(id) FROM (SELECT id FROM {hot.name} UNION ALL SELECT id FROM {cold})").scalar()
+        conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (hot.name,))
+        conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (hot.name, top or 0))
+    search.install(conn)  # the search triggers went with the old tables
+
+MIGRATIONS = [
+    (1, "baseline tables", _create_tables),
+    (2, "expense and chat access-path indexes", lambda conn: (
+        _create_indexes(conn, models.Expense.__table__,
+                        "ix_expenses_date_id", "ix_expenses_owner_date_id", "ix_expenses_owner_category_status_date"),
+        _create_indexes(conn, models.Chat.__table__, "ix_chats_owner_id_id"))),
+    (3, "backfill daily_spend ledger", _backfill_ledger),
+    (4, "daily_spend owner/day index", lambda conn: _create_indexes(conn, models.DailySpend.__table__, "ix_daily_spend_owner_day")),
+    (5, "expense_rollups table and backfill", _create_rollups),
+    (6, "budget_policies table with the former per-grade daily caps", _create_budget_policies),
+    (7, "expense receipt hash and content type", lambda conn: (
+        _add_columns(conn, models.Expense.__table__, "receipt_hash", "receipt_content_type"),
+        _create_indexes(conn, models.Expense.__table__, "ix_expenses_receipt_hash"))),
+    (8, "full-text search index over expenses and chats", _create_search_index),
+    (9, "collection_versions table", lambda conn: models.CollectionVersion.__table__.create(bind=conn, checkfirst=True)),
+    (10, "expense and chat archive tiers", _create_archive),
+    (11, "AUTOINCREMENT expense and chat ids on SQLite", _autoincrement_ids),
+]
+
+
+def applied_versions(conn):
+    if not inspect(conn).has_table("schema_migrations"):
+        return set()
+    return {row.version for row in conn.execute(schema_migrations.select())}
+
+def pending(engine):
+    """Versions not yet applied to the database, in order."""
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+    return [version for version, _, _ in MIGRATIONS if version not in done]
+
+def upgrade(engine):
+    """Apply every pending migration, each in its own transaction. Returns the versions applied."""
+    with engine.begin() as conn:
+        _meta.create_all(bind=conn)
+    applied = []
+    for version, name, step in MIGRATIONS:
+        with engine.begin() as conn:
+            if version in applied_versions(conn):
+                continue
+            step(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.utcnow()))
+        applied.append(version)
+    return applied
+
+
+def main(argv=None):
+    from app.db.database import engine
+
+    parser = argparse.ArgumentParser(description="Apply pending database migrations.")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying them")
+    args = parser.parse_args(argv)
+
+    if args.status:
+        with engine.connect() as conn:
+            done = applied_versions(conn)
+        for version, name, _ in MIGRATIONS:
+            print(f"{'applied' if version in done else 'pending'}  {version:>3}  {name}")
+        return 0
+
+    applied = upgrade(engine)
+    print(f"applied {len(applied)} migration(s)" + (f": {', '.join(map(str, applied))}" if applied else ""))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
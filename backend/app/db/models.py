@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Date, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from datetime import datetime, timezone, timedelta
@@ -28,12 +28,26 @@ class Expense(Base):
     description = Column(String)
     date = Column(DateTime, default=datetime.utcnow)
     receipt_url = Column(String, nullable=True)
+    # Uploaded receipt: SHA-256 of the stored file (see app.core.receipts) and its type
+    receipt_hash = Column(String(64), nullable=True, index=True)
+    receipt_content_type = Column(String, nullable=True)
     # Validations will be handled in business logic, but status tracks approval
     status = Column(String, default="Pending") 
     owner_id = Column(Integer, ForeignKey("users.id"))
 
     owner = relationship("User", back_populates="expenses")
 
+    __table_args__ = (
+        # Admin listing: ORDER BY date DESC, id DESC
+        Index("ix_expenses_date_id", "date", "id"),
+        # Per-user listing and FinBot context: owner_id = ? ORDER BY date DESC, id DESC
+        Index("ix_expenses_owner_date_id", "owner_id", "date", "id"),
+        # Budget/ledger and analytics lookups: owner_id + category + status + date range
+        Index("ix_expenses_owner_category_status_date", "owner_id", "category", "status", "date"),
+        # SQLite would otherwise reissue max(id) + 1, possibly an id already moved to expenses_archive
+        {"sqlite_autoincrement": True},
+    )
+
 class Chat(Base):
     __tablename__ = "chats"
 
@@ -44,3 +58,112 @@ class Chat(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
 
     owner = relationship("User", back_populates="chats")
+
+    __table_args__ = (
+        Index("ix_chats_owner_id_id", "owner_id", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+class ExpenseArchive(Base):
+    # Cold tier of expenses: decided rows of closed months, moved out of `expenses` by
+    # app.crud.archive. Clustered on (date, id): monthly range partitions on PostgreSQL,
+    # a WITHOUT ROWID table on SQLite, with one secondary index instead of the hot table's four
+    __tablename__ = "expenses_archive"
+
+    date = Column(DateTime, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    amount = Column(Float)
+    category = Column(String)
+    description = Column(String)
+    receipt_url = Column(String, nullable=True)
+    receipt_hash = Column(String(64), nullable=True)
+    receipt_content_type = Column(String, nullable=True)
+    status = Column(String)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+
+    __table_args__ = (
+        # Per-user exports and analytics over archived months
+        Index("ix_expenses_archive_owner_date", "owner_id", "date"),
+        {"postgresql_partition_by": "RANGE (date)", "sqlite_with_rowid": False},
+    )
+
+class ChatArchive(Base):
+    # Cold tier of chats, like ExpenseArchive
+    __tablename__ = "chats_archive"
+
+    timestamp = Column(DateTime, primary_key=True)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    message = Column(String)
+    is_support = Column(Boolean, default=False)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+
+    __table_args__ = (
+        Index("ix_chats_archive_owner_timestamp", "owner_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)", "sqlite_with_rowid": False},
+    )
+
+class ArchivedMonth(Base):
+    # Rows moved to the cold tier per (collection, month); month is the first day
+    __tablename__ = "archived_months"
+
+    collection = Column(String, primary_key=True)
+    month = Column(Date, primary_key=True)
+    rows = Column(Integer, nullable=False, default=0)
+    archived_at = Column(DateTime, nullable=False)
+
+class DailySpend(Base):
+    # Running total of Approved expenses per (owner, category, day), kept in step
+    # with the expenses table by crud so budget checks are a single row lookup
+    __tablename__ = "daily_spend"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    category = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    approved_total = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        # All of a user's categories for one day (FinBot context, summaries)
+        Index("ix_daily_spend_owner_day", "owner_id", "day"),
+    )
+
+class ExpenseRollup(Base):
+    # Count and total of expenses per (owner, day, category, status), every status,
+    # kept in step with the expenses table by crud for the dashboard summary
+    __tablename__ = "expense_rollups"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+
+class BudgetPolicy(Base):
+    # Spending cap per (grade, category, period); a NULL grade or category matches
+    # any, and the most specific row wins. Compiled in memory by crud.policies
+    __tablename__ = "budget_policies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    grade = Column(Integer, nullable=True)
+    category = Column(String, nullable=True)
+    period = Column(String, nullable=False)  # daily | weekly | monthly
+    max_amount = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_budget_policies_grade_category_period", "grade", "category", "period"),
+    )
+
+class BudgetPolicyVersion(Base):
+    # Single row bumped with every policy edit so each process knows when to recompile
+    __tablename__ = "budget_policy_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class CollectionVersion(Base):
+    # Change counter per (collection, owner) behind list ETags; owner 0 counts changes to anyone's rows
+    __tablename__ = "collection_versions"
+
+    collection = Column(String, primary_key=True)
+    owner_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
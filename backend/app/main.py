@@ -1,12 +1,28 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.db.database import engine
-from app.db import models
-from app.api.endpoints import auth, users, expenses, chats
+from app.db import migrate
+from app.api.endpoints import auth, users, expenses, chats, analytics, metrics, policies, search
+from app.core import finbot, profiling
 
-models.Base.metadata.create_all(bind=engine)
+# Development convenience; deployments run `python -m app.db.migrate` before starting workers
+AUTO_MIGRATE = os.environ.get("AUTO_MIGRATE", "0") == "1"
 
-app = FastAPI(title="Expense Tracker API", description="API for the Expense Tracker App with modular architecture")
+profiling.instrument_engine(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if AUTO_MIGRATE:
+        migrate.upgrade(engine)
+    elif migrate.pending(engine):
+        raise RuntimeError("Database schema is out of date: run `python -m app.db.migrate` (or set AUTO_MIGRATE=1)")
+    await finbot.queue.start()
+    yield
+    await finbot.queue.stop()
+
+app = FastAPI(title="Expense Tracker API", description="API for the Expense Tracker App with modular architecture", lifespan=lifespan)
 
 # CORS configuration (Crucial for React frontend)
 origins = ["*"] # Allow all for demo
@@ -16,10 +32,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing", "ETag"],
 )
+# Per-route latency, queries per request and the optional Server-Timing breakdown
+app.add_middleware(profiling.ProfilingMiddleware)
 
 # Include Routers
 app.include_router(auth.router, tags=["Authentication"])
 app.include_router(users.router, prefix="/users", tags=["Users"])
+app.include_router(analytics.router, prefix="/expenses/analytics", tags=["Analytics"])
 app.include_router(expenses.router, prefix="/expenses", tags=["Expenses"])
 app.include_router(chats.router, prefix="/chats", tags=["Chats"])
+app.include_router(policies.router, prefix="/budget-policies", tags=["Budget Policies"])
+app.include_router(search.router, prefix="/search", tags=["Search"])
+app.include_router(metrics.router, tags=["Metrics"])
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Literal, Optional
+from datetime import date, datetime
 
 class ExpenseBase(BaseModel):
     amount: float
@@ -10,7 +10,11 @@ class ExpenseBase(BaseModel):
     date: datetime
 
 class ExpenseCreate(ExpenseBase):
-    pass
+    @field_validator("date")
+    @classmethod
+    def wall_clock_date(cls, value: datetime) -> datetime:
+        # Kept as the submitted wall-clock time without its offset: the day the user sees is the day it is budgeted on
+        return value.replace(tzinfo=None)
 
 class UserSummary(BaseModel):
     id: int
@@ -25,6 +29,8 @@ class Expense(ExpenseBase):
     id: int
     owner_id: int
     status: str
+    # Set when a receipt was uploaded to /expenses/{id}/receipt
+    receipt_content_type: Optional[str] = None
     owner: Optional[UserSummary] = None
 
     class Config:
@@ -74,9 +80,122 @@ class User(UserBase):
     class Config:
         from_attributes = True
 
+class UserMe(BaseModel):
+    # Every field is optional: /users/me only returns the fields and relations that were asked for
+    id: Optional[int] = None
+    full_name: Optional[str] = None
+    email: Optional[str] = None
+    grade: Optional[int] = None
+    expenses: Optional[List[Expense]] = None
+    chats: Optional[List[Chat]] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
 
 class TokenData(BaseModel):
+    user_id: Optional[int] = None
     email: Optional[str] = None
+
+class AnalyticsBucket(BaseModel):
+    key: str
+    total: float
+    count: int
+    average: float
+
+class OwnerAnalytics(BaseModel):
+    owner_id: int
+    full_name: Optional[str] = None
+    email: str
+    grade: int
+    total: float
+    count: int
+    average: float
+
+class GradeEmployeeAverage(BaseModel):
+    grade: int
+    employees: int
+    average: float # avg over employees of (avg over categories of that employee's avg expense)
+
+class ExpenseAnalytics(BaseModel):
+    total: float
+    count: int
+    average: float
+    granularity: str
+    by_status: List[AnalyticsBucket] = []
+    by_category: List[AnalyticsBucket] = []
+    pending_by_category: List[AnalyticsBucket] = []
+    by_grade: List[AnalyticsBucket] = []
+    grade_employee_average: List[GradeEmployeeAverage] = []
+    by_owner: List[OwnerAnalytics] = []
+    by_period: List[AnalyticsBucket] = []
+
+class PeriodSummary(BaseModel):
+    start: date
+    end: date # inclusive
+    total: float
+    count: int
+    by_category: List[AnalyticsBucket] = []
+    by_status: List[AnalyticsBucket] = []
+    approved_by_category: Dict[str, float] = {}
+
+class BudgetLimits(BaseModel):
+    # None means no cap for that period
+    daily: Optional[float] = None
+    weekly: Optional[float] = None
+    monthly: Optional[float] = None
+
+class ExpenseSummary(BaseModel):
+    # Default daily cap of the user's grade, and the full limits per category
+    daily_limit: Optional[float] = None
+    limits: Dict[str, BudgetLimits] = {}
+    today: PeriodSummary
+    week: PeriodSummary
+    month: PeriodSummary
+
+class PendingSelection(BaseModel):
+    # Pending expenses to act on: explicit ids and/or filters, combined with AND
+    ids: Optional[List[int]] = None
+    owner_id: Optional[int] = None
+    category: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    grade: Optional[int] = None
+
+class PendingDecisionResult(BaseModel):
+    status: str
+    updated: int
+    owners: int
+    total: float
+
+class BudgetPolicyBase(BaseModel):
+    # None matches any grade / category
+    grade: Optional[int] = None
+    category: Optional[str] = None
+    period: Literal["daily", "weekly", "monthly"] = "daily"
+    max_amount: float = Field(ge=0)
+
+class BudgetPolicyCreate(BudgetPolicyBase):
+    pass
+
+class BudgetPolicy(BudgetPolicyBase):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+class ExpenseHit(BaseModel):
+    # Higher scores are better matches; only comparable within one result list
+    score: float
+    expense: Expense
+
+class ChatHit(BaseModel):
+    score: float
+    chat: Chat
+
+class SearchResults(BaseModel):
+    query: str
+    # The words actually matched, each as a prefix
+    terms: List[str]
+    expenses: List[ExpenseHit] = []
+    chats: List[ChatHit] = []
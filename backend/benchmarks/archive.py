@@ -0,0 +1,127 @@
+"""Hot-query latency and hot-tier size before and after archiving closed months.
+
+Seeds a temporary database with ``--months`` of expense and chat history,
+times the hot paths (recent expenses for FinBot, first list pages, the chat
+window, summary, search, expense writes) plus analytics and exports that read
+both tiers, runs the archive job (``app.crud.archive``) with its progress
+output, and times everything again. On SQLite the bytes held by the hot tables,
+their indexes and the search index are reported from ``dbstat`` next to the
+archive's.
+
+    python -m benchmarks.archive
+    python -m benchmarks.archive --users 1000 --expenses-per-user 500 --months 24 --repeat 50
+    python -m benchmarks.archive --database-url postgresql://... --users 500
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.orm import Session
+from app.crud import archive, crud
+from app.db import migrate, models
+from app.schemas import schemas
+from benchmarks import seed
+
+HOT = ("expenses", "chats")
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def cases(user_id: int, today: date):
+    month_start = today.replace(day=1)
+    write = schemas.ExpenseCreate(amount=1, category="Other", description="archive benchmark", date=datetime.utcnow())
+    # (label, call); writes add one row per run in both phases
+    return [
+        ("recent expenses (FinBot)", lambda db: crud.get_recent_expenses(db, user_id)),
+        ("list expenses (user)", lambda db: crud.get_expenses(db, limit=100, user_id=user_id)),
+        ("list expenses (admin)", lambda db: crud.get_expenses(db, limit=100)),
+        ("chat window", lambda db: crud.get_chats(db, user_id)),
+        ("summary", lambda db: crud.get_expense_summary(db, user_id, 3, today)),
+        ("search 'taxi' (user)", lambda db: crud.search_expenses(db, ["taxi"], user_id)),
+        ("search 'taxi' (admin)", lambda db: crud.search_expenses(db, ["taxi"])),
+        ("create expense", lambda db: crud.create_user_expense(db, write, user_id)),
+        ("analytics this month (user)", lambda db: crud.get_expense_analytics(db, owner_id=user_id, date_from=month_start)),
+        ("analytics all time (user)", lambda db: crud.get_expense_analytics(db, owner_id=user_id)),
+        ("analytics this month (admin)", lambda db: crud.get_expense_analytics(db, date_from=month_start)),
+        ("export all time (user)", lambda db: sum(len(rows) for rows in crud.iter_expense_export(db, owner_id=user_id))),
+    ]
+
+def measure(engine, user_id: int, repeat: int):
+    results = {}
+    for label, run in cases(user_id, date.today()):
+        with Session(bind=engine) as db:
+            run(db)  # warm-up
+            results[label] = timed(lambda: run(db), repeat)
+    return results
+
+def tier_bytes(engine):
+    """(hot, cold) bytes of the expense and chat tables, indexes and search index; None off SQLite."""
+    if engine.dialect.name != "sqlite":
+        return None
+    with engine.connect() as conn:
+        owners = dict(conn.exec_driver_sql("SELECT name, tbl_name FROM sqlite_master").all())
+        sizes = conn.exec_driver_sql("SELECT name, sum(pgsize) FROM dbstat GROUP BY name").all()
+    hot = cold = 0
+    for name, size in sizes:
+        table = owners.get(name, name)
+        if table in HOT or table.startswith(tuple(f"{t}_fts" for t in HOT)):
+            hot += size
+        elif table in (f"{t}_archive" for t in HOT):
+            cold += size
+    return hot, cold
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh temporary SQLite file")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--expenses-per-user", type=int, default=400)
+    parser.add_argument("--chats-per-user", type=int, default=200)
+    parser.add_argument("--months", type=int, default=24, help="history seeded, ending today")
+    parser.add_argument("--keep-months", type=int, default=archive.ARCHIVE_KEEP_MONTHS)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'archive.db')}")
+    migrate.upgrade(engine)
+    days = args.months * 30
+    started = time.perf_counter()
+    seed.seed(engine, users=args.users, expenses_per_user=args.expenses_per_user,
+              chats_per_user=args.chats_per_user, days=days, chat_days=days)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"seeded {args.users * args.expenses_per_user} expenses and {args.users * args.chats_per_user} chats "
+          f"over {args.months} months in {time.perf_counter() - started:.0f}s")
+    with Session(bind=engine) as db:
+        user_id = db.scalar(select(models.User.id).where(models.User.grade != 0).order_by(models.User.id.desc()))
+
+    before, bytes_before = measure(engine, user_id, args.repeat), tier_bytes(engine)
+    started = time.perf_counter()
+    with Session(bind=engine) as db:
+        moved = archive.run(db, args.keep_months, progress=lambda collection, done, total:
+                            print(f"  archiving {collection:9} {done:>9}/{total} ({done / total:.0%})"))
+    print(f"archived {moved} in {time.perf_counter() - started:.1f}s "
+          f"(months before {archive.cutoff(date.today(), args.keep_months):%Y-%m})")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    after, bytes_after = measure(engine, user_id, args.repeat), tier_bytes(engine)
+
+    print(f"\n{'p50 (ms)':30} {'before':>8} {'after':>8} {'speedup':>8}")
+    for label in before:
+        print(f"{label:30} {before[label]:8.2f} {after[label]:8.2f} {before[label] / after[label]:7.1f}x")
+    if bytes_before:
+        print(f"\nhot tier {bytes_before[0] / 2**20:.1f} MB -> {bytes_after[0] / 2**20:.1f} MB, "
+              f"archive {bytes_after[1] / 2**20:.1f} MB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
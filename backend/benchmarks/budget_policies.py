@@ -0,0 +1,115 @@
+"""Budget policy evaluation cost as the policy table grows.
+
+Fills a temporary SQLite database with up to ``--policies`` rows (grade x
+category x period, plus grade-wide and global fallbacks), then times loading
+and compiling the table, a limit lookup per expense (memoized and first-time
+resolution) and the full approve/pending check against the ledger. The former
+hard-coded grade dict is timed alongside as the baseline. Lookup cost should
+stay flat from 100 to 10k policies.
+
+    python -m benchmarks.budget_policies
+    python -m benchmarks.budget_policies --policies 10000 --lookups 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+# Always a scratch database: the run replaces the whole policy table
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'policies.db')}"
+
+from app.crud import crud, policies
+from app.db import database, migrate, models
+from app.schemas import schemas
+
+LEGACY_BUDGETS = {1: 100, 2: 200, 3: 300, 4: 400, 5: 500, 6: 600, 7: 700, 8: 800, 9: 900, 10: 1000}
+
+
+def legacy_get_budget(grade: int) -> float:
+    # What crud.get_budget did before budget policies: rebuild the dict on every call
+    budgets = dict(LEGACY_BUDGETS)
+    return budgets.get(grade, 300.0)
+
+def fill(db, count: int, rng: random.Random):
+    """Replace the policy table with ``count`` rows; returns the (grade, category) pairs to look up."""
+    db.query(models.BudgetPolicy).delete()
+    categories = [f"Category{n}" for n in range(max(1, count // 30))]
+    grades = list(range(0, 11))
+    rows = {(None, None, "daily"): 300.0}
+    rows.update({(grade, None, "daily"): grade * 100.0 for grade in grades})
+    while len(rows) < count:
+        key = (rng.choice(grades + [None]), rng.choice(categories), rng.choice(policies.PERIODS))
+        rows[key] = float(rng.randrange(100, 5000))
+    db.add_all(
+        models.BudgetPolicy(grade=grade, category=category, period=period, max_amount=limit)
+        for (grade, category, period), limit in list(rows.items())[:count]
+    )
+    policies.bump_version(db)
+    db.commit()
+    return [(grade, category) for grade in grades for category in categories + ["Food", "Travel"]]
+
+def per_call(fn, args, repeat: int) -> float:
+    """Mean seconds per call of fn over ``repeat`` calls cycling through ``args``."""
+    n = len(args)
+    started = time.perf_counter()
+    for i in range(repeat):
+        fn(*args[i % n])
+    return (time.perf_counter() - started) / repeat
+
+def run(db, count: int, lookups: int, checks: int, user_id: int, rng: random.Random):
+    keys = fill(db, count, rng)
+    rng.shuffle(keys)
+
+    started = time.perf_counter()
+    compiled = policies.load(db)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    # First-time resolution of a (grade, category) pair: the fallback probes for every period, unmemoized
+    cold_ns = per_call(
+        lambda g, c: tuple(compiled._resolve(g, c, period) for period in policies.PERIODS), keys, lookups
+    ) * 1e9
+    warm_ns = per_call(compiled.limits, keys, lookups) * 1e9
+    current_ns = per_call(lambda g, c: policies.current(db).limits(g, c), keys, lookups) * 1e9
+
+    day = date.today()
+    check_args = [(g, c) for g, c in keys[:200]]
+    check_us = per_call(
+        lambda g, c: crud._within_budget(db, user_id, crud.get_limits(db, g, c), c, day, 50.0), check_args, checks
+    ) * 1e6
+    return {
+        "policies": len(compiled), "load_ms": load_ms, "cold_ns": cold_ns, "warm_ns": warm_ns,
+        "current_ns": current_ns, "check_us": check_us,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--policies", type=int, default=10000, help="largest policy table to time")
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--checks", type=int, default=2000, help="full budget checks (hit the ledger) per size")
+    parser.add_argument("--rng-seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    migrate.upgrade(database.engine)
+    rng = random.Random(args.rng_seed)
+    db = database.SessionLocal()
+    try:
+        user = crud.get_user_by_email(db, "policy-bench@example.com") or crud.create_user(
+            db, schemas.UserCreate(email="policy-bench@example.com", password="bench", full_name="Bench", grade=3)
+        )
+        legacy_ns = per_call(legacy_get_budget, [(g,) for g in range(12)], args.lookups) * 1e9
+        print(f"legacy get_budget dict: {legacy_ns:8.0f} ns/lookup (daily cap only)")
+        print(f"{'policies':>9} {'load+compile':>13} {'resolve':>10} {'memoized':>10} {'current()':>10} {'full check':>11}")
+        sizes = sorted({size for size in (100, 1000, args.policies) if size <= args.policies})
+        for size in sizes:
+            r = run(db, size, args.lookups, args.checks, user.id, rng)
+            print(f"{r['policies']:>9} {r['load_ms']:>10.1f} ms {r['cold_ns']:>7.0f} ns {r['warm_ns']:>7.0f} ns "
+                  f"{r['current_ns']:>7.0f} ns {r['check_us']:>8.1f} us")
+    finally:
+        db.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
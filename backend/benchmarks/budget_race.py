@@ -0,0 +1,114 @@
+"""Parallel expense submissions against the budget caps.
+
+Starts ``--threads`` workers that each submit expenses through
+``crud.create_user_expense`` with their own session, all aimed at a few
+(owner, category, day) keys so they contend for the same remaining budget.
+A weekly cap below seven daily caps is added so the week is checked too. At
+the end the Approved totals are summed from ``expenses`` and compared with
+every cap; the run fails if any cap was exceeded or the ledger drifted.
+
+``--without-lock`` replaces ``ledger.lock`` with a no-op to show the
+overshoot the lock prevents.
+
+    python -m benchmarks.budget_race
+    python -m benchmarks.budget_race --threads 16 --submissions 200 --keys 4
+    python -m benchmarks.budget_race --database-url postgresql://... --threads 32
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh temporary SQLite file")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--submissions", type=int, default=100, help="expenses per thread")
+    parser.add_argument("--keys", type=int, default=2, help="distinct (owner, category) pairs the threads share")
+    parser.add_argument("--days", type=int, default=3, help="days of the same week the expenses spread over")
+    parser.add_argument("--without-lock", action="store_true", help="disable ledger.lock to reproduce the race")
+    parser.add_argument("--rng-seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'race.db')}"
+    os.environ.setdefault("DB_POOL_SIZE", str(args.threads))
+    # Imported only now so the app binds to the database chosen above
+    from app.crud import crud, ledger, policies, rollups
+    from app.db import database, migrate, models
+    from app.schemas import schemas
+
+    if args.without_lock:
+        ledger.lock = lambda db, keys: None
+
+    migrate.upgrade(database.engine)
+    grade, daily, weekly = 5, 500.0, 1200.0
+    categories = ["Food", "Travel", "Supplies", "Other"]
+    with database.SessionLocal() as db:
+        crud.create_budget_policy(db, schemas.BudgetPolicyCreate(grade=grade, period="weekly", max_amount=weekly))
+        owners = []
+        for n in range((args.keys + len(categories) - 1) // len(categories)):
+            email = f"race{n}-{time.time_ns()}@example.com"
+            owners.append(crud.create_user(db, schemas.UserCreate(email=email, password="race", full_name="Race", grade=grade)).id)
+    keys = [(owners[n // len(categories)], categories[n % len(categories)]) for n in range(args.keys)]
+    # A Monday, so every expense lands in the same week
+    monday = datetime(2026, 1, 5, 9)
+    if policies.period_bounds("weekly", monday.date())[0] != monday.date():
+        raise SystemExit("start day must be a Monday")
+
+    errors = []
+    def worker(n):
+        rng = random.Random(args.rng_seed + n)
+        db = database.SessionLocal()
+        try:
+            for _ in range(args.submissions):
+                owner_id, category = rng.choice(keys)
+                expense = schemas.ExpenseCreate(
+                    amount=round(rng.uniform(5, 60), 2), category=category, description="race",
+                    date=monday + timedelta(days=rng.randrange(args.days), minutes=rng.randrange(600)),
+                )
+                try:
+                    crud.create_user_expense(db, expense, owner_id)
+                except Exception as e:  # e.g. SQLite busy timeout; counted, not fatal
+                    db.rollback()
+                    errors.append(repr(e))
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    submitted = args.threads * args.submissions - len(errors)
+
+    with database.SessionLocal() as db:
+        rows = db.query(models.Expense.owner_id, models.Expense.category, models.Expense.date, models.Expense.amount) \
+            .filter(models.Expense.owner_id.in_(owners), models.Expense.status == "Approved").all()
+        by_day, by_week = defaultdict(float), defaultdict(float)
+        for owner_id, category, date, amount in rows:
+            by_day[(owner_id, category, date.date())] += amount
+            by_week[(owner_id, category)] += amount
+        over = [(key, total, daily) for key, total in by_day.items() if total > daily + ledger.TOLERANCE]
+        over += [(key, total, weekly) for key, total in by_week.items() if total > weekly + ledger.TOLERANCE]
+        drift = len(ledger.verify(db)) + len(rollups.verify(db))
+
+    print(f"{database.engine.dialect.name}: {args.threads} threads, {submitted} expenses in {elapsed:.2f}s "
+          f"({submitted / elapsed:.0f}/s), {len(rows)} approved, {len(errors)} error(s)"
+          + ("  [lock disabled]" if args.without_lock else ""))
+    for key, total, cap in over:
+        print(f"OVER CAP  {key}: approved {total:.2f} > {cap:.2f}")
+    if errors:
+        print(f"first error: {errors[0]}")
+    print(f"{len(over)} cap(s) exceeded, {drift} drifted ledger/rollup row(s)")
+    return 1 if over or drift else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Diff two loadtest result files and flag regressions.
+
+Prints throughput and p50/p95/p99 latency per scenario (and operation with
+``--operations``) for a baseline and a candidate run, and exits 1 when any
+latency percentile grows or throughput drops by more than ``--threshold``.
+
+    python -m benchmarks.compare baseline.json current.json --threshold 0.15
+"""
+import argparse
+import json
+import sys
+
+METRICS = (("throughput_rps", "req/s", -1), ("p50_ms", "p50", 1), ("p95_ms", "p95", 1), ("p99_ms", "p99", 1))
+
+
+def _change(old, new):
+    return (new - old) / old if old else 0.0
+
+def compare_rows(name, old, new, threshold):
+    """Return (printable line, regressed metric names) for one scenario or operation."""
+    cells, regressed = [], []
+    for key, label, direction in METRICS:
+        change = _change(old[key], new[key])
+        if change * direction > threshold:
+            regressed.append(label)
+        cells.append(f"{label} {old[key]:>8.1f} -> {new[key]:>8.1f} ({change:+6.1%})")
+    marker = "REGRESSED" if regressed else "ok"
+    return f"{marker:9}  {name:22} " + "  ".join(cells), regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative change, default 0.10 (10%%)")
+    parser.add_argument("--operations", action="store_true", help="also compare individual operations")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    print(f"baseline {baseline['meta'].get('commit')}  candidate {candidate['meta'].get('commit')}  threshold {args.threshold:.0%}")
+    for key in ("database", "users", "expenses_per_user", "concurrency", "duration"):
+        if baseline["meta"].get(key) != candidate["meta"].get(key):
+            print(f"warning: runs differ in {key}: {baseline['meta'].get(key)} vs {candidate['meta'].get(key)}")
+
+    regressions = 0
+    for name, old in baseline["scenarios"].items():
+        new = candidate["scenarios"].get(name)
+        if new is None:
+            print(f"{'missing':9}  {name}")
+            continue
+        line, regressed = compare_rows(name, old, new, args.threshold)
+        regressions += bool(regressed)
+        print(line)
+        if args.operations:
+            for op, old_op in old.get("operations", {}).items():
+                if op in new.get("operations", {}):
+                    line, regressed = compare_rows(f"  {op}", old_op, new["operations"][op], args.threshold)
+                    regressions += bool(regressed)
+                    print(line)
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
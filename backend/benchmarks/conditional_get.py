@@ -0,0 +1,113 @@
+"""Bytes and CPU per list request: full responses, compression and 304s.
+
+Seeds a temporary SQLite database, then for ``/expenses/``, ``/users/`` and
+``/chats/``:
+
+* CPU without the HTTP stack: encoding 100 loaded rows the former way
+  (validate into Pydantic models, dump JSON) and directly; the former handler
+  (query + encode) against a changed list (version lookup + query + encode)
+  and an unchanged one (version lookup alone);
+* wire bytes and process CPU per request through the app for an uncompressed
+  response, gzip, brotli (when installed) and a conditional repeat (304).
+
+    python -m benchmarks.conditional_get
+    python -m benchmarks.conditional_get --requests 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'conditional.db')}"
+
+from typing import List
+from pydantic import TypeAdapter
+from fastapi.testclient import TestClient
+from app.crud import crud, versions
+from app.core import responses
+from app.db import migrate
+from app.db.database import SessionLocal, engine
+from app.main import app
+from app.schemas import schemas
+from benchmarks import seed
+
+
+def cpu_us(fn, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) / repeat * 1e6
+
+def handler_cases(db, admin_id: int):
+    """(path, schema, rows loader, version keys) for each list endpoint, as an admin sees it."""
+    return [
+        ("/expenses/", schemas.Expense, lambda: crud.get_expenses(db, limit=100),
+         [(versions.EXPENSES, versions.ALL), (versions.USERS, versions.ALL)]),
+        ("/users/", schemas.UserSummary, lambda: crud.get_users(db, limit=100), [(versions.USERS, versions.ALL)]),
+        ("/chats/", schemas.Chat, lambda: crud.get_chats(db, admin_id), [(versions.CHATS, admin_id)]),
+    ]
+
+def handler_cpu(db, model, load, keys, repeat: int):
+    """CPU us of: encoding before/after on loaded rows, then whole handlers before, changed and unchanged (304)."""
+    adapter = TypeAdapter(List[model])
+    before = lambda rows: adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+    after = lambda rows: responses.dumps([responses.dump(row, model) for row in rows])
+    rows = load()
+    return [
+        cpu_us(lambda: before(rows), repeat),
+        cpu_us(lambda: after(rows), repeat),
+        cpu_us(lambda: before(load()), repeat),
+        cpu_us(lambda: (versions.read(db, keys), after(load())), repeat),
+        cpu_us(lambda: versions.read(db, keys), repeat),
+    ]
+
+def wire(client, headers, path: str, requests: int):
+    """[(mode, wire bytes, CPU us)] per request for each way of fetching ``path``."""
+    modes = [("identity", "identity"), ("gzip", "gzip")]
+    if responses.brotli_available():
+        modes.append(("br", "br"))
+    results = []
+    for mode, encoding in modes:
+        request_headers = {**headers, "Accept-Encoding": encoding}
+        # Content-Length is the size on the wire; the client hands back decompressed content
+        size = int(client.get(path, headers=request_headers).headers["Content-Length"])
+        results.append((mode, size, cpu_us(lambda: client.get(path, headers=request_headers), requests)))
+    tag = client.get(path, headers=headers).headers["ETag"]
+    conditional = {**headers, "If-None-Match": tag}
+    response = client.get(path, headers=conditional)
+    assert response.status_code == 304, response.status_code
+    results.append(("304", int(response.headers.get("Content-Length", 0)), cpu_us(lambda: client.get(path, headers=conditional), requests)))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="requests per measurement")
+    args = parser.parse_args(argv)
+
+    migrate.upgrade(engine)
+    with TestClient(app) as client:
+        seed.seed(engine, users=200, expenses_per_user=50, chats_per_user=40)
+        email = "user50@example.com"  # every 50th seeded user is an admin
+        token = client.post("/token", data={"username": email, "password": seed.PASSWORD}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        client.get("/users/me", headers=headers)
+        orjson = "orjson" if responses.orjson_available() else "json module"
+
+        with SessionLocal() as db:
+            admin_id = crud.get_user_by_email(db, email).id
+            print(f"handler CPU per request (us), encoder: {orjson}")
+            print(f"{'path':12} {'encode before':>14} {'after':>8} {'handler before':>15} {'changed':>8} {'304':>8}")
+            for path, model, load, keys in handler_cases(db, admin_id):
+                cpu = handler_cpu(db, model, load, keys, args.requests)
+                print(f"{path:12} {cpu[0]:14.0f} {cpu[1]:8.0f} {cpu[2]:15.0f} {cpu[3]:8.0f} {cpu[4]:8.0f}")
+
+        print("\nthrough the app, per request")
+        print(f"{'path':12} {'mode':>8} {'bytes':>8} {'CPU us':>8}")
+        for path in ("/expenses/", "/users/", "/chats/"):
+            for mode, size, cpu in wire(client, headers, path, args.requests):
+                print(f"{path:12} {mode:>8} {size:>8} {cpu:8.0f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
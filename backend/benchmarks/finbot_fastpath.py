@@ -0,0 +1,73 @@
+"""Report how many FinBot messages the local rules answer and the latency of each path.
+
+Sends a corpus of typical chat messages through the real app (temporary
+SQLite database, fake Gemini client with simulated latency) and prints the
+share answered locally plus mean reply latency per path. Fails if the local
+rules would log any of ``LLM_ONLY`` (negated or dated messages) themselves.
+
+    python -m benchmarks.finbot_fastpath --llm-latency 1.0
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'finbot.db')}"
+
+from fastapi.testclient import TestClient
+from app.core import finbot, intents
+from app.db import database, migrate
+from app.main import app
+
+MESSAGES = [
+    "Spent 200 on travel", "I ate lunch for 150", "Expense: Food 90", "taxi 120", "paid 45 for coffee",
+    "bought printer paper for 300", "What is my limit?", "How much did I spend today?", "How much is left?",
+    "Show my last 3 expenses", "what's my budget?", "show recent expenses",
+    "Can you summarize my spending this month?", "Why was my travel claim pending?",
+    "lunch with team cost 300 and taxi 200", "Is a hotel stay covered?", "hi", "thanks!",
+]
+# Expense-shaped, but logging them as today's expense would be wrong
+LLM_ONLY = [
+    "I didn't spend 200 on food", "never paid 50 for parking", "not 300 for taxi, it was 250",
+    "spent 300 on taxi yesterday", "paid 120 for lunch last friday", "spent 400 on fuel last week",
+    "taxi 150 on 12/10", "bought pens for 60 on 3rd",
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="simulated Gemini latency in seconds")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    finbot.set_client_factory(lambda client=finbot.FakeGeminiClient(latency=args.llm_latency): client)
+    migrate.upgrade(database.engine)
+    with TestClient(app) as client:
+        client.post("/users/", json={"email": "bench@example.com", "password": "pw", "full_name": "Bench", "grade": 5})
+        token = client.post("/token", data={"username": "bench@example.com", "password": "pw"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        for _ in range(args.rounds):
+            for message in MESSAGES + LLM_ONLY:
+                client.post("/chats/", json={"message": message}, headers=headers)
+        # Wait for queued LLM replies to be stored
+        deadline = time.time() + 60
+        while finbot.queue.pending and time.time() < deadline:
+            time.sleep(0.05)
+
+    local, llm = finbot.messages_by_path.value(path="local"), finbot.messages_by_path.value(path="llm")
+    total = local + llm
+    print(f"messages: {total}  local: {local} ({local / total:.0%})  llm: {llm} ({llm / total:.0%})")
+    for path in ("local", "llm"):
+        stats = finbot.reply_seconds.value(path=path)
+        if stats["count"]:
+            print(f"{path:5}  mean reply latency {stats['sum'] / stats['count'] * 1000:8.1f} ms over {stats['count']} message(s)")
+    logged = [message for message in LLM_ONLY if intents.parse_expense(message)]
+    for message in logged:
+        print(f"  LOGGED LOCALLY: {message!r}")
+    print(f"{len(logged)} of {len(LLM_ONLY)} negated/dated message(s) logged by the local rules")
+    return 1 if logged else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""Load test of the real app under realistic request mixes.
+
+Seeds a database at the requested scale (users x expenses x chats), then
+drives ``app.main:app`` in process through an ASGI client with ``--concurrency``
+virtual users per scenario, and writes throughput and p50/p95/p99 latency per
+scenario and operation to a JSON file that ``benchmarks.compare`` can diff
+between commits. FinBot runs against the fake Gemini client.
+
+    python -m benchmarks.loadtest --output baseline.json
+    python -m benchmarks.loadtest --database-url postgresql://... --users 2000 --output pg.json
+    python -m benchmarks.compare baseline.json current.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+SCENARIOS = ("dashboard", "expenses", "chat_poll", "login", "finbot", "mixed")
+# Share of virtual-user iterations per scenario in the "mixed" run
+MIX = {"dashboard": 50, "chat_poll": 30, "expenses": 15, "finbot": 4, "login": 1}
+CATEGORIES = ["Food", "Travel", "Supplies", "Other"]
+FINBOT_MESSAGES = [
+    "Spent 120 on travel", "lunch 80", "What is my limit?", "How much did I spend today?",
+    "Show my last 3 expenses", "Can you summarize my spending this month?", "Is a hotel stay covered?",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+def summarize(samples, errors, elapsed):
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+    }
+
+
+class VirtualUser:
+    def __init__(self, user_id: int, email: str, password: str, grade: int, token: str, rng: random.Random):
+        self.user_id = user_id
+        self.email = email
+        self.password = password
+        self.grade = grade
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.rng = rng
+        self.last_chat_id = 0
+        self.expense_ids = []
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, name, request):
+        started = time.perf_counter()
+        response = await request
+        self.samples[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+
+async def dashboard(client, user, rec):
+    await rec.call("dashboard:me", client.get("/users/me", headers=user.headers))
+    await rec.call("dashboard:expenses", client.get("/expenses/?limit=50", headers=user.headers))
+    if user.grade == 0:
+        await rec.call("dashboard:analytics", client.get("/expenses/analytics/", headers=user.headers))
+
+async def expenses(client, user, rec):
+    body = {
+        "amount": round(user.rng.uniform(10, 400), 2), "category": user.rng.choice(CATEGORIES),
+        "description": "Load test expense", "date": (datetime.utcnow() - timedelta(days=user.rng.randrange(30))).isoformat(),
+    }
+    response = await rec.call("expenses:create", client.post("/expenses/", json=body, headers=user.headers))
+    if response.status_code == 200:
+        user.expense_ids.append(response.json()["id"])
+    if user.expense_ids:
+        body["amount"] = round(body["amount"] * 0.9, 2)
+        await rec.call("expenses:update", client.put(f"/expenses/{user.rng.choice(user.expense_ids)}", json=body, headers=user.headers))
+
+async def chat_poll(client, user, rec):
+    response = await rec.call("chat_poll:since", client.get(f"/chats/?since_id={user.last_chat_id}&limit=100", headers=user.headers))
+    if response.status_code == 200 and response.json():
+        user.last_chat_id = response.json()[-1]["id"]
+
+async def login(client, user, rec):
+    await rec.call("login:token", client.post("/token", data={"username": user.email, "password": user.password}))
+
+async def finbot(client, user, rec):
+    message = user.rng.choice(FINBOT_MESSAGES)
+    await rec.call("finbot:message", client.post("/chats/", json={"message": message}, headers=user.headers))
+
+OPERATIONS = {"dashboard": dashboard, "expenses": expenses, "chat_poll": chat_poll, "login": login, "finbot": finbot}
+
+
+async def run_scenario(client, name, users, concurrency, duration, rng):
+    rec = Recorder()
+    weights = list(MIX.items())
+    deadline = time.perf_counter() + duration
+
+    async def worker(n):
+        while time.perf_counter() < deadline:
+            user = users[rng.randrange(len(users))]
+            if name == "mixed":
+                op = rng.choices([w[0] for w in weights], [w[1] for w in weights])[0]
+            else:
+                op = name
+            await OPERATIONS[op](client, user, rec)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    all_samples = [s for samples in rec.samples.values() for s in samples]
+    result = summarize(all_samples, sum(rec.errors.values()), elapsed)
+    result["operations"] = {op: summarize(samples, rec.errors[op], elapsed) for op, samples in sorted(rec.samples.items())}
+    return result
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def _drive(app, args, users):
+    import httpx
+    from app.core import finbot
+
+    finbot.set_client_factory(lambda client=finbot.FakeGeminiClient(latency=args.llm_latency): client)
+    rng = random.Random(args.rng_seed)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            for name in args.scenarios:
+                if args.warmup:
+                    await run_scenario(client, name, users, args.concurrency, args.warmup, rng)
+                results[name] = await run_scenario(client, name, users, args.concurrency, args.duration, rng)
+                r = results[name]
+                print(f"{name:10} {r['requests']:6} req  {r['throughput_rps']:8.1f} req/s  "
+                      f"p50 {r['p50_ms']:7.1f}  p95 {r['p95_ms']:7.1f}  p99 {r['p99_ms']:7.1f} ms  errors {r['errors']}")
+            await finbot.queue.wait_idle()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh temporary SQLite file")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--expenses-per-user", type=int, default=200)
+    parser.add_argument("--chats-per-user", type=int, default=50)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"comma separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=10, help="virtual users per scenario")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fake Gemini latency in seconds")
+    parser.add_argument("--rng-seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+    # Every virtual user connects from the same address; measure login cost, not the per-IP limiter
+    os.environ.setdefault("LOGIN_MAX_CONCURRENT_PER_IP", str(args.concurrency))
+    # Imported only now so the app binds to the database chosen above
+    from app.core import security
+    from app.db import database, migrate, models
+    from app.main import app
+    from benchmarks import seed
+
+    migrate.upgrade(database.engine)
+    if not seed.is_seeded(database.engine):
+        seed.seed(database.engine, users=args.users, expenses_per_user=args.expenses_per_user,
+                  chats_per_user=args.chats_per_user, rng_seed=args.rng_seed)
+    with database.SessionLocal() as db:
+        rows = db.query(models.User.id, models.User.email, models.User.grade).order_by(models.User.id).limit(args.users).all()
+    rng = random.Random(args.rng_seed)
+    users = [
+        VirtualUser(uid, email, seed.PASSWORD, grade, security.create_access_token({"sub": str(uid), "email": email}), random.Random(rng.random()))
+        for uid, email, grade in rows
+    ]
+
+    results = asyncio.run(_drive(app, args, users))
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "database": database.engine.dialect.name,
+            "users": args.users, "expenses_per_user": args.expenses_per_user, "chats_per_user": args.chats_per_user,
+            "concurrency": args.concurrency, "duration": args.duration, "llm_latency": args.llm_latency,
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
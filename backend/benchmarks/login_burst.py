@@ -0,0 +1,116 @@
+"""Measure non-auth request latency while the server absorbs a burst of logins.
+
+Starts uvicorn on a temporary SQLite database, then samples ``GET /users/me``
+latency twice: once idle and once while ``--burst`` concurrent clients hammer
+``POST /token``. bcrypt runs on the bounded hashing pool, so p99 of the
+non-auth requests should stay close to the idle baseline.
+
+    python -m benchmarks.login_burst --burst 50 --duration 5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'login_burst.db')}"
+
+import httpx
+
+from app.db import database, migrate
+from benchmarks import seed as seeding
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+def _summary(samples):
+    return {p: _percentile(samples, p) * 1000 for p in (50, 95, 99)}
+
+async def _sample(client, headers, duration, interval):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/users/me", headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return latencies
+
+async def _login_loop(client, user_ids, stop, outcomes):
+    i = 0
+    while not stop.is_set():
+        email = f"user{user_ids[i % len(user_ids)]}@example.com"
+        response = await client.post("/token", data={"username": email, "password": seeding.PASSWORD})
+        outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+        i += 1
+
+async def _run(base_url, args):
+    limits = httpx.Limits(max_connections=args.burst + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        token = (await client.post("/token", data={"username": "user1@example.com", "password": seeding.PASSWORD})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        await client.get("/users/me", headers=headers)
+
+        idle = await _sample(client, headers, args.duration, args.interval)
+
+        stop, outcomes = asyncio.Event(), {}
+        users = list(range(2, args.users + 1))
+        burst = [asyncio.create_task(_login_loop(client, users[n::args.burst] or users, stop, outcomes)) for n in range(args.burst)]
+        loaded = await _sample(client, headers, args.duration, args.interval)
+        stop.set()
+        await asyncio.gather(*burst)
+    return idle, loaded, outcomes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--burst", type=int, default=50, help="concurrent login clients")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per sampling phase")
+    parser.add_argument("--ip-limit", type=int, default=None,
+                        help="LOGIN_MAX_CONCURRENT_PER_IP for the server (default: --burst, since every client shares 127.0.0.1)")
+    parser.add_argument("--interval", type=float, default=0.01, help="pause between /users/me samples")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ, LOGIN_MAX_CONCURRENT_PER_IP=str(args.ip_limit or args.burst))
+    migrate.upgrade(database.engine)
+    seeding.seed(database.engine, users=args.users, expenses_per_user=5, chats_per_user=0)
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"], env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                httpx.get(f"{base_url}/metrics", timeout=1)
+                break
+            except httpx.TransportError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.2)
+        idle, loaded, outcomes = asyncio.run(_run(base_url, args))
+    finally:
+        server.terminate()
+        server.wait()
+
+    for label, samples in (("idle", idle), (f"burst x{args.burst}", loaded)):
+        stats = _summary(samples)
+        print(f"/users/me {label:12} n={len(samples):5}  p50 {stats[50]:7.1f} ms  p95 {stats[95]:7.1f} ms  p99 {stats[99]:7.1f} ms")
+    print("login responses:", ", ".join(f"{code}: {count}" for code, count in sorted(outcomes.items())))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
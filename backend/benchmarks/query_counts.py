@@ -0,0 +1,78 @@
+"""Per-request SQL query budget check.
+
+Drives the real app through the ASGI test client against a seeded temporary
+SQLite database, counts the statements each request executes and fails when
+an endpoint exceeds its budget (e.g. an N+1 lazy load creeping back in).
+
+    python -m benchmarks.query_counts
+"""
+import os
+import sys
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'counts.db')}"
+
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+from app.db import migrate
+from app.db.database import engine
+from app.main import app
+from benchmarks import seed
+
+# (path, max statements) per request, measured after warm-up requests so
+# authentication is served from the token/user cache and budget policies are compiled.
+# List endpoints read their collection versions first, one statement on top of the rows.
+BUDGETS = [
+    ("/users/me", 0),
+    ("/users/me?fields=email,grade", 0),
+    ("/users/me?include=expenses", 2),
+    ("/users/me?include=expenses,chats", 3),
+    ("/users/?limit=100", 2),
+    ("/expenses/?limit=100", 2),
+    ("/expenses/?limit=100&fields=id,amount,status", 2),
+    ("/expenses/?limit=100&fields=id,owner", 2),
+    ("/expenses/analytics/", 8),
+    ("/expenses/summary", 1),
+    ("/chats/", 2),
+    ("/search/?q=taxi", 4),
+    ("/search/?q=taxi&type=expenses", 2),
+]
+
+# Repeated with the ETag of the previous response: 304 from the version lookup alone
+CONDITIONAL = [("/users/?limit=100", 1), ("/expenses/?limit=100", 1), ("/chats/", 1)]
+
+
+def main():
+    migrate.upgrade(engine)
+    with TestClient(app) as client:
+        seed.seed(engine, users=100, expenses_per_user=20, chats_per_user=5)
+        # every 50th seeded user is an admin, so the listings span many owners
+        token = client.post("/token", data={"username": "user50@example.com", "password": seed.PASSWORD}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        client.get("/users/me", headers=headers)
+        client.get("/expenses/summary", headers=headers)
+
+        count = [0]
+        def before_cursor_execute(*args):
+            count[0] += 1
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+        failures = 0
+        for path, budget in BUDGETS:
+            count[0] = 0
+            response = client.get(path, headers=headers)
+            ok = response.status_code == 200 and count[0] <= budget
+            failures += not ok
+            print(f"{'ok' if ok else 'FAIL':4}  {path:45} {count[0]:>3} queries (budget {budget}, status {response.status_code})")
+        for path, budget in CONDITIONAL:
+            tag = client.get(path, headers=headers).headers["ETag"]
+            count[0] = 0
+            response = client.get(path, headers={**headers, "If-None-Match": tag})
+            ok = response.status_code == 304 and count[0] <= budget
+            failures += not ok
+            print(f"{'ok' if ok else 'FAIL':4}  {path + ' (If-None-Match)':45} {count[0]:>3} queries (budget {budget}, status {response.status_code})")
+    print(f"{failures} endpoint(s) over budget")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
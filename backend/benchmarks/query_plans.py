@@ -0,0 +1,149 @@
+"""Query-plan regression check for the crud access paths.
+
+Seeds a large dataset, runs each hot crud function while capturing the SQL it
+issues, then EXPLAINs every SELECT and fails if any of them falls back to a
+full table scan (SQLite ``SCAN <table>`` / PostgreSQL ``Seq Scan``).
+
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --database-url postgresql://... --users 2000
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from app.crud import archive, crud, policies, versions
+from app.db import migrate, models
+from app.schemas import schemas
+from benchmarks import seed
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+TABLES = set(models.Base.metadata.tables)
+
+
+def _capture(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return statements, lambda: event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def _sqlite_scans(conn, statement, parameters):
+    rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    return [
+        (match.group(1), row[-1]) for row in rows
+        for match in [SQLITE_FULL_SCAN.match(row[-1])] if match and match.group(1) in TABLES
+    ]
+
+def _postgres_scans(conn, statement, parameters):
+    # With seq scans disabled the planner only picks one when no index can serve the query
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    found, stack = [], [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        if node["Node Type"] == "Seq Scan":
+            found.append((node["Relation Name"], f"Seq Scan on {node['Relation Name']}"))
+        stack.extend(node.get("Plans", []))
+    return found
+
+def _cases(user_id: int, admin_id: int, expense_id: int, email: str, expense_cursor: str):
+    day = datetime.utcnow() - timedelta(days=3)
+    new_expense = schemas.ExpenseCreate(amount=50, category="Food", description="plan check", date=day)
+    # (name, crud call, tables a full scan is acceptable on)
+    return [
+        # Compiling the policies reads the whole (small) table once per version; later cases hit the compiled copy
+        ("policies.load", lambda db: policies.load(db), ("budget_policies",)),
+        ("get_user", lambda db: crud.get_user(db, user_id), ()),
+        ("versions.read", lambda db: versions.read(db, [(versions.EXPENSES, user_id), (versions.USERS, user_id)]), ()),
+        ("get_user_by_email", lambda db: crud.get_user_by_email(db, email), ()),
+        # Unfiltered first page: a LIMITed walk of the users table is expected
+        ("get_users", lambda db: crud.get_users(db, limit=100), ("users",)),
+        ("get_users (cursor)", lambda db: crud.get_users(db, limit=100, cursor=crud.encode_cursor(user_id)), ()),
+        ("get_expenses (admin)", lambda db: crud.get_expenses(db, limit=100), ()),
+        ("get_expenses (admin, cursor)", lambda db: crud.get_expenses(db, limit=100, cursor=expense_cursor), ()),
+        ("get_expenses (user)", lambda db: crud.get_expenses(db, limit=100, user_id=user_id), ()),
+        ("get_expenses (user, cursor)", lambda db: crud.get_expenses(db, limit=100, user_id=user_id, cursor=expense_cursor), ()),
+        ("get_recent_expenses", lambda db: crud.get_recent_expenses(db, user_id), ()),
+        ("create_user_expense", lambda db: crud.create_user_expense(db, new_expense, user_id), ()),
+        ("update_user_expense", lambda db: crud.update_user_expense(db, expense_id, new_expense, user_id), ()),
+        ("get_expense_analytics (owner)", lambda db: crud.get_expense_analytics(
+            db, owner_id=user_id, date_from=day.date() - timedelta(days=30), date_to=day.date()), ()),
+        # Both tiers: each is searched through its own (owner, date) index
+        ("get_expense_analytics (owner, all time)", lambda db: crud.get_expense_analytics(db, owner_id=user_id), ()),
+        ("iter_expense_export (owner)", lambda db: [rows for rows in crud.iter_expense_export(db, owner_id=user_id)], ()),
+        ("get_expense_summary", lambda db: crud.get_expense_summary(db, user_id, 3, day.date()), ()),
+        ("search_expenses (user)", lambda db: crud.search_expenses(db, ["taxi", "airport"], user_id), ()),
+        ("search_expenses (admin)", lambda db: crud.search_expenses(db, ["taxi"]), ()),
+        ("search_chats (user)", lambda db: crud.search_chats(db, ["budget"], user_id), ()),
+        ("delete_user_expense", lambda db: crud.delete_user_expense(db, expense_id, user_id), ()),
+    ]
+
+def check(engine):
+    explain = _postgres_scans if engine.dialect.name == "postgresql" else _sqlite_scans
+    with Session(bind=engine) as db:
+        user = db.query(models.User).filter(models.User.grade != 0).order_by(models.User.id).first()
+        admin = db.query(models.User).filter(models.User.grade == 0).first()
+        expense = db.query(models.Expense).filter(models.Expense.owner_id == user.id).first()
+        cases = _cases(user.id, admin.id if admin else user.id, expense.id, user.email, crud.expense_cursor(expense))
+
+    failures = 0
+    for name, run, allowed in cases:
+        statements, stop = _capture(engine)
+        try:
+            with Session(bind=engine) as db:
+                run(db)
+        finally:
+            stop()
+        scans = []
+        with engine.begin() as conn:
+            for statement, parameters in statements:
+                scans.extend(
+                    f"{detail}  <- {' '.join(statement.split())[:120]}"
+                    for table, detail in explain(conn, statement, parameters) if table not in allowed
+                )
+        status = "FAIL" if scans else "ok"
+        failures += bool(scans)
+        print(f"{status:4}  {name}  ({len(statements)} select(s))")
+        for s in scans:
+            print(f"        {s}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if any crud query plan uses a full table scan.")
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh temporary SQLite file")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--expenses-per-user", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'plans.db')}"
+    engine = create_engine(url)
+    migrate.upgrade(engine)
+    if not seed.is_seeded(engine):
+        seed.seed(engine, users=args.users, expenses_per_user=args.expenses_per_user, chats_per_user=5)
+        # Plans are checked with closed months in the archive tier, as in production
+        with Session(bind=engine) as db:
+            archive.run(db)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    else:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+    failures = check(engine)
+    print(f"{failures} query plan failure(s)")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
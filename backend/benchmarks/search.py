@@ -0,0 +1,91 @@
+"""Search latency as the expense table grows.
+
+Seeds a temporary database in steps up to the largest ``--sizes`` entry and,
+at each size, times ``crud.search_expenses`` / ``crud.search_chats`` for an
+employee and for an admin searching everyone, with a selective and a very
+common term. A ``LIKE '%term%'`` scan (what a search without the index costs)
+is timed alongside. Indexed latency should stay roughly flat from 10k to 1M
+expenses while the scan grows with the table.
+
+    python -m benchmarks.search
+    python -m benchmarks.search --sizes 10000,100000,1000000 --repeat 50
+    python -m benchmarks.search --database-url postgresql://... --sizes 100000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.orm import Session
+from app.crud import crud
+from app.db import migrate, models
+from benchmarks import seed
+
+EXPENSES_PER_USER = 200
+QUERIES = [
+    # (label, words, owner-scoped)
+    ("user: 'airport taxi'", ["airport", "taxi"], True),
+    ("user: 'conf'", ["conf"], True),
+    ("admin: 'berlin flight'", ["berlin", "flight"], False),
+    ("admin: 'taxi' (common)", ["taxi"], False),
+]
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+def run(engine, user_id: int, repeat: int):
+    rows = []
+    with Session(bind=engine) as db:
+        for label, words, scoped in QUERIES:
+            owner_id = user_id if scoped else None
+            p50, p95 = timed(lambda: crud.search_expenses(db, words, owner_id, limit=20), repeat)
+            # Without the index every matching row has to be found before any ranking: a full count
+            scan = select(func.count()).select_from(models.Expense).where(
+                models.Expense.description.ilike(f"%{words[0]}%"),
+                *([models.Expense.owner_id == user_id] if scoped else []),
+            )
+            scan_p50, _ = timed(lambda: db.execute(scan).scalar(), max(3, repeat // 10))
+            rows.append((label, p50, p95, scan_p50))
+        chat_p50, chat_p95 = timed(lambda: crud.search_chats(db, ["budget"], user_id), repeat)
+        rows.append(("user chats: 'budget'", chat_p50, chat_p95, None))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=None, help="defaults to a fresh temporary SQLite file")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="expense counts to measure at")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}")
+    migrate.upgrade(engine)
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+    print(f"{'expenses':>9}  {'query':28} {'p50':>8} {'p95':>8} {'LIKE scan':>10}")
+    for size in sizes:
+        with engine.connect() as conn:
+            have = conn.execute(select(func.count()).select_from(models.Expense.__table__)).scalar()
+        if size > have:
+            started = time.perf_counter()
+            seed.seed(engine, users=max(1, (size - have) // EXPENSES_PER_USER),
+                      expenses_per_user=EXPENSES_PER_USER, chats_per_user=10, rng_seed=size)
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+            print(f"  (seeded to {size} expenses in {time.perf_counter() - started:.0f}s)")
+        with Session(bind=engine) as db:
+            user_id = db.scalar(select(models.User.id).where(models.User.grade != 0).order_by(models.User.id.desc()))
+        for label, p50, p95, scan in run(engine, user_id, args.repeat):
+            scan_text = f"{scan:7.1f} ms" if scan is not None else ""
+            print(f"{size:>9}  {label:28} {p50:5.2f} ms {p95:5.2f} ms {scan_text:>10}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
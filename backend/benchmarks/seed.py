@@ -0,0 +1,90 @@
+"""Synthetic data generator for benchmarks and query-plan checks.
+
+Inserts users, expenses and chats with Core bulk inserts so large datasets
+seed in seconds, then rebuilds the daily_spend ledger and expense rollups to match.
+"""
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+from app.crud import ledger, rollups
+from app.db import models
+
+CATEGORIES = ["Food", "Travel", "Supplies", "Other"]
+STATUSES = ["Approved", "Approved", "Approved", "Pending", "Rejected"]
+# A small vocabulary so text search sees common, rare and shared words like real data
+DESCRIPTIONS = [
+    "Taxi to the airport", "Team lunch", "Hotel stay", "Printer paper", "Client dinner", "Train ticket",
+    "Office chairs", "Coffee beans", "Conference pass", "Software license", "Parking fee", "Flight to Berlin",
+    "Stationery order", "Airport taxi late night", "Cloud hosting invoice", "Courier delivery",
+]
+MESSAGES = [
+    "How much did I spend on travel this month?", "Add a taxi expense of 25", "What is my food budget?",
+    "Show my pending expenses", "Lunch with the client was 40", "Is the hotel approved yet?",
+]
+PASSWORD = "password"
+BATCH = 5000
+
+
+def _batched(rows, size=BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def is_seeded(engine) -> bool:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(models.User.__table__)).scalar() > 0
+
+def seed(engine, users: int = 100, expenses_per_user: int = 100, chats_per_user: int = 20,
+         days: int = 365, rng_seed: int = 42, chat_days: int = None):
+    """Seed ``users`` users (every 50th is a grade-0 admin) with their expenses and chats.
+
+    Expenses are spread over the last ``days`` days; chats are five minutes
+    apart up to now, or spread evenly over ``chat_days`` days when given. All
+    users share the password ``PASSWORD``; the hash is computed once.
+    """
+    from app.core import security as auth
+
+    rng = random.Random(rng_seed)
+    hashed = auth.get_password_hash(PASSWORD)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    with engine.begin() as conn:
+        first_id = (conn.execute(select(func.max(models.User.id))).scalar() or 0) + 1
+        user_ids = list(range(first_id, first_id + users))
+        for batch in _batched(
+            {"id": uid, "email": f"user{uid}@example.com", "full_name": f"User {uid}",
+             "hashed_password": hashed, "grade": 0 if uid % 50 == 0 else rng.randint(1, 10)}
+            for uid in user_ids
+        ):
+            conn.execute(insert(models.User.__table__), batch)
+
+        for batch in _batched(
+            {"owner_id": uid, "amount": round(rng.uniform(10, 600), 2), "category": rng.choice(CATEGORIES),
+             "description": f"{rng.choice(DESCRIPTIONS)} #{n}", "status": rng.choice(STATUSES),
+             "date": now - timedelta(days=rng.randrange(days), minutes=rng.randrange(24 * 60))}
+            for uid in user_ids for n in range(expenses_per_user)
+        ):
+            conn.execute(insert(models.Expense.__table__), batch)
+
+        for batch in _batched(
+            {"owner_id": uid, "message": rng.choice(MESSAGES), "is_support": n % 2 == 1,
+             "timestamp": now - (timedelta(days=chat_days) * (chats_per_user - n) / chats_per_user if chat_days
+                                 else timedelta(minutes=(chats_per_user - n) * 5))}
+            for uid in user_ids for n in range(chats_per_user)
+        ):
+            conn.execute(insert(models.Chat.__table__), batch)
+
+        if conn.dialect.name == "postgresql":
+            # Explicit user ids bypass the serial sequence; move it past them
+            conn.execute(text("SELECT setval(pg_get_serial_sequence('users', 'id'), (SELECT max(id) FROM users))"))
+
+    with Session(bind=engine) as db:
+        ledger.rebuild(db)
+        rollups.rebuild(db)
+    return user_ids
@@ -0,0 +1,114 @@
+"""Cold-start time: importing the app and serving its first request.
+
+Migrates and seeds a temporary SQLite database once, then over ``--runs``
+fresh interpreters measures
+
+* ``import app.main`` (and whether the Gemini SDK came along with it);
+* from launching uvicorn to the first successful ``GET /users/me``;
+
+both as they run by default and with ``AUTO_MIGRATE=1`` for comparison, and
+fails when a default-mode median exceeds its budget. The Gemini SDK import is
+timed on its own: that is what the first FinBot message now pays instead.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --import-budget-ms 800 --first-request-budget-ms 1500
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+
+import httpx
+
+from app.core import security
+from app.db import database, migrate, models
+from benchmarks import seed
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"ms": (time.perf_counter() - started) * 1000, "genai": "google.genai" in sys.modules}}))
+"""
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def import_time(module: str, env: dict):
+    """(ms to import ``module`` in a fresh interpreter, whether google.genai was imported)."""
+    output = subprocess.run([sys.executable, "-c", IMPORT_PROBE.format(module=module)], env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result["ms"], result["genai"]
+
+def first_request_time(client: httpx.Client, env: dict, headers: dict, timeout: float = 30.0) -> float:
+    """ms from launching uvicorn until ``GET /users/me`` answers 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"], env=env)
+    try:
+        # A bare connect per poll: the server shares the CPU with this loop
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {server.returncode}")
+                if time.perf_counter() - started > timeout:
+                    raise
+                time.sleep(0.005)
+        client.get(f"http://127.0.0.1:{port}/users/me", headers=headers, timeout=timeout).raise_for_status()
+        return (time.perf_counter() - started) * 1000
+    finally:
+        server.terminate()
+        server.wait()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="cold starts per measurement")
+    parser.add_argument("--import-budget-ms", type=float, default=1200)
+    parser.add_argument("--first-request-budget-ms", type=float, default=1800)
+    args = parser.parse_args(argv)
+
+    migrate.upgrade(database.engine)
+    seed.seed(database.engine, users=10, expenses_per_user=5, chats_per_user=0)
+    with database.SessionLocal() as db:
+        user = db.query(models.User).order_by(models.User.id).first()
+    headers = {"Authorization": f"Bearer {security.create_access_token({'sub': str(user.id), 'email': user.email})}"}
+
+    env = dict(os.environ, AUTO_MIGRATE="0")
+    modes = [("default", env), ("AUTO_MIGRATE=1", dict(env, AUTO_MIGRATE="1"))]
+    failures = 0
+    # Built once: creating an httpx client (SSL context) would be timed as server startup
+    client = httpx.Client()
+    print(f"{'mode':16} {'import app.main':>16} {'first request':>14}  google.genai imported")
+    for label, mode_env in modes:
+        imports = [import_time("app.main", mode_env) for _ in range(args.runs)]
+        firsts = [first_request_time(client, mode_env, headers) for _ in range(args.runs)]
+        import_ms, first_ms = statistics.median(ms for ms, _ in imports), statistics.median(firsts)
+        print(f"{label:16} {import_ms:13.0f} ms {first_ms:11.0f} ms  {'yes' if any(g for _, g in imports) else 'no'}")
+        if label == "default":
+            for name, value, budget in (("import", import_ms, args.import_budget_ms),
+                                        ("first request", first_ms, args.first_request_budget_ms)):
+                if value > budget:
+                    failures += 1
+                    print(f"  OVER BUDGET: {name} {value:.0f} ms > {budget:.0f} ms")
+    client.close()
+    genai_ms = statistics.median(import_time("google.genai", env)[0] for _ in range(args.runs))
+    print(f"google.genai alone: {genai_ms:.0f} ms, paid on the first FinBot message instead")
+    print(f"{failures} measurement(s) over budget")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -23,9 +23,9 @@ const Card = ({ title, children }) => (
     </div>
 );
 
-const AdminVisualizations = ({ expenses }) => {
+const AdminVisualizations = ({ analytics }) => {
 
-    if (!expenses || expenses.length === 0) {
+    if (!analytics || analytics.count === 0) {
         return (
             <div className="p-12 text-center text-gray-500 bg-white rounded-2xl border border-gray-100">
                 Not enough data to generate visualizations.
@@ -33,101 +33,39 @@ const AdminVisualizations = ({ expenses }) => {
         );
     }
 
-    // 1. Category Data
-    const categoryMap = {};
-    expenses.forEach(e => {
-        categoryMap[e.category] = (categoryMap[e.category] || 0) + e.amount;
-    });
-    const categoryData = Object.keys(categoryMap)
-        .map(name => ({ name, value: parseFloat(categoryMap[name].toFixed(2)) }))
-        .sort((a, b) => b.value - a.value);
-
-    // 2. Status Data (by percentage of total amount)
-    const statusMap = {};
-    expenses.forEach(e => {
-        statusMap[e.status] = (statusMap[e.status] || 0) + e.amount;
-    });
-    const totalStatusAmount = Object.values(statusMap).reduce((a, b) => a + b, 0);
-    const statusData = Object.keys(statusMap).map(name => ({
-        name,
-        value: totalStatusAmount > 0 ? parseFloat(((statusMap[name] / totalStatusAmount) * 100).toFixed(1)) : 0,
+    // All rollups are computed server-side by /expenses/analytics
+
+    // 1. Status Data (by percentage of total amount)
+    const statusData = analytics.by_status.map(b => ({
+        name: b.key,
+        value: analytics.total > 0 ? parseFloat(((b.total / analytics.total) * 100).toFixed(1)) : 0,
         isPercent: true
     }));
 
     // Data for Average Expense by Category
-    const categoryCountMap = {};
-    expenses.forEach(e => {
-        categoryCountMap[e.category] = (categoryCountMap[e.category] || 0) + 1;
-    });
-    const avgCategoryData = Object.keys(categoryMap).map(name => ({
-        name,
-        amount: parseFloat((categoryMap[name] / categoryCountMap[name]).toFixed(2))
-    })).sort((a, b) => b.amount - a.amount);
+    const avgCategoryData = analytics.by_category
+        .map(b => ({ name: b.key, amount: b.average }))
+        .sort((a, b) => b.amount - a.amount);
 
     // Data for Category-wise Limit Breaches (Pending = Breach)
-    const breachMap = {};
-    expenses.forEach(e => {
-        if (e.status === 'Pending') {
-            breachMap[e.category] = (breachMap[e.category] || 0) + 1;
-        }
-    });
-    const breachData = Object.keys(breachMap).map(name => ({
-        name,
-        value: breachMap[name],
+    const breachData = analytics.pending_by_category.map(b => ({
+        name: b.key,
+        value: b.count,
         isCount: true
-    })).sort((a, b) => b.value - a.value);
-
-    // 3. Time Data
-    const timeMap = {};
-    expenses.forEach(e => {
-        const dateObj = new Date(e.date);
-        const d = `${dateObj.getFullYear()}-${String(dateObj.getMonth() + 1).padStart(2, '0')}-${String(dateObj.getDate()).padStart(2, '0')}`;
-        timeMap[d] = (timeMap[d] || 0) + e.amount;
-    });
-    const timeData = Object.keys(timeMap).sort().map(d => ({
-        date: new Date(d).toLocaleDateString(undefined, { month: 'short', day: 'numeric' }),
-        amount: parseFloat(timeMap[d].toFixed(2))
     }));
 
-    // 4. Grade Level — 3-step formula:
-    // Step 1: For each employee, group expenses by category
-    // Step 2: Avg per category → then avg those → one number per employee
-    // Step 3: Avg all employee numbers per grade
-
-    // employeeData: { email: { grade, categories: { Food: [100,100], Travel: [120] } } }
-    const employeeData = {};
-    expenses.forEach(e => {
-        if (e.owner) {
-            const email = e.owner.email;
-            if (!employeeData[email]) {
-                employeeData[email] = { grade: e.owner.grade, categories: {} };
-            }
-            const cat = e.category;
-            if (!employeeData[email].categories[cat]) employeeData[email].categories[cat] = [];
-            employeeData[email].categories[cat].push(e.amount);
-        }
-    });
-
-    // Per employee: avg per category → avg of those avgs
-    const gradeEmployeeAvgs = {}; // { "Grade 3": [110, 130] }
-    Object.values(employeeData).forEach(({ grade, categories }) => {
-        const label = `Grade ${grade}`;
-        const catAvgs = Object.values(categories).map(
-            amounts => amounts.reduce((a, b) => a + b, 0) / amounts.length
-        );
-        const employeeAvg = catAvgs.reduce((a, b) => a + b, 0) / catAvgs.length;
-        if (!gradeEmployeeAvgs[label]) gradeEmployeeAvgs[label] = [];
-        gradeEmployeeAvgs[label].push(employeeAvg);
-    });
-
-    // Per grade: avg of all employee avgs
-    const gradeData = Object.keys(gradeEmployeeAvgs).map(g => ({
-        name: g,
-        gradeNum: parseInt(g.replace('Grade ', '')),
-        amount: parseFloat(
-            (gradeEmployeeAvgs[g].reduce((a, b) => a + b, 0) / gradeEmployeeAvgs[g].length).toFixed(2)
-        )
-    })).sort((a, b) => a.gradeNum - b.gradeNum);
+    // 2. Time Data
+    const timeData = analytics.by_period.map(b => ({
+        date: new Date(b.key).toLocaleDateString(undefined, { month: 'short', day: 'numeric' }),
+        amount: b.total
+    }));
+
+    // 3. Grade Level — avg of per-employee category averages, per grade
+    const gradeData = analytics.grade_employee_average.map(g => ({
+        name: `Grade ${g.grade}`,
+        gradeNum: g.grade,
+        amount: g.average
+    }));
 
     const CustomTooltip = ({ active, payload, label }) => {
         if (active && payload && payload.length) {
@@ -7,15 +7,33 @@ const ChatWidget = () => {
     const [messages, setMessages] = useState([]);
     const [input, setInput] = useState('');
     const messagesEndRef = useRef(null);
+    const lastIdRef = useRef(null);
 
     const toggleChat = () => setIsOpen(!isOpen);
 
     useEffect(() => {
-        if (isOpen) {
-            fetchMessages();
-            const interval = setInterval(fetchMessages, 3000); // Poll every 3s
-            return () => clearInterval(interval);
-        }
+        if (!isOpen) return;
+        let source = null;
+        let interval = null;
+        let cancelled = false;
+
+        fetchMessages().then(() => {
+            if (cancelled) return;
+            if (window.EventSource) {
+                // Server pushes new messages (ours and FinBot's) as they are committed
+                const token = localStorage.getItem('token');
+                const since = lastIdRef.current !== null ? `&since_id=${lastIdRef.current}` : '';
+                source = new EventSource(`/api/chats/stream?token=${encodeURIComponent(token)}${since}`);
+                source.addEventListener('chat', (event) => appendMessages([JSON.parse(event.data)]));
+            } else {
+                interval = setInterval(fetchNewMessages, 3000); // Fallback: incremental poll
+            }
+        });
+        return () => {
+            cancelled = true;
+            if (source) source.close();
+            if (interval) clearInterval(interval);
+        };
     }, [isOpen]);
 
     useEffect(() => {
@@ -26,10 +44,28 @@ const ChatWidget = () => {
         messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
     };
 
+    const appendMessages = (newMessages) => {
+        const fresh = newMessages.filter(m => lastIdRef.current === null || m.id > lastIdRef.current);
+        if (fresh.length === 0) return;
+        lastIdRef.current = fresh[fresh.length - 1].id;
+        setMessages(prev => [...prev, ...fresh]);
+    };
+
     const fetchMessages = async () => {
         try {
             const res = await axios.get('/api/chats/');
             setMessages(res.data);
+            lastIdRef.current = res.data.length ? res.data[res.data.length - 1].id : null;
+        } catch (error) {
+            console.error("Failed to fetch chats", error);
+        }
+    };
+
+    const fetchNewMessages = async () => {
+        try {
+            const params = lastIdRef.current !== null ? { since_id: lastIdRef.current } : {};
+            const res = await axios.get('/api/chats/', { params });
+            appendMessages(res.data);
         } catch (error) {
             console.error("Failed to fetch chats", error);
         }
@@ -45,7 +81,7 @@ const ChatWidget = () => {
             // setMessages([...messages, { ...newMessage, id: Date.now() }]); // wait for server response
             await axios.post('/api/chats/', newMessage);
             setInput('');
-            fetchMessages();
+            if (!window.EventSource) fetchNewMessages();
         } catch (error) {
             console.error("Failed to send message", error);
         }
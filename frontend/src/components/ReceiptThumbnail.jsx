@@ -0,0 +1,51 @@
+import { useState, useEffect } from 'react';
+import axios from 'axios';
+import { FileText } from 'lucide-react';
+
+// Thumbnails need the auth header, so they are fetched as blobs instead of plain <img src>
+const ReceiptThumbnail = ({ expense }) => {
+    const [src, setSrc] = useState(null);
+
+    useEffect(() => {
+        if (!expense.receipt_content_type?.startsWith('image/')) return;
+        let url = null;
+        let cancelled = false;
+        let attempts = 0;
+
+        const load = async () => {
+            try {
+                const res = await axios.get(`/api/expenses/${expense.id}/receipt/thumbnail`, { responseType: 'blob' });
+                // 202: still being rendered in the background
+                if (res.status === 202) {
+                    if (!cancelled && ++attempts < 5) setTimeout(load, 1000);
+                    return;
+                }
+                if (!cancelled) {
+                    url = URL.createObjectURL(res.data);
+                    setSrc(url);
+                }
+            } catch (err) {
+                // No thumbnail (e.g. server without Pillow): the icon stays
+            }
+        };
+        load();
+        return () => {
+            cancelled = true;
+            if (url) URL.revokeObjectURL(url);
+        };
+    }, [expense.id, expense.receipt_url, expense.receipt_content_type]);
+
+    const openReceipt = async () => {
+        const res = await axios.get(`/api/expenses/${expense.id}/receipt`, { responseType: 'blob' });
+        window.open(URL.createObjectURL(res.data), '_blank');
+    };
+
+    if (!expense.receipt_content_type) return null;
+    return (
+        <button onClick={openReceipt} title="Open receipt" className="w-10 h-10 rounded-lg overflow-hidden border border-gray-100 bg-gray-50 flex items-center justify-center hover:ring-2 hover:ring-indigo-200 transition-all">
+            {src ? <img src={src} alt="Receipt" className="w-full h-full object-cover" /> : <FileText size={16} className="text-gray-400" />}
+        </button>
+    );
+};
+
+export default ReceiptThumbnail;
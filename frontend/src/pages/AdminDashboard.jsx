@@ -3,7 +3,7 @@ import axios from 'axios';
 import { AuthContext } from '../context/AuthContext';
 import { useToast } from '../context/ToastContext';
 import ChatWidget from '../components/ChatWidget';
-import { Search, Filter, X, FileText, PieChart, Table } from 'lucide-react';
+import { Search, Filter, X, FileText, PieChart, Table, Check } from 'lucide-react';
 import AdminVisualizations from '../components/AdminVisualizations';
 
 const AdminDashboard = () => {
@@ -11,6 +11,7 @@ const AdminDashboard = () => {
     const { showToast } = useToast();
     const [expenses, setExpenses] = useState([]);
     const [employees, setEmployees] = useState([]);
+    const [analytics, setAnalytics] = useState(null);
     const [loading, setLoading] = useState(true);
 
     const [showFilterModal, setShowFilterModal] = useState(false);
@@ -87,6 +88,10 @@ const AdminDashboard = () => {
         setCurrentPage(1);
     }, [searchTerm, filterCategory, filterStatus, filterUser, dateRange, amountRange]);
 
+    useEffect(() => {
+        if (showVisualizations) fetchAnalytics();
+    }, [showVisualizations, searchTerm, filterCategory, filterStatus, filterUser, dateRange, amountRange]);
+
     const fetchExpenses = async () => {
         try {
             const res = await axios.get('/api/expenses/');
@@ -98,6 +103,28 @@ const AdminDashboard = () => {
         }
     };
 
+    const fetchAnalytics = async () => {
+        const params = {};
+        if (filterCategory !== 'All') params.category = filterCategory;
+        if (filterStatus !== 'All') params.status = filterStatus;
+        if (filterUser !== 'All') {
+            const owner = employees.find(e => e.email === filterUser);
+            if (owner) params.owner_id = owner.id;
+        }
+        if (dateRange.start) params.date_from = dateRange.start;
+        if (dateRange.end) params.date_to = dateRange.end;
+        // Same search and amount range as the table, so the charts describe the filtered rows
+        if (searchTerm) params.q = searchTerm;
+        if (amountRange.min) params.amount_min = amountRange.min;
+        if (amountRange.max) params.amount_max = amountRange.max;
+        try {
+            const res = await axios.get('/api/expenses/analytics/', { params });
+            setAnalytics(res.data);
+        } catch (err) {
+            console.error(err);
+        }
+    };
+
     const fetchEmployees = async () => {
         try {
             const res = await axios.get('/api/users/');
@@ -116,6 +143,17 @@ const AdminDashboard = () => {
         }
     };
 
+    const decideExpense = async (expenseId, action) => {
+        try {
+            const res = await axios.post(`/api/expenses/${action}`, { ids: [expenseId] });
+            showToast(`${res.data.updated} expense(s) ${res.data.status.toLowerCase()}`, 'success');
+            fetchExpenses();
+        } catch (err) {
+            console.error(err);
+            showToast(err.response?.data?.detail || `Failed to ${action} expense.`, 'error');
+        }
+    };
+
     const submitGradeUpdate = async () => {
         if (!selectedEmployeeId) return;
         try {
@@ -126,6 +164,7 @@ const AdminDashboard = () => {
             showToast('Employee updated successfully!', 'success');
             setShowEmployeeModal(false);
             fetchEmployees(); // refresh list
+            fetchExpenses(); // a higher grade may have approved pending expenses
         } catch (err) {
             console.error("Failed to update employee", err);
             showToast(err.response?.data?.detail || 'Failed to update employee.', 'error');
@@ -208,7 +247,7 @@ const AdminDashboard = () => {
 
                     {showVisualizations ? (
                         <div className="p-6 bg-gray-50/30">
-                            <AdminVisualizations expenses={filteredExpenses} />
+                            <AdminVisualizations analytics={analytics} />
                         </div>
                     ) : (
                         <>
@@ -222,7 +261,7 @@ const AdminDashboard = () => {
                                             <th className="px-6 py-4 text-left text-xs font-semibold text-gray-500 uppercase tracking-wider">Description</th>
                                             <th className="px-6 py-4 text-left text-xs font-semibold text-gray-500 uppercase tracking-wider">Amount</th>
                                             <th className="px-6 py-4 text-left text-xs font-semibold text-gray-500 uppercase tracking-wider">Status</th>
-
+                                            <th className="px-6 py-4 text-right text-xs font-semibold text-gray-500 uppercase tracking-wider">Actions</th>
                                         </tr>
                                     </thead>
                                     <tbody className="bg-white divide-y divide-gray-100">
@@ -263,7 +302,18 @@ const AdminDashboard = () => {
                                                         {expense.status}
                                                     </span>
                                                 </td>
-
+                                                <td className="px-6 py-4 whitespace-nowrap text-right text-sm">
+                                                    {expense.status === 'Pending' && (
+                                                        <div className="flex justify-end gap-2">
+                                                            <button onClick={() => decideExpense(expense.id, 'approve')} title="Approve" className="p-1.5 rounded-lg text-green-600 hover:bg-green-50 transition-colors">
+                                                                <Check className="h-4 w-4" />
+                                                            </button>
+                                                            <button onClick={() => decideExpense(expense.id, 'reject')} title="Reject" className="p-1.5 rounded-lg text-red-600 hover:bg-red-50 transition-colors">
+                                                                <X className="h-4 w-4" />
+                                                            </button>
+                                                        </div>
+                                                    )}
+                                                </td>
                                             </tr>
                                         ))}
                                         {expenses.length === 0 && (
@@ -4,6 +4,7 @@ import { AuthContext } from '../context/AuthContext';
 import { useToast } from '../context/ToastContext';
 import ChatWidget from '../components/ChatWidget';
 import AdminDashboard from './AdminDashboard';
+import ReceiptThumbnail from '../components/ReceiptThumbnail';
 import { Plus, Trash2, FileText, X, Pencil, Search, Filter } from 'lucide-react';
 
 
@@ -33,10 +34,12 @@ const Dashboard = () => {
         amount: '', category: 'Food', description: '', date: new Date().toISOString().split('T')[0]
     });
     const [error, setError] = useState('');
+    const [receiptFile, setReceiptFile] = useState(null);
     const [editingExpenseId, setEditingExpenseId] = useState(null);
     const [expenseToDelete, setExpenseToDelete] = useState(null);
     const [showFilterModal, setShowFilterModal] = useState(false);
     const [dashboardCategory, setDashboardCategory] = useState('Food');
+    const [summary, setSummary] = useState(null);
 
     // Filter State
     const [searchTerm, setSearchTerm] = useState('');
@@ -82,6 +85,7 @@ const Dashboard = () => {
 
     useEffect(() => {
         fetchExpenses();
+        fetchSummary();
     }, []);
 
     // Reset pagination when filters change
@@ -89,6 +93,17 @@ const Dashboard = () => {
         setCurrentPage(1);
     }, [searchTerm, filterCategory, filterStatus, dateRange, amountRange]);
 
+    // Today / week / month totals come precomputed from the server
+    const fetchSummary = async () => {
+        try {
+            const today = new Date().toLocaleDateString('en-CA');
+            const res = await axios.get('/api/expenses/summary', { params: { today } });
+            setSummary(res.data);
+        } catch (err) {
+            console.error(err);
+        }
+    };
+
     const fetchExpenses = async () => {
         try {
             const res = await axios.get('/api/expenses/');
@@ -123,6 +138,7 @@ const Dashboard = () => {
                 });
             }
 
+            let savedId = editingExpenseId;
             if (editingExpenseId) {
                 await axios.put(`/api/expenses/${editingExpenseId}`, {
                     ...formData,
@@ -133,14 +149,22 @@ const Dashboard = () => {
                 setEditingExpenseId(null);
                 showToast('Expense updated successfully!');
             } else {
-                await axios.post('/api/expenses/', {
+                const res = await axios.post('/api/expenses/', {
                     ...formData,
                     category: finalCategory,
                     amount: parseFloat(formData.amount),
                     date: formData.date === new Date().toISOString().split('T')[0] ? new Date().toISOString() : new Date(formData.date).toISOString()
                 });
+                savedId = res.data.id;
                 showToast('Expense added successfully!');
             }
+            if (receiptFile) {
+                // Sent as its own multipart request; the server streams it to disk
+                const body = new FormData();
+                body.append('file', receiptFile);
+                await axios.post(`/api/expenses/${savedId}/receipt`, body);
+                setReceiptFile(null);
+            }
 
             setShowForm(false);
             setFormData({
@@ -148,6 +172,7 @@ const Dashboard = () => {
             });
             setCustomCategory('');
             fetchExpenses();
+            fetchSummary();
         } catch (err) {
             setError(err.response?.data?.detail || 'Failed to save expense');
         }
@@ -164,6 +189,7 @@ const Dashboard = () => {
             setExpenseToDelete(null);
             showToast('Expense deleted successfully!');
             fetchExpenses();
+            fetchSummary();
         } catch (err) {
             console.error(err);
         }
@@ -206,17 +232,17 @@ const Dashboard = () => {
 
                 {/* Stats Cards */}
                 {(() => {
-                    const today = new Date().toLocaleDateString('en-CA'); // strict format YYYY-MM-DD
-                    const dailyLimit = getBudget(user?.grade);
+                    const dailyLimit = summary?.limits?.[dashboardCategory]?.daily ?? summary?.daily_limit ?? getBudget(user?.grade);
+                    const todaySummary = summary?.today;
+                    const approvedToday = todaySummary?.approved_by_category || {};
 
-                    // Default to 'All' or specific category? User implies 'All' should work but limits are per category.
-                    // Let's use the state we just added (need to add state first).
-                    // Wait, I can't add state inside this block. I need to add state to the component body.
-                    // I will do that in a separate edit. For now, let's assume 'dashboardCategory' exists.
+                    const currentCategoryExpenses = dashboardCategory === 'All'
+                        ? Object.values(approvedToday).reduce((acc, curr) => acc + curr, 0)
+                        : approvedToday[dashboardCategory] || 0;
 
-                    const currentCategoryExpenses = expenses
-                        .filter(e => (dashboardCategory === 'All' || e.category === dashboardCategory) && e.date.startsWith(today) && e.status === 'Approved')
-                        .reduce((acc, curr) => acc + curr.amount, 0);
+                    const transactionsToday = dashboardCategory === 'All'
+                        ? todaySummary?.count || 0
+                        : todaySummary?.by_category.find(b => b.key === dashboardCategory)?.count || 0;
 
                     const remaining = dashboardCategory === 'All'
                         ? 'Select Category'
@@ -253,7 +279,7 @@ const Dashboard = () => {
                                     <div>
                                         <p className="text-sm font-medium text-gray-500">Transactions Today</p>
                                         <p className="text-3xl font-bold text-gray-900 mt-2">
-                                            {expenses.filter(e => (dashboardCategory === 'All' || e.category === dashboardCategory) && e.date.startsWith(today)).length}
+                                            {transactionsToday}
                                         </p>
                                     </div>
                                     <div className="p-2 bg-purple-50 text-purple-600 rounded-lg">
@@ -337,6 +363,7 @@ const Dashboard = () => {
 
                                     <th className="px-6 py-4 text-left text-xs font-semibold text-gray-500 uppercase tracking-wider">Category</th>
                                     <th className="px-6 py-4 text-left text-xs font-semibold text-gray-500 uppercase tracking-wider">Description</th>
+                                    <th className="px-6 py-4 text-left text-xs font-semibold text-gray-500 uppercase tracking-wider">Receipt</th>
                                     <th className="px-6 py-4 text-left text-xs font-semibold text-gray-500 uppercase tracking-wider">Amount</th>
                                     <th className="px-6 py-4 text-left text-xs font-semibold text-gray-500 uppercase tracking-wider">Status</th>
                                     <th className="px-6 py-4 text-right text-xs font-semibold text-gray-500 uppercase tracking-wider">Actions</th>
@@ -360,6 +387,9 @@ const Dashboard = () => {
                                         <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-600">
                                             {expense.description}
                                         </td>
+                                        <td className="px-6 py-4 whitespace-nowrap text-sm">
+                                            <ReceiptThumbnail expense={expense} />
+                                        </td>
                                         <td className="px-6 py-4 whitespace-nowrap text-sm font-semibold text-gray-900">
                                             ₹{expense.amount.toFixed(2)}
                                         </td>
@@ -397,7 +427,7 @@ const Dashboard = () => {
                                 ))}
                                 {expenses.length === 0 && (
                                     <tr>
-                                        <td colSpan="5" className="px-6 py-16 text-center text-gray-500">
+                                        <td colSpan="7" className="px-6 py-16 text-center text-gray-500">
                                             <div className="bg-gray-50 w-16 h-16 rounded-full flex items-center justify-center mx-auto mb-4">
                                                 <FileText className="h-8 w-8 text-gray-300" />
                                             </div>
@@ -498,11 +528,9 @@ const Dashboard = () => {
 
                                 {/* Daily Limit Warning */}
                                 {(() => {
-                                    const dailyLimit = getBudget(user?.grade);
-                                    const today = new Date().toISOString().split('T')[0];
-                                    const categoryExpenses = expenses
-                                        .filter(e => e.category === (formData.category === 'Other' ? customCategory : formData.category) && e.date.startsWith(today) && e.status === 'Approved')
-                                        .reduce((acc, curr) => acc + curr.amount, 0);
+                                    const selectedCategory = formData.category === 'Other' ? customCategory : formData.category;
+                                    const dailyLimit = summary?.limits?.[selectedCategory]?.daily ?? summary?.daily_limit ?? getBudget(user?.grade);
+                                    const categoryExpenses = summary?.today.approved_by_category[selectedCategory] || 0;
 
                                     const remaining = dailyLimit - categoryExpenses;
                                     const warningThreshold = dailyLimit * 0.15; // 15%
@@ -561,6 +589,16 @@ const Dashboard = () => {
                                 />
                             </div>
 
+                            <div>
+                                <label className="block text-sm font-bold text-gray-700 mb-2">Receipt (optional)</label>
+                                <input
+                                    type="file"
+                                    accept="image/jpeg,image/png,image/webp,image/gif,application/pdf"
+                                    onChange={(e) => setReceiptFile(e.target.files[0] || null)}
+                                    className="w-full text-sm text-gray-600 file:mr-4 file:py-2 file:px-4 file:rounded-xl file:border-0 file:text-sm file:font-semibold file:bg-indigo-50 file:text-indigo-700 hover:file:bg-indigo-100"
+                                />
+                            </div>
+
                             {error && (
                                 <div className="p-3 rounded-xl bg-red-50 text-red-600 text-sm font-medium border border-red-100">
                                     {error}